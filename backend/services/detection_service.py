@@ -5,6 +5,7 @@ import os
 import sys
 import cv2
 import time
+import uuid
 import json
 import threading
 import queue
@@ -14,6 +15,10 @@ from typing import Dict, List, Optional, Tuple, Any
 
 # 导入实时统计服务
 from .realtime_statistics import get_realtime_statistics, reset_realtime_statistics
+from .inference_scheduler import YoloBatchScheduler, SlowFastBatchScheduler
+from .tracker_pool import TrackerPool
+from .inference_backends import (BACKEND_ONNX, OnnxModule, resolve_backends, load_yolo, quantized_onnx_path,
+                                 to_onnx_slowfast, to_onnx_reid)
 
 # 添加算法模块路径
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -34,6 +39,161 @@ except ImportError as e:
     print(f"警告: 无法导入算法模块: {e}")
 
 
+class VideoResultCollector:
+    """视频检测结果收集器 - 按时间窗口去重统计行为，并在可视化图像上绘制跟踪结果"""
+
+    def __init__(self, service: 'BehaviorDetectionService', fps: int, time_window_seconds: float = 0.5):
+        """
+        初始化结果收集器
+
+        Args:
+            service: 检测服务（用于类别名称和报警行为判断）
+            fps: 视频帧率，用于计算时间戳
+            time_window_seconds: 时间窗口，窗口内同一行为只统计一次
+        """
+        self.service = service
+        self.fps = fps
+        self.time_window_seconds = time_window_seconds
+
+        self.results = []
+        self.processed_frames = 0
+        self.behavior_last_time = {}    # 记录每个行为的最后统计时间
+        self.total_detections_count = 0  # 总检测数（按帧）
+        self.total_alerts_count = 0      # 总报警数（时间窗口去重）
+        self.behavior_counts = {}        # 行为统计（时间窗口去重）
+        self.alert_behavior_counts = {}  # 报警行为统计（时间窗口去重）
+
+    def add_frame(self, frame_number: int, tracks, behaviors: List[str], vis_img=None):
+        """
+        统计一帧的跟踪结果
+
+        Args:
+            frame_number: 帧序号（从1开始）
+            tracks: DeepSort输出，每行为 [x1, y1, x2, y2, 类别, 跟踪ID, vx, vy]
+            behaviors: 与 tracks 逐行对应的行为标签
+            vis_img: 可视化图像，为None时不绘制
+        """
+        self.processed_frames += 1
+        if vis_img is not None:
+            cv2.putText(vis_img, f'Frame: {frame_number}',
+                        (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+
+        # 存储检测结果并绘制（包含最新的行为信息）
+        for detection, behavior_type in zip(tracks, behaviors):
+            if len(detection) < 7:
+                continue
+            x1, y1, x2, y2 = int(detection[0]), int(detection[1]), int(detection[2]), int(detection[3])
+            class_id = int(detection[4])  # 这是YOLO的类别ID
+            track_id = int(detection[5])  # 这是DeepSort的跟踪ID
+            confidence = float(detection[6])
+
+            # 映射YOLO类别ID到类别名称
+            object_type = 'unknown'
+            if 0 <= class_id < len(self.service.coco_names):
+                object_type = self.service.coco_names[class_id]
+
+            is_anomaly = self.service._is_anomaly_behavior(behavior_type)
+
+            if vis_img is not None:
+                # 绘制边界框
+                color = (0, 0, 255) if is_anomaly else (0, 255, 0)
+                cv2.rectangle(vis_img, (x1, y1), (x2, y2), color, 2)
+
+                # 绘制对象标签（包含行为信息）
+                label1 = f"ID:{track_id} {object_type}"
+                label2 = f"Action: {behavior_type}"  # 使用英文避免中文乱码
+
+                cv2.putText(vis_img, label1, (x1, y1-25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+                cv2.putText(vis_img, label2, (x1, y1-5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+            # 🔧 修复：使用真实fps计算时间戳
+            current_time = frame_number / self.fps  # 使用真实的视频帧率
+
+            # 总检测数按帧统计（用于性能监控）
+            self.total_detections_count += 1
+
+            # 🔧 关键修复：只有在时间窗口内首次出现的行为才添加到results
+            should_add_to_results = False
+
+            if behavior_type:
+                last_time = self.behavior_last_time.get(behavior_type, 0)
+                if current_time - last_time >= self.time_window_seconds:
+                    # 超过时间窗口，统计这次行为
+                    self.behavior_counts[behavior_type] = self.behavior_counts.get(behavior_type, 0) + 1
+                    self.behavior_last_time[behavior_type] = current_time
+                    should_add_to_results = True  # 只有新统计的行为才添加到结果
+
+                    # 如果是报警行为，同时统计报警
+                    if is_anomaly:
+                        self.total_alerts_count += 1
+                        self.alert_behavior_counts[behavior_type] = self.alert_behavior_counts.get(behavior_type, 0) + 1
+
+                    print(f"🔧 视频统计: {behavior_type} (时间: {current_time:.1f}s, 报警: {'是' if is_anomaly else '否'})")
+            else:
+                # 未识别的行为仍然记录（但不统计）
+                should_add_to_results = True
+
+            if should_add_to_results:
+                self.results.append({
+                    'frame_number': frame_number,
+                    'timestamp': current_time,
+                    'object_id': track_id,
+                    'object_type': object_type,
+                    'confidence': confidence,
+                    'bbox': {
+                        'x1': float(detection[0]),
+                        'y1': float(detection[1]),
+                        'x2': float(detection[2]),
+                        'y2': float(detection[3])
+                    },
+                    'behavior_type': behavior_type,
+                    'is_anomaly': is_anomaly
+                })
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """
+        获取统计信息
+
+        Returns:
+            Dict: 与 _run_detection 返回的 statistics 字段格式一致
+        """
+        return {
+            'total_frames': self.processed_frames,
+            'video_duration': self.processed_frames / self.fps if self.fps > 0 else 0,
+            'fps': self.fps,
+            'raw_detections': self.total_detections_count,
+            'effective_behaviors': sum(self.behavior_counts.values()),
+            'alert_count': self.total_alerts_count,
+            'behavior_counts': self.behavior_counts,
+            'alert_behavior_counts': self.alert_behavior_counts,
+            'time_window_seconds': self.time_window_seconds
+        }
+
+    def print_summary(self):
+        """输出时间窗口统计结果"""
+        video_duration = self.processed_frames / self.fps if self.fps > 0 else 0
+        print(f"\n📊 视频处理统计结果（时间窗口: {self.time_window_seconds}秒）:")
+        print(f"   视频时长: {video_duration:.1f}秒 (总帧数: {self.processed_frames}, 帧率: {self.fps}fps)")
+        print(f"   原始检测数: {self.total_detections_count} (按帧统计，用于性能分析)")
+        print(f"   有效行为数: {sum(self.behavior_counts.values())} (时间窗口去重)")
+        print(f"   报警次数: {self.total_alerts_count} (时间窗口去重)")
+        print(f"   行为统计详情 (时间窗口去重):")
+        if self.behavior_counts:
+            for behavior, count in self.behavior_counts.items():
+                is_alert = behavior in self.alert_behavior_counts
+                print(f"     - {behavior}: {count}次 {'⚠️报警' if is_alert else '✅正常'}")
+        else:
+            print(f"     - 无行为检测")
+        print(f"   最终结果数: {len(self.results)} (时间窗口去重后)")
+
+        # 🔧 数据一致性检查
+        expected_results = sum(self.behavior_counts.values())
+        if len(self.results) != expected_results:
+            print(f"   ⚠️ 数据一致性警告: 结果数({len(self.results)}) != 行为统计数({expected_results})")
+        else:
+            print(f"   ✅ 数据一致性: 正常")
+
+
 class BehaviorDetectionService:
     """行为检测服务类"""
     
@@ -80,6 +240,76 @@ class BehaviorDetectionService:
         
         self.input_size = config.get('input_size', 640)
         self.confidence_threshold = config.get('confidence_threshold', 0.5)
+
+        # 视频读取模式：'sync' 同步解码，'prefetch' 后台线程预解码（解码与推理重叠），
+        # 'latest' 摄像头/网络流只处理最新帧并丢弃过期帧（视频文件按 'prefetch' 处理）
+        self.capture_mode = config.get('capture_mode', 'sync')
+        self.prefetch_depth = config.get('prefetch_depth', 8)
+
+        # 视频文件分段并行检测：区间数量（1 表示不分段）及相邻区间重叠帧数
+        self.video_segments = config.get('video_segments', 1)
+        self.segment_overlap_frames = config.get('segment_overlap_frames', 25)
+
+        # 视频文件检测时每次送入YOLO的帧数（1 表示逐帧推理）
+        self.yolo_batch_size = config.get('yolo_batch_size', 1)
+
+        # 多路实时流的YOLO微批调度：在 micro_batch_wait_ms 内合并各路流的帧为一次批量推理
+        self.yolo_micro_batch = config.get('yolo_micro_batch', False)
+        self.micro_batch_max_size = config.get('micro_batch_max_size', 8)
+        self.micro_batch_wait_ms = config.get('micro_batch_wait_ms', 8.0)
+        self.yolo_scheduler = None
+
+        # SlowFast片段批量推理：各路流（及同一路流积压的窗口）的片段按输入尺寸分组后合并前向
+        self.slowfast_batching = config.get('slowfast_batching', False)
+        self.slowfast_max_batch = config.get('slowfast_max_batch', 4)
+        self.slowfast_batch_wait_ms = config.get('slowfast_batch_wait_ms', 20.0)
+        self.slowfast_scheduler = None
+
+        # 实时流行为识别片段队列：最多积压 clip_queue_size 个片段，SlowFast跟不上时按
+        # clip_queue_policy（drop_oldest / drop_newest / coalesce）丢弃，避免高分辨率片段无限积压
+        self.clip_queue_size = config.get('clip_queue_size', 2)
+        self.clip_queue_policy = config.get('clip_queue_policy', 'drop_oldest')
+
+        # 离线视频检测流水线：行为识别线程最多积压 pipeline_clip_queue_size 个片段（不丢弃），
+        # 检测/跟踪最多领先渲染 pipeline_render_queue_size 帧
+        self.pipeline_clip_queue_size = config.get('pipeline_clip_queue_size', 2)
+        self.pipeline_render_queue_size = config.get('pipeline_render_queue_size', 50)
+
+        # 检测步长：每 detection_stride 帧运行一次YOLO，中间帧使用卡尔曼预测的跟踪框；
+        # adaptive_stride 开启时出现新目标或跟踪不确定度过高会提前检测
+        self.detection_stride = config.get('detection_stride', 1)
+        self.adaptive_stride = config.get('adaptive_stride', False)
+        self.stride_max_uncertainty = config.get('stride_max_uncertainty', 0.15)
+
+        # 实时流运动门控：画面静止时跳过 YOLO + ReID + SlowFast，每 motion_force_interval 帧强制检测一次
+        self.motion_gate = config.get('motion_gate', False)
+        self.motion_threshold = config.get('motion_threshold', 0.005)
+        self.motion_force_interval = config.get('motion_force_interval', 50)
+
+        # 按目标的行为识别刷新：只有新目标、标签过期（action_max_label_age 帧）、框位移或宽高比变化明显、
+        # 或当前为报警行为（每 action_alert_max_age 帧复核）的目标才重新运行 SlowFast，其余沿用缓存标签
+        self.action_refresh = config.get('action_refresh', False)
+        self.action_max_label_age = config.get('action_max_label_age', 75)
+        self.action_motion_threshold = config.get('action_motion_threshold', 0.3)
+        self.action_shape_threshold = config.get('action_shape_threshold', 0.2)
+        self.action_alert_max_age = config.get('action_alert_max_age', 25)
+
+        # 各视频源的关注区域：{视频源: [x1, y1, x2, y2] 或 [[x, y], ...]}，
+        # 检测只在区域内进行，区域外的目标在进入DeepSort前丢弃
+        self.camera_rois = config.get('camera_rois', {})
+
+        # SlowFast 输入裁剪模式：'frame' 整帧缩放到 input_size 短边；'person' 只裁剪片段内
+        # 人物覆盖区域的并集（外扩 person_crop_margin 倍框高），缩放倍率与整帧相同
+        self.slowfast_crop_mode = config.get('slowfast_crop_mode', 'frame')
+        self.person_crop_margin = config.get('person_crop_margin', 0.25)
+
+        # 各模型的推理后端：{'yolo' | 'slowfast' | 'reid': 'pytorch' | 'onnx'}，
+        # ONNX 后端在 CPU 上用 ONNX Runtime 执行，导出的模型缓存在权重文件旁
+        self.inference_backends = resolve_backends(config.get('inference_backends'))
+        self.onnx_threads = config.get('onnx_threads', 0)
+
+        # SlowFast INT8 量化模式：None 使用FP32；'dynamic' / 'static' 使用 tools/quantize_slowfast.py 生成的量化模型
+        self.slowfast_quantization = config.get('slowfast_quantization')
         
         # 初始化标志
         self.models_initialized = False
@@ -102,6 +332,24 @@ class BehaviorDetectionService:
         self.video_model = None
         self.deepsort_tracker = None
         self.ava_labelnames = None
+
+        # 跟踪器池：每个任务/视频流独立的 DeepSort 跟踪状态，共享 deepsort_tracker 的 ReID 特征提取器；
+        # 视频流结束后空闲 tracker_idle_timeout 秒自动回收
+        self.tracker_pool = None
+        self.tracker_idle_timeout = config.get('tracker_idle_timeout', 60.0)
+        # 外观特征库形式：full（保留最近 nn_budget 个特征）/ ema（单个滑动平均特征）/ centroids（k个聚类中心）；
+        # 存储精度 float32 / float16，拥挤场景下可显著降低内存与匹配耗时
+        self.reid_gallery_mode = config.get('reid_gallery_mode', 'full')
+        self.reid_gallery_dtype = config.get('reid_gallery_dtype', 'float32')
+        # 按需提取外观特征：与唯一跟踪目标高IoU且无歧义的检测框直接关联，不运行ReID网络；
+        # 歧义、新出现的检测框，以及超过 reid_refresh_interval 次更新未刷新特征库的目标仍提取特征
+        self.reid_on_demand = config.get('reid_on_demand', False)
+        self.reid_refresh_interval = config.get('reid_refresh_interval', 10)
+        # ReID裁剪缩放线程数（0=在跟踪线程中缩放），检测框较多的帧才使用线程池
+        self.reid_preprocess_workers = config.get('reid_preprocess_workers', 0)
+        # 已确认目标的外观关联方式：cascade（原级联匹配）/ grouped（单代价矩阵按年龄分组求解，结果与级联一致）/
+        # single（单次带年龄偏置的求解）
+        self.tracker_matching = config.get('tracker_matching', 'cascade')
         
         # 报警配置
         self.alert_behaviors = config.get('alert_behaviors', ['fall down', 'fight', 'enter', 'exit'])
@@ -121,8 +369,13 @@ class BehaviorDetectionService:
             os.chdir(yolo_slowfast_path)
             
             # 初始化YOLO模型
-            self.yolo_model = YOLO(self.yolo_model_path)
-            print(f"✓ YOLO模型已加载: {self.yolo_model_path}")
+            self.yolo_model = load_yolo(self.yolo_model_path, self.inference_backends['yolo'], self.input_size)
+            print(f"✓ YOLO模型已加载: {self.yolo_model_path} ({self.inference_backends['yolo']})")
+
+            if self.yolo_micro_batch:
+                self.yolo_scheduler = YoloBatchScheduler(self.yolo_model, self.input_size, self.device,
+                                                         self.micro_batch_max_size, self.micro_batch_wait_ms)
+                print(f"✓ YOLO微批调度已启用: 批量上限={self.micro_batch_max_size}, 最长等待={self.micro_batch_wait_ms}ms")
             
             # 初始化SlowFast模型
             if os.path.exists(self.slowfast_weights_path):
@@ -134,21 +387,56 @@ class BehaviorDetectionService:
             else:
                 print(f"⚠ SlowFast权重文件不存在，使用预训练模型: {self.slowfast_weights_path}")
                 self.video_model = slowfast_r50_detection(True).eval().to(self.device)
+            quantized_path = None
+            if self.slowfast_quantization:
+                quantized_path = quantized_onnx_path(self.slowfast_weights_path, self.slowfast_quantization)
+                if not os.path.exists(quantized_path):
+                    print(f"⚠ SlowFast量化模型不存在: {quantized_path}，"
+                          f"请先运行 tools/quantize_slowfast.py --mode {self.slowfast_quantization}，继续使用FP32模型")
+                    quantized_path = None
+            if quantized_path:
+                quantized_model = OnnxModule(quantized_path, self.onnx_threads)
+                if quantized_model.max_batch is not None:
+                    print(f"⚠ SlowFast量化模型批量维度固定为 {quantized_model.max_batch}（旧版本导出）: {quantized_path}，"
+                          f"请重新运行 tools/quantize_slowfast.py --mode {self.slowfast_quantization}，继续使用FP32模型")
+                    quantized_path = None
+                else:
+                    self.video_model = quantized_model
+                    print(f"✓ SlowFast使用INT8量化模型: {quantized_path}")
+            if not quantized_path and self.inference_backends['slowfast'] == BACKEND_ONNX:
+                self.video_model = to_onnx_slowfast(self.video_model, self.slowfast_weights_path,
+                                                    self.input_size, self.onnx_threads)
+                print(f"✓ SlowFast使用ONNX Runtime推理: {self.video_model.onnx_path}")
+
+            if self.slowfast_batching:
+                self.slowfast_scheduler = SlowFastBatchScheduler(self.video_model, self.device,
+                                                                 self.slowfast_max_batch, self.slowfast_batch_wait_ms)
+                print(f"✓ SlowFast批量推理已启用: 批量上限={self.slowfast_max_batch}, 最长等待={self.slowfast_batch_wait_ms}ms")
             
             # 初始化DeepSort跟踪器
             if os.path.exists(self.deepsort_weights_path):
-                self.deepsort_tracker = DeepSort(self.deepsort_weights_path)
+                self.deepsort_tracker = DeepSort(self.deepsort_weights_path, reid_workers=self.reid_preprocess_workers)
                 print(f"✓ DeepSort跟踪器已加载: {self.deepsort_weights_path}")
             else:
                 # 如果绝对路径不存在，尝试相对路径
                 relative_path = "deep_sort/deep_sort/deep/checkpoint/ckpt.t7"
                 if os.path.exists(relative_path):
-                    self.deepsort_tracker = DeepSort(relative_path)
+                    self.deepsort_tracker = DeepSort(relative_path, reid_workers=self.reid_preprocess_workers)
                     print(f"✓ DeepSort跟踪器已加载: {relative_path}")
                 else:
                     print(f"⚠ DeepSort权重文件不存在: {self.deepsort_weights_path}")
                     print(f"⚠ 相对路径也不存在: {relative_path}")
                     return False
+            if self.inference_backends['reid'] == BACKEND_ONNX:
+                weights_path = self.deepsort_weights_path if os.path.exists(self.deepsort_weights_path) else relative_path
+                to_onnx_reid(self.deepsort_tracker.extractor, weights_path, self.onnx_threads)
+                print(f"✓ DeepSort ReID使用ONNX Runtime推理: {self.deepsort_tracker.extractor.net.onnx_path}")
+            self.tracker_pool = TrackerPool(self.deepsort_tracker.extractor, self.tracker_idle_timeout,
+                                            gallery=self.reid_gallery_mode, gallery_dtype=self.reid_gallery_dtype,
+                                            reid_on_demand=self.reid_on_demand,
+                                            reid_refresh_interval=self.reid_refresh_interval,
+                                            matching=self.tracker_matching)
+            print(f"✓ 外观特征库: {self.reid_gallery_mode}, {self.reid_gallery_dtype}")
             
             # 加载AVA标签
             if os.path.exists(self.ava_labels_path):
@@ -195,8 +483,8 @@ class BehaviorDetectionService:
                 return {'success': False, 'error': '模型初始化失败'}
         
         try:
-            # 创建任务ID
-            task_id = f"video_{int(time.time())}"
+            # 创建任务ID（同时作为跟踪器池和调度器的流键，不能按秒取时间戳，否则同一秒内的任务会互相覆盖）
+            task_id = f"video_{uuid.uuid4().hex}"
             
             # 转换为绝对路径（在切换目录前）
             video_path = os.path.abspath(video_path)
@@ -232,7 +520,12 @@ class BehaviorDetectionService:
                 }
             
             # 执行检测
-            detection_result = self._run_detection(config, task_id, progress_callback)
+            if self.video_segments > 1:
+                from .segmented_detection import run_segmented_detection
+                detection_result = run_segmented_detection(self, config, task_id, self.video_segments,
+                                                           self.segment_overlap_frames, progress_callback)
+            else:
+                detection_result = self._run_detection(config, task_id, progress_callback)
 
             # 恢复原始目录
             os.chdir(original_cwd)
@@ -293,7 +586,7 @@ class BehaviorDetectionService:
             if not self.initialize_models():
                 raise Exception('模型初始化失败')
         
-        task_id = f"realtime_{int(time.time())}"
+        task_id = f"realtime_{uuid.uuid4().hex}"
         
         def realtime_worker():
             try:
@@ -392,7 +685,7 @@ class BehaviorDetectionService:
             os.chdir(yolo_slowfast_path)
 
             # 确保导入必要的模块
-            from yolo_slowfast import MyVideoCapture, ava_inference_transform, deepsort_update, plot_one_box
+            from yolo_slowfast import ava_inference_transform, deepsort_update, plot_one_box
 
             # 处理视频源参数
             if source == '0' or source == 0:
@@ -401,9 +694,11 @@ class BehaviorDetectionService:
                 source = int(source)  # 摄像头ID
 
             print(f"处理后的视频源: {source}, 类型: {type(source)}")
+            stream_id = f"{source}_{threading.get_ident()}"
+            tracker = self.tracker_pool.acquire(stream_id)
 
             # 初始化视频捕获
-            cap = MyVideoCapture(source)
+            cap = self._open_capture(source)
             id_to_ava_labels = {}
 
             # 颜色映射
@@ -411,7 +706,7 @@ class BehaviorDetectionService:
             coco_color_map = [[random.randint(0, 255) for _ in range(3)] for _ in range(80)]
 
             # clip 队列和动作识别线程
-            clip_queue = queue.Queue()
+            clip_queue = ClipQueue(self.clip_queue_size, self.clip_queue_policy)
             result_queue = queue.Queue()
 
             def slowfast_worker():
@@ -420,7 +715,8 @@ class BehaviorDetectionService:
                 stream = torch.cuda.Stream() if 'cuda' in str(self.device) else None
                 context_manager = torch.cuda.stream(stream) if stream else contextlib.nullcontext()
 
-                while True:
+                stop = False
+                while not stop:
                     # 检查停止信号
                     if self.should_stop_realtime:
                         print("SlowFast worker收到停止信号，退出...")
@@ -428,42 +724,50 @@ class BehaviorDetectionService:
 
                     try:
                         # 使用超时获取任务，避免无限等待
-                        item = clip_queue.get(timeout=1.0)
-                        if item is None:
-                            break
-                    except:
-                        # 超时或其他异常，继续检查停止信号
+                        items = [clip_queue.get(timeout=1.0)]
+                    except queue.Empty:
+                        # 超时，继续检查停止信号
                         continue
-
-                    idx, clip, pred_result = item
+                    # 推理跟不上时会积压多个窗口，一并取出合并推理
+                    while len(items) < self.slowfast_max_batch:
+                        try:
+                            items.append(clip_queue.get_nowait())
+                        except queue.Empty:
+                            break
+                    if None in items:
+                        stop = True
+                        items = items[:items.index(None)]
 
                     # 再次检查停止信号
                     if self.should_stop_realtime:
                         print("SlowFast worker在处理前收到停止信号，退出...")
-                        clip_queue.task_done()
+                        for _, clip, _ in items:
+                            cap.release_clip(clip)
+                            clip_queue.task_done()
                         break
 
-                    with context_manager:
-                        if pred_result.pred[0].shape[0]:
-                            inputs, inp_boxes, _ = ava_inference_transform(clip, pred_result.pred[0][:, 0:4], crop_size=self.input_size)
-                            inp_boxes = torch.cat([torch.zeros(inp_boxes.shape[0], 1), inp_boxes], dim=1)
-                            if isinstance(inputs, list):
-                                inputs = [inp.unsqueeze(0).to(self.device, non_blocking=True) for inp in inputs]
-                            else:
-                                inputs = inputs.unsqueeze(0).to(self.device, non_blocking=True)
-
-                            inp_boxes_gpu = inp_boxes.to(self.device, non_blocking=True)
-
-                            with torch.no_grad():
-                                slowfaster_preds = self.video_model(inputs, inp_boxes_gpu)
-
-                            # 修复数据类型转换问题 - 确保正确的数据类型转换
-                            slowfaster_preds_cpu = slowfaster_preds.cpu().float()  # 确保为float类型
-                            pred_labels = torch.argmax(slowfaster_preds_cpu, dim=1).numpy().astype(np.int32)
-                            track_ids = pred_result.pred[0][:, 5].astype(np.int32)
-
-                            result_queue.put((idx, track_ids.tolist(), pred_labels.tolist()))
-                    clip_queue.task_done()
+                    try:
+                        batch = []
+                        for idx, clip, tracks in items:
+                            clip, clip_boxes, crop_size = self._crop_action_clip(clip, tracks, self.input_size, roi)
+                            inputs, inp_boxes, _ = ava_inference_transform(clip, clip_boxes, crop_size=crop_size)
+                            batch.append((idx, tracks, inputs, inp_boxes))
+
+                        if batch:
+                            with context_manager:
+                                preds = self._infer_actions(stream_id, [(inputs, boxes) for _, _, inputs, boxes in batch])
+                            for (idx, tracks, _, _), slowfaster_preds in zip(batch, preds):
+                                pred_labels = torch.argmax(slowfaster_preds, dim=1).numpy().astype(np.int32)
+                                result_queue.put((idx, tracks, pred_labels.tolist()))
+                    except Exception as e:
+                        # 单批推理失败只丢弃这批片段，线程继续处理后续片段
+                        print(f"SlowFast处理错误: {e}")
+                        import traceback
+                        traceback.print_exc()
+                    finally:
+                        for _, clip, _ in items:
+                            cap.release_clip(clip)
+                            clip_queue.task_done()
 
                 print("SlowFast worker线程已退出")
 
@@ -472,12 +776,18 @@ class BehaviorDetectionService:
 
             # 主处理循环 - 按照标准实现逻辑（简化循环条件）
             frame_count = 0
+            stride = self._new_detection_stride()
+            motion_gate = self._new_motion_gate()
+            action_refresh = self._new_action_refresh()
+            roi = self._get_roi(source)
             print(f"🎥 开始主处理循环")
             while not cap.end and not self.should_stop_realtime:
                 frame_count += 1
                 # 每100帧打印一次状态
                 if frame_count % 100 == 0:
                     print(f"🎥 处理第{frame_count}帧 - should_stop: {self.should_stop_realtime}, event_set: {self.stop_event.is_set()}")
+                    if isinstance(cap, LatestFrameVideoCapture):
+                        print(f"🎥 已丢弃过期帧: {cap.dropped_frames}")
 
                 # 在循环开始时检查停止标志（按照标准实现）
                 if self.should_stop_realtime:
@@ -502,30 +812,38 @@ class BehaviorDetectionService:
                 if preview_only:
                     # 预览模式：只显示原始摄像头画面，不进行任何检测
                     pass  # img保持原始状态
+                elif motion_gate is not None and not motion_gate.check(img):
+                    # 画面静止：跳过整条检测流水线，只输出解码后的画面
+                    if realtime_stats:
+                        realtime_stats.update_pipeline_stats(motion_skip_ratio=round(motion_gate.skip_ratio, 3))
                 else:
                     # 实时检测模式：执行完整的YOLO + SlowFast检测
-                    # YOLO检测
-                    results = self.yolo_model.predict(source=img, imgsz=self.input_size, device=self.device, verbose=False)
-                    boxes = results[0].boxes  # YOLOv8 Results object
-
-                    # 处理YOLO检测结果
-                    if boxes is not None and len(boxes) > 0:
-                        # 再次检查停止信号
-                        if self.should_stop_realtime:
-                            print("在YOLO处理阶段收到停止信号，退出...")
-                            break
-
-                        pred_xyxy = boxes.xyxy.cpu().numpy()
-                        pred_conf = boxes.conf.cpu().numpy().reshape(-1, 1)
-                        pred_cls = boxes.cls.cpu().numpy().reshape(-1, 1)
+                    temp = None
+                    if stride.should_detect(frame_count - 1, tracker.tracker):
+                        # YOLO检测
+                        boxes = self._detect_stream_frame(stream_id, roi.crop(img) if roi else img).boxes  # YOLOv8 Results object
+                        stride.record(True)
+
+                        # 处理YOLO检测结果
+                        if boxes is not None and len(boxes) > 0:
+                            # 再次检查停止信号
+                            if self.should_stop_realtime:
+                                print("在YOLO处理阶段收到停止信号，退出...")
+                                break
 
-                        pred = np.hstack((pred_xyxy, pred_conf, pred_cls))
-                        xywh = np.hstack(((pred[:, 0:2] + pred[:, 2:4]) / 2, pred[:, 2:4] - pred[:, 0:2]))
+                            pred = self._boxes_to_pred(boxes, roi, img.shape)
+                            xywh = np.hstack(((pred[:, 0:2] + pred[:, 2:4]) / 2, pred[:, 2:4] - pred[:, 0:2]))
 
-                        # DeepSort跟踪
-                        temp = deepsort_update(self.deepsort_tracker, pred, xywh, img)
+                            # DeepSort跟踪
+                            temp = deepsort_update(tracker, pred, xywh, img)
+                            temp = temp if len(temp) else np.ones((0, 8)).astype(np.float32)
+                    else:
+                        # 中间帧：不运行YOLO，使用卡尔曼预测的跟踪框
+                        stride.record(False)
+                        temp = tracker.propagate(img)
                         temp = temp if len(temp) else np.ones((0, 8)).astype(np.float32)
 
+                    if temp is not None:
                         # 再次检查停止信号
                         if self.should_stop_realtime:
                             print("在DeepSort处理阶段收到停止信号，退出...")
@@ -540,13 +858,23 @@ class BehaviorDetectionService:
                         # 行为识别（SlowFast） - 当积累了25帧时
                         if len(cap.stack) == 25:
                             clip = cap.get_video_clip()
-                            clip_queue.put((cap.idx, clip, pred_result))
+                            tracks = pred_result.pred[0]
+                            if action_refresh is not None:
+                                tracks = tracks[action_refresh.select(tracks, cap.idx, id_to_ava_labels)]
+                            if len(tracks):
+                                clip_queue.put((cap.idx, clip, tracks))
+                            else:
+                                cap.release_clip(clip)
 
                         # 处理动作识别结果
                         while not result_queue.empty():
                             try:
-                                _, tids, avalabels = result_queue.get_nowait()
-                                for tid, avalabel in zip(tids, avalabels):
+                                idx, tracks, avalabels = result_queue.get_nowait()
+                                clip_queue.record_result(idx, cap.idx)
+                                if action_refresh is not None:
+                                    # 结果被应用时才记为已刷新，被丢弃的片段中的目标会在下个片段重新识别
+                                    action_refresh.record(tracks, idx)
+                                for tid, avalabel in zip(tracks[:, 5].astype(np.int32).tolist(), avalabels):
                                     id_to_ava_labels[tid] = self.ava_labelnames[avalabel + 1]
                             except queue.Empty:
                                 break
@@ -609,6 +937,21 @@ class BehaviorDetectionService:
                             # 更新统计数据
                             current_time = time.time()
                             realtime_stats.update_frame_stats(fps=30.0, processing_time=0.033)
+                            if isinstance(cap, LatestFrameVideoCapture):
+                                realtime_stats.update_pipeline_stats(dropped_frames=cap.dropped_frames)
+                            if self.yolo_scheduler is not None:
+                                realtime_stats.update_pipeline_stats(yolo_micro_batch=self.yolo_scheduler.get_stats())
+                            if self.slowfast_scheduler is not None:
+                                realtime_stats.update_pipeline_stats(slowfast_batch=self.slowfast_scheduler.get_stats())
+                            if stride.stride > 1:
+                                realtime_stats.update_pipeline_stats(yolo_skip_ratio=round(stride.skip_ratio, 3))
+                            if motion_gate is not None:
+                                realtime_stats.update_pipeline_stats(motion_skip_ratio=round(motion_gate.skip_ratio, 3))
+                            if action_refresh is not None:
+                                realtime_stats.update_pipeline_stats(action_skip_ratio=round(action_refresh.skip_ratio, 3))
+                            if tracker.reid_on_demand:
+                                realtime_stats.update_pipeline_stats(reid_skip_ratio=round(tracker.reid_skip_ratio, 3))
+                            realtime_stats.update_pipeline_stats(clip_queue=clip_queue.get_stats())
                             if detections:
                                 realtime_stats.add_detections(detections)
 
@@ -682,6 +1025,13 @@ class BehaviorDetectionService:
             except Exception as cleanup_error:
                 print(f"🎥 释放摄像头资源时出错: {cleanup_error}")
 
+            if 'tracker' in locals():
+                self.tracker_pool.release(stream_id)
+            if self.yolo_scheduler is not None and 'stream_id' in locals():
+                self.yolo_scheduler.remove_stream(stream_id)
+            if self.slowfast_scheduler is not None and 'stream_id' in locals():
+                self.slowfast_scheduler.remove_stream(stream_id)
+
             try:
                 if 'original_cwd' in locals():
                     os.chdir(original_cwd)
@@ -789,263 +1139,264 @@ class BehaviorDetectionService:
         with self.task_lock:
             return self.current_tasks.get(task_id, {'status': 'not_found'})
     
-    def _run_detection(self, config, task_id: str, progress_callback: callable = None) -> List[Dict]:
+    def _open_video_writer(self, output_path: str, fps: int, frame_size: Tuple[int, int]):
         """
-        执行检测的核心逻辑（基于现有算法）- 🔧 新增时间窗口统计
+        创建浏览器兼容的输出视频写入器
+
+        Args:
+            output_path: 输出视频路径
+            fps: 输出帧率
+            frame_size: (宽, 高)
+
+        Returns:
+            Tuple: (VideoWriter或None, 实际输出路径)
+        """
+        # 确保输出目录存在
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+        # 使用浏览器兼容的MP4格式，优先尝试H.264编解码器
+        output_mp4 = output_path.replace('.avi', '.mp4')
+
+        # 尝试不同的编解码器，优先使用浏览器兼容性最好的
+        codecs_to_try = [
+            ('avc1', 'H.264 (最佳浏览器兼容性)'),
+            ('h264', 'H.264'),
+            ('mp4v', 'MPEG-4'),
+        ]
+
+        for codec, desc in codecs_to_try:
+            try:
+                fourcc = cv2.VideoWriter_fourcc(*codec)
+                test_writer = cv2.VideoWriter(output_mp4, fourcc, fps, frame_size)
+
+                if test_writer.isOpened():
+                    print(f"✓ 使用 {codec} ({desc}) 编解码器输出: {output_mp4}")
+                    return test_writer, output_mp4
+                else:
+                    test_writer.release()
+            except Exception as e:
+                print(f"⚠ {codec} 编解码器失败: {e}")
+                continue
+
+        # 如果所有MP4编解码器都失败，回退到AVI
+        print("⚠ 所有MP4编解码器失败，回退到AVI格式")
+        fourcc = cv2.VideoWriter_fourcc(*'XVID')
+        outputvideo = cv2.VideoWriter(output_path, fourcc, fps, frame_size)
+        if outputvideo.isOpened():
+            print("✓ 使用 XVID (AVI) 编解码器")
+            return outputvideo, output_path
+        print("❌ 所有视频编解码器都失败")
+        return None, output_path
+
+    def _write_video_frame(self, outputvideo, vis_img, frame_size: Tuple[int, int], frame_number: int):
+        """写入视频帧（修复帧格式问题）"""
+        if not outputvideo or not outputvideo.isOpened():
+            return
+        width, height = frame_size
+        # 确保帧尺寸正确
+        if vis_img.shape[:2] != (height, width):
+            vis_img = cv2.resize(vis_img, (width, height))
+
+        # 确保帧格式正确（BGR）
+        if len(vis_img.shape) == 3 and vis_img.shape[2] == 3:
+            success = outputvideo.write(vis_img)
+            if not success:
+                print(f"⚠ 写入视频帧失败: 帧 {frame_number}, 尺寸: {vis_img.shape}")
+        else:
+            print(f"⚠ 帧格式错误: {vis_img.shape}")
+            # 转换为BGR格式
+            if len(vis_img.shape) == 2:
+                vis_img = cv2.cvtColor(vis_img, cv2.COLOR_GRAY2BGR)
+            outputvideo.write(vis_img)
+
+    def _run_detection(self, config, task_id: str, progress_callback: callable = None,
+                       start_frame: int = 0, end_frame: int = None,
+                       frame_records: list = None) -> List[Dict]:
         """
-        results = []
+        执行检测的核心逻辑（基于现有算法）- 🔧 新增时间窗口统计
 
+        Args:
+            config: 检测参数
+            task_id: 任务ID
+            progress_callback: 进度回调函数
+            start_frame: 起始帧（分段处理时使用）
+            end_frame: 结束帧（不含），为None时处理到视频结尾
+            frame_records: 若提供，逐帧追加 (帧序号, 跟踪结果, 行为标签列表)，行为未识别时标签为None
+        """
         try:
-            # 使用现有的main函数逻辑，但进行了修改以支持回调
-            cap = MyVideoCapture(config.input)
+            # 使用现有的main函数逻辑，但进行了修改以支持回调；解码始终在后台线程进行（流水线的第一阶段）
+            cap = open_video_capture(config.input, 'prefetch', self.prefetch_depth)
             id_to_ava_labels = {}
 
             total_frames = int(cap.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            if end_frame is None or end_frame > total_frames > 0:
+                end_frame = total_frames
+            if start_frame > 0:
+                cap.cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+                cap.idx = start_frame - 1
+            frames_to_process = end_frame - start_frame if end_frame else 0
             processed_frames = 0
 
             # 🔧 修复：获取真实的视频帧率
             fps = int(cap.cap.get(cv2.CAP_PROP_FPS)) or 25
-            print(f"📹 视频信息: 总帧数={total_frames}, 帧率={fps}fps")
+            print(f"📹 视频信息: 总帧数={total_frames}, 帧率={fps}fps, 处理区间=[{start_frame}, {end_frame})")
 
-            # 🔧 简化：时间窗口统计变量
-            behavior_last_time = {}  # 记录每个行为的最后统计时间
-            time_window_seconds = 0.5  # 时间窗口：0.5秒内同一行为只统计一次
+            # 🔧 简化：时间窗口统计（0.5秒内同一行为只统计一次）
+            collector = VideoResultCollector(self, fps, time_window_seconds=0.5)
 
-            # 统计数据
-            total_detections_count = 0  # 总检测数（按帧）
-            total_alerts_count = 0      # 总报警数（时间窗口去重）
-            behavior_counts = {}        # 行为统计（时间窗口去重）
-            alert_behavior_counts = {}  # 报警行为统计（时间窗口去重）
-            
             # 设置输出视频 - 修复编解码器问题
             outputvideo = None
             if config.output:
                 video = cv2.VideoCapture(config.input)
                 width, height = int(video.get(3)), int(video.get(4))
-                fps = int(video.get(cv2.CAP_PROP_FPS)) or 25
                 video.release()
-                
-                # 确保输出目录存在
-                os.makedirs(os.path.dirname(config.output), exist_ok=True)
-                
-                # 使用浏览器兼容的MP4格式，优先尝试H.264编解码器
-                output_mp4 = config.output.replace('.avi', '.mp4')
-                
-                # 尝试不同的编解码器，优先使用浏览器兼容性最好的
-                codecs_to_try = [
-                    ('avc1', 'H.264 (最佳浏览器兼容性)'),
-                    ('h264', 'H.264'),
-                    ('mp4v', 'MPEG-4'),
-                ]
-                
-                outputvideo = None
-                used_codec = None
-                
-                for codec, desc in codecs_to_try:
+                outputvideo, config.output = self._open_video_writer(config.output, fps, (width, height))
+
+            temp = np.ones((0, 8)).astype(np.float32)
+            stride = self._new_detection_stride()
+            action_refresh = self._new_action_refresh()
+            roi = self._get_roi(config.input)
+
+            # 流水线：解码（PrefetchVideoCapture 后台线程）→ 检测/跟踪（当前线程）→ 行为识别线程 → 渲染/编码线程，
+            # 各阶段之间为有界队列。片段结束帧的渲染会等待该片段的识别结果，标签与串行执行时应用到相同的帧
+            clip_queue = ClipQueue(self.pipeline_clip_queue_size, 'block')
+            render_queue = queue.Queue(maxsize=max(1, self.pipeline_render_queue_size))
+            action_results = {}  # 片段结束帧序号 -> {跟踪ID: 行为标签}
+            results_ready = threading.Condition()
+            pipeline_errors = []
+
+            def action_worker():
+                # 行为识别线程按片段顺序维护自己的标签视图，刷新策略的选择结果与串行执行一致
+                labels = {}
+                while True:
+                    item = clip_queue.get()
+                    if item is None:
+                        clip_queue.task_done()
+                        return
+                    clip_frame, buffered_clip, tracks = item
+                    clip = buffered_clip
+                    updates = {}
                     try:
-                        fourcc = cv2.VideoWriter_fourcc(*codec)
-                        test_writer = cv2.VideoWriter(output_mp4, fourcc, fps, (width, height))
-                        
-                        if test_writer.isOpened():
-                            outputvideo = test_writer
-                            used_codec = f"{codec} ({desc})"
-                            config.output = output_mp4
-                            print(f"✓ 使用 {used_codec} 编解码器输出: {output_mp4}")
-                            break
-                        else:
-                            test_writer.release()
-                    except Exception as e:
-                        print(f"⚠ {codec} 编解码器失败: {e}")
-                        continue
-                
-                # 如果所有MP4编解码器都失败，回退到AVI
-                if not outputvideo or not outputvideo.isOpened():
-                    print("⚠ 所有MP4编解码器失败，回退到AVI格式")
-                    fourcc = cv2.VideoWriter_fourcc(*'XVID')
-                    outputvideo = cv2.VideoWriter(config.output, fourcc, fps, (width, height))
-                    if outputvideo.isOpened():
-                        used_codec = "XVID (AVI)"
-                        print(f"✓ 使用 {used_codec} 编解码器")
-                    else:
-                        print("❌ 所有视频编解码器都失败")
-                        outputvideo = None
-            
-            while not cap.end:
-                ret, img = cap.read()
-                if not ret:
-                    continue
-                
-                processed_frames += 1
-                
-                # YOLO检测
-                yolo_results = self.yolo_model.predict(
-                    source=img, 
-                    imgsz=config.imsize, 
-                    device=config.device, 
-                    verbose=False
-                )
-                boxes = yolo_results[0].boxes
-                
-                # 处理检测结果
-                if len(boxes) > 0:
-                    pred_xyxy = boxes.xyxy.cpu().numpy()
-                    pred_conf = boxes.conf.cpu().numpy().reshape(-1, 1)
-                    pred_cls = boxes.cls.cpu().numpy().reshape(-1, 1)
-                    
-                    pred = np.hstack((pred_xyxy, pred_conf, pred_cls))
-                    xywh = np.hstack(((pred[:, 0:2] + pred[:, 2:4]) / 2, pred[:, 2:4] - pred[:, 0:2]))
-                    
-                    # DeepSort跟踪
-                    temp = deepsort_update(self.deepsort_tracker, pred, xywh, img)
-                    temp = temp if len(temp) else np.ones((0, 8)).astype(np.float32)
-                    
-                                    # 行为识别（SlowFast） - 先进行行为识别再绘制视频帧
-                if len(cap.stack) == 25:
-                    clip = cap.get_video_clip()
-                    if temp.shape[0] > 0:
-                        try:
-                            # 获取边界框位置（前4列）
-                            boxes = temp[:, 0:4].astype(np.float32)
-                            track_ids = temp[:, 5].astype(np.int32)  # 跟踪ID在第5列
-                            
-                            inputs, inp_boxes, _ = ava_inference_transform(clip, boxes, crop_size=config.imsize)
-                            
-                            # 修复数据类型问题
-                            inp_boxes = inp_boxes.float()  # 确保为float类型
-                            inp_boxes = torch.cat([torch.zeros(inp_boxes.shape[0], 1), inp_boxes], dim=1)
-                            
-                            if isinstance(inputs, list):
-                                inputs = [inp.unsqueeze(0).to(self.device) for inp in inputs]
-                            else:
-                                inputs = inputs.unsqueeze(0).to(self.device)
-                            
-                            with torch.no_grad():
-                                slowfaster_preds = self.video_model(inputs, inp_boxes.to(self.device))
-                            
+                        if action_refresh is not None and len(tracks):
+                            # 只重新识别需要刷新的目标，其余沿用已有标签
+                            tracks = tracks[action_refresh.select(tracks, clip_frame, labels)]
+                        if tracks.shape[0] > 0:
+                            track_ids = tracks[:, 5].astype(np.int32)  # 跟踪ID在第5列
+
+                            # 按关注区域与裁剪模式裁剪片段，边界框映射到裁剪图坐标
+                            clip, boxes, crop_size = self._crop_action_clip(clip, tracks.astype(np.float32), config.imsize, roi)
+                            inputs, inp_boxes, _ = ava_inference_transform(clip, boxes, crop_size=crop_size)
+                            slowfaster_preds = self._infer_actions(task_id, [(inputs, inp_boxes)])[0]
+
                             # 获取预测结果
-                            pred_labels = torch.argmax(slowfaster_preds.cpu(), axis=1).numpy()
-                            
-                            # 更新行为标签映射
+                            pred_labels = torch.argmax(slowfaster_preds, axis=1).numpy()
                             for tid, avalabel in zip(track_ids, pred_labels):
                                 if avalabel < len(self.ava_labelnames):
-                                    id_to_ava_labels[int(tid)] = self.ava_labelnames[avalabel + 1]
-                                    
+                                    updates[int(tid)] = self.ava_labelnames[avalabel + 1]
+                            if action_refresh is not None:
+                                action_refresh.record(tracks, clip_frame)
                             print(f"✓ SlowFast检测到{len(pred_labels)}个行为，更新标签映射")
-                            
-                        except Exception as e:
-                            print(f"SlowFast处理错误: {e}")
-                            import traceback
-                            traceback.print_exc()
-
-                # 创建可视化图像 - 在行为识别完成后绘制
-                vis_img = img.copy()
-                cv2.putText(vis_img, f'Frame: {processed_frames}', 
-                           (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                
-                # 存储检测结果并绘制（包含最新的行为信息）
-                for detection in temp:
-                    if len(detection) >= 7:
-                        x1, y1, x2, y2 = int(detection[0]), int(detection[1]), int(detection[2]), int(detection[3])
-                        class_id = int(detection[4])  # 这是YOLO的类别ID
-                        track_id = int(detection[5])  # 这是DeepSort的跟踪ID
-                        confidence = float(detection[6])
-                        
-                        # 映射YOLO类别ID到类别名称
-                        object_type = 'unknown'
-                        if 0 <= class_id < len(self.coco_names):
-                            object_type = self.coco_names[class_id]
-                        
-                        # 获取最新的行为标签
-                        behavior_type = id_to_ava_labels.get(track_id, 'walking')
-                        
-                        # 绘制边界框
-                        color = (0, 0, 255) if self._is_anomaly_behavior(behavior_type) else (0, 255, 0)
-                        cv2.rectangle(vis_img, (x1, y1), (x2, y2), color, 2)
-                        
-                        # 绘制对象标签（包含行为信息）
-                        label1 = f"ID:{track_id} {object_type}"
-                        label2 = f"Action: {behavior_type}"  # 使用英文避免中文乱码
-                        
-                        cv2.putText(vis_img, label1, (x1, y1-25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-                        cv2.putText(vis_img, label2, (x1, y1-5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-                        
-                        # 🔧 修复：使用真实fps计算时间戳
-                        current_time = processed_frames / fps  # 使用真实的视频帧率
-
-                        # 总检测数按帧统计（用于性能监控）
-                        total_detections_count += 1
-
-                        # 🔧 修复：行为统计使用时间窗口去重
-                        is_anomaly = self._is_anomaly_behavior(behavior_type)
-
-                        # 🔧 关键修复：只有在时间窗口内首次出现的行为才添加到results
-                        should_add_to_results = False
-
-                        if behavior_type:
-                            last_time = behavior_last_time.get(behavior_type, 0)
-                            if current_time - last_time >= time_window_seconds:
-                                # 超过时间窗口，统计这次行为
-                                behavior_counts[behavior_type] = behavior_counts.get(behavior_type, 0) + 1
-                                behavior_last_time[behavior_type] = current_time
-                                should_add_to_results = True  # 只有新统计的行为才添加到结果
-
-                                # 如果是报警行为，同时统计报警
-                                if is_anomaly:
-                                    total_alerts_count += 1
-                                    alert_behavior_counts[behavior_type] = alert_behavior_counts.get(behavior_type, 0) + 1
-
-                                print(f"🔧 视频统计: {behavior_type} (时间: {current_time:.1f}s, 报警: {'是' if is_anomaly else '否'})")
-                        else:
-                            # 未识别的行为仍然记录（但不统计）
-                            should_add_to_results = True
-
-                        # 🔧 关键修复：只有符合时间窗口条件的检测结果才添加到results
-                        if should_add_to_results:
-                            result = {
-                                'frame_number': processed_frames,
-                                'timestamp': current_time,
-                                'object_id': track_id,
-                                'object_type': object_type,
-                                'confidence': confidence,
-                                'bbox': {
-                                    'x1': float(detection[0]),
-                                    'y1': float(detection[1]),
-                                    'x2': float(detection[2]),
-                                    'y2': float(detection[3])
-                                },
-                                'behavior_type': behavior_type,
-                                'is_anomaly': is_anomaly
-                            }
-                            results.append(result)
-                
-                # 写入视频帧（修复帧格式问题）
-                if outputvideo and outputvideo.isOpened():
-                    # 确保帧尺寸正确
-                    if vis_img.shape[:2] != (height, width):
-                        vis_img = cv2.resize(vis_img, (width, height))
-                    
-                    # 确保帧格式正确（BGR）
-                    if len(vis_img.shape) == 3 and vis_img.shape[2] == 3:
-                        success = outputvideo.write(vis_img)
-                        if not success:
-                            print(f"⚠ 写入视频帧失败: 帧 {processed_frames}, 尺寸: {vis_img.shape}")
-                    else:
-                        print(f"⚠ 帧格式错误: {vis_img.shape}")
-                        # 转换为BGR格式
-                        if len(vis_img.shape) == 2:
-                            vis_img = cv2.cvtColor(vis_img, cv2.COLOR_GRAY2BGR)
-                        success = outputvideo.write(vis_img)
-                
-                # 更新进度
-                if progress_callback and total_frames > 0:
-                    progress = (processed_frames / total_frames) * 100
-                    progress_callback(task_id, progress)
-                
-                # 检查任务是否被停止
-                with self.task_lock:
-                    if task_id in self.current_tasks and self.current_tasks[task_id]['status'] == 'stopped':
+                    except Exception as e:
+                        print(f"SlowFast处理错误: {e}")
+                        import traceback
+                        traceback.print_exc()
+                    finally:
+                        cap.release_clip(buffered_clip)
+                        labels.update(updates)
+                        with results_ready:
+                            action_results[clip_frame] = updates
+                            results_ready.notify_all()
+                        clip_queue.task_done()
+
+            def render_worker():
+                rendered_frames = 0
+                while True:
+                    item = render_queue.get()
+                    if item is None:
+                        return
+                    if pipeline_errors:
+                        continue  # 出错后只清空队列，避免检测线程阻塞
+                    frame_number, img, tracks, has_clip = item
+                    try:
+                        if has_clip:
+                            # 等待在该帧结束的片段的识别结果，再渲染该帧
+                            with results_ready:
+                                results_ready.wait_for(lambda: frame_number in action_results)
+                                id_to_ava_labels.update(action_results.pop(frame_number))
+
+                        if frame_records is not None:
+                            frame_records.append((frame_number, tracks.copy(),
+                                                  [id_to_ava_labels.get(int(row[5])) for row in tracks]))
+
+                        # 创建可视化图像（包含最新的行为信息）
+                        behaviors = [id_to_ava_labels.get(int(row[5]), 'walking') for row in tracks]
+                        collector.add_frame(frame_number, tracks, behaviors, img)
+                        if outputvideo:
+                            self._write_video_frame(outputvideo, img, (width, height), frame_number)
+
+                        # 更新进度
+                        rendered_frames += 1
+                        if progress_callback and frames_to_process > 0:
+                            progress = (rendered_frames / frames_to_process) * 100
+                            progress_callback(task_id, progress)
+                    except Exception as e:
+                        pipeline_errors.append(e)
+
+            action_thread = threading.Thread(target=action_worker, daemon=True)
+            render_thread = threading.Thread(target=render_worker, daemon=True)
+            action_thread.start()
+            render_thread.start()
+
+            # 分段检测时同一任务的各区间各自跟踪
+            tracker_key = f"{task_id}:{start_frame}"
+            tracker = self.tracker_pool.acquire(tracker_key)
+            try:
+                # YOLO检测（按 yolo_batch_size 批量推理，逐帧按顺序产出结果；非检测帧 pred 为 None）
+                for img, pred in self._iter_yolo_batches(cap, config, self.yolo_batch_size, frames_to_process, stride, roi):
+                    processed_frames += 1
+                    frame_number = start_frame + processed_frames
+
+                    if pred is None and stride.needs_refresh(tracker.tracker):
+                        boxes = self.yolo_model.predict(source=roi.crop(img) if roi else img, imgsz=config.imsize,
+                                                        device=config.device, verbose=False)[0].boxes
+                        pred = self._boxes_to_pred(boxes, roi, img.shape)
+                    stride.record(pred is not None)
+
+                    # 处理检测结果
+                    if pred is None:
+                        # 中间帧：使用卡尔曼预测的跟踪框
+                        temp = tracker.propagate(img)
+                        temp = temp if len(temp) else np.ones((0, 8)).astype(np.float32)
+                    elif len(pred) > 0:
+                        xywh = np.hstack(((pred[:, 0:2] + pred[:, 2:4]) / 2, pred[:, 2:4] - pred[:, 0:2]))
+
+                        # DeepSort跟踪
+                        temp = deepsort_update(tracker, pred, xywh, img)
+                        temp = temp if len(temp) else np.ones((0, 8)).astype(np.float32)
+
+                    # 行为识别（SlowFast）交给识别线程，检测/跟踪继续处理后续帧
+                    has_clip = len(cap.stack) == 25
+                    if has_clip:
+                        clip_queue.put((frame_number, cap.get_video_clip(), temp))
+                    render_queue.put((frame_number, img if outputvideo else None, temp, has_clip))
+                    if pipeline_errors:
                         break
-            
+
+                    # 检查任务是否被停止
+                    with self.task_lock:
+                        if task_id in self.current_tasks and self.current_tasks[task_id]['status'] == 'stopped':
+                            break
+            finally:
+                # 排空流水线：先让识别线程处理完已提交的片段，再结束渲染线程
+                clip_queue.put(None)
+                render_queue.put(None)
+                render_thread.join()
+                action_thread.join()
+                self.tracker_pool.release(tracker_key)
+
+            if pipeline_errors:
+                raise pipeline_errors[0]
+
             # 清理资源
             cap.release()
             if outputvideo:
@@ -1059,27 +1410,7 @@ class BehaviorDetectionService:
                     print(f"❌ 输出文件未生成: {config.output}")
 
             # 🔧 修复：输出时间窗口统计结果
-            video_duration = processed_frames / fps if fps > 0 else 0
-            print(f"\n📊 视频处理统计结果（时间窗口: {time_window_seconds}秒）:")
-            print(f"   视频时长: {video_duration:.1f}秒 (总帧数: {processed_frames}, 帧率: {fps}fps)")
-            print(f"   原始检测数: {total_detections_count} (按帧统计，用于性能分析)")
-            print(f"   有效行为数: {sum(behavior_counts.values())} (时间窗口去重)")
-            print(f"   报警次数: {total_alerts_count} (时间窗口去重)")
-            print(f"   行为统计详情 (时间窗口去重):")
-            if behavior_counts:
-                for behavior, count in behavior_counts.items():
-                    is_alert = behavior in alert_behavior_counts
-                    print(f"     - {behavior}: {count}次 {'⚠️报警' if is_alert else '✅正常'}")
-            else:
-                print(f"     - 无行为检测")
-            print(f"   最终结果数: {len(results)} (时间窗口去重后)")
-
-            # 🔧 数据一致性检查
-            expected_results = sum(behavior_counts.values())
-            if len(results) != expected_results:
-                print(f"   ⚠️ 数据一致性警告: 结果数({len(results)}) != 行为统计数({expected_results})")
-            else:
-                print(f"   ✅ 数据一致性: 正常")
+            collector.print_summary()
 
         except Exception as e:
             print(f"检测过程错误: {e}")
@@ -1117,27 +1448,76 @@ class BehaviorDetectionService:
             }
         
         # 🔧 修复：返回包含统计信息的完整结果
+        statistics = collector.get_statistics()
+        statistics['yolo_batch_size'] = self.yolo_batch_size
+        statistics['detection_stride'] = stride.stride
+        statistics['yolo_skip_ratio'] = round(stride.skip_ratio, 3)
+        if action_refresh is not None:
+            statistics['action_skip_ratio'] = round(action_refresh.skip_ratio, 3)
+        if tracker.reid_on_demand:
+            statistics['reid_skip_ratio'] = round(tracker.reid_skip_ratio, 3)
         return {
-            'results': results,
-            'statistics': {
-                'total_frames': processed_frames,
-                'video_duration': processed_frames / fps if fps > 0 else 0,
-                'fps': fps,
-                'raw_detections': total_detections_count,
-                'effective_behaviors': sum(behavior_counts.values()),
-                'alert_count': total_alerts_count,
-                'behavior_counts': behavior_counts,
-                'alert_behavior_counts': alert_behavior_counts,
-                'time_window_seconds': time_window_seconds
-            }
+            'results': collector.results,
+            'statistics': statistics
         }
+
+    def _iter_yolo_batches(self, cap, config, batch_size: int, max_frames: int = 0,
+                           stride: 'DetectionStride' = None, roi: 'RegionOfInterest' = None):
+        """
+        批量读取视频帧并执行YOLO检测，按帧顺序逐帧产出结果
+
+        Args:
+            cap: 视频读取器
+            config: 检测参数
+            batch_size: 每次读取的帧数，其中按步长需要检测的帧合并为一次YOLO推理
+            max_frames: 最多读取的帧数，0 表示读到视频结尾
+            stride: 检测步长，为None时每帧检测
+            roi: 关注区域，为None时检测整帧
+
+        Yields:
+            Tuple: (原始帧, 检测结果 [N, 6])，按步长跳过检测的帧检测结果为None
+        """
+        batch_size = max(1, int(batch_size))
+        read_frames = 0
+        while not cap.end:
+            frames = []
+            while len(frames) < batch_size and not cap.end:
+                if max_frames and read_frames >= max_frames:
+                    break
+                # 先不写入片段缓冲区，等到逐帧处理时再写入，保证SlowFast片段与跟踪结果对齐
+                ret, img = cap.read(push_to_stack=False)
+                if ret:
+                    frames.append(img)
+                    read_frames += 1
+            if not frames:
+                return
+
+            first_index = read_frames - len(frames)
+            detect_frames = [roi.crop(img) if roi else img for i, img in enumerate(frames)
+                             if stride is None or stride.is_scheduled(first_index + i)]
+            yolo_results = []
+            if detect_frames:
+                yolo_results = self.yolo_model.predict(
+                    source=detect_frames if len(detect_frames) > 1 else detect_frames[0],
+                    imgsz=config.imsize,
+                    device=config.device,
+                    verbose=False
+                )
+            yolo_results = iter(yolo_results)
+            for i, img in enumerate(frames):
+                cap.stack.append(img)
+                if stride is None or stride.is_scheduled(first_index + i):
+                    yield img, self._boxes_to_pred(next(yolo_results).boxes, roi, img.shape)
+                else:
+                    yield img, None
     
     def _run_realtime_detection(self, config, task_id: str, websocket_callback: callable = None):
         """
         执行实时检测的核心逻辑
         """
+        tracker = self.tracker_pool.acquire(task_id)
         try:
-            cap = MyVideoCapture(config.input)
+            cap = self._open_capture(config.input)
             id_to_ava_labels = {}
             frame_count = 0
 
@@ -1148,6 +1528,11 @@ class BehaviorDetectionService:
             # 统计相关变量
             last_stats_time = time.time()
             stats_interval = 2.0  # 每2秒推送一次统计数据
+            stride = self._new_detection_stride()
+            motion_gate = self._new_motion_gate()
+            action_refresh = self._new_action_refresh()
+            roi = self._get_roi(config.input)
+            temp = np.ones((0, 8)).astype(np.float32)
             
             while not cap.end:
                 # 检查任务状态
@@ -1161,29 +1546,32 @@ class BehaviorDetectionService:
                 
                 frame_count += 1
                 
-                # YOLO检测
-                yolo_results = self.yolo_model.predict(
-                    source=img, 
-                    imgsz=config.imsize, 
-                    device=config.device, 
-                    verbose=False
-                )
-                boxes = yolo_results[0].boxes
+                # 运动门控：画面静止时跳过检测、跟踪与行为识别
+                moving = motion_gate is None or motion_gate.check(img)
+
+                # YOLO检测（按步长跳过的帧使用卡尔曼预测的跟踪框）
+                pred = None
+                if moving:
+                    if stride.should_detect(frame_count - 1, tracker.tracker):
+                        boxes = self._detect_stream_frame(task_id, roi.crop(img) if roi else img).boxes
+                        pred = self._boxes_to_pred(boxes, roi, img.shape)
+                    stride.record(pred is not None)
                 
                 # 处理检测结果
                 detections = []
-                if len(boxes) > 0:
-                    pred_xyxy = boxes.xyxy.cpu().numpy()
-                    pred_conf = boxes.conf.cpu().numpy().reshape(-1, 1)
-                    pred_cls = boxes.cls.cpu().numpy().reshape(-1, 1)
-                    
-                    pred = np.hstack((pred_xyxy, pred_conf, pred_cls))
+                if not moving:
+                    pass
+                elif pred is None:
+                    temp = tracker.propagate(img)
+                    temp = temp if len(temp) else np.ones((0, 8)).astype(np.float32)
+                elif len(pred) > 0:
                     xywh = np.hstack(((pred[:, 0:2] + pred[:, 2:4]) / 2, pred[:, 2:4] - pred[:, 0:2]))
                     
                     # DeepSort跟踪
-                    temp = deepsort_update(self.deepsort_tracker, pred, xywh, img)
+                    temp = deepsort_update(tracker, pred, xywh, img)
                     temp = temp if len(temp) else np.ones((0, 8)).astype(np.float32)
-                    
+
+                if moving and (pred is None or len(pred) > 0):
                     # 格式化检测结果
                     for detection in temp:
                         if len(detection) >= 7:
@@ -1207,20 +1595,18 @@ class BehaviorDetectionService:
                     # 行为识别（SlowFast）
                     if len(cap.stack) == 25:
                         clip = cap.get_video_clip()
-                        if temp.shape[0] > 0:
+                        tracks = temp
+                        if action_refresh is not None and len(tracks):
+                            tracks = tracks[action_refresh.select(tracks, cap.idx, id_to_ava_labels)]
+                        if tracks.shape[0] > 0:
                             try:
-                                inputs, inp_boxes, _ = ava_inference_transform(clip, temp[:, 0:4], crop_size=config.imsize)
-                                inp_boxes = torch.cat([torch.zeros(inp_boxes.shape[0], 1), inp_boxes], dim=1)
+                                action_clip, clip_boxes, crop_size = self._crop_action_clip(clip, tracks, config.imsize, roi)
+                                inputs, inp_boxes, _ = ava_inference_transform(action_clip, clip_boxes, crop_size=crop_size)
+                                slowfaster_preds = self._infer_actions(task_id, [(inputs, inp_boxes)])[0]
+                                if action_refresh is not None:
+                                    action_refresh.record(tracks, cap.idx)
                                 
-                                if isinstance(inputs, list):
-                                    inputs = [inp.unsqueeze(0).to(config.device) for inp in inputs]
-                                else:
-                                    inputs = inputs.unsqueeze(0).to(config.device)
-                                
-                                with torch.no_grad():
-                                    slowfaster_preds = self.video_model(inputs, inp_boxes.to(config.device))
-                                
-                                for tid, avalabel in zip(temp[:, 5].tolist(), np.argmax(slowfaster_preds.cpu(), axis=1).tolist()):
+                                for tid, avalabel in zip(tracks[:, 5].tolist(), np.argmax(slowfaster_preds, axis=1).tolist()):
                                     behavior = self.ava_labelnames[avalabel + 1]
                                     id_to_ava_labels[tid] = behavior
                                     
@@ -1231,11 +1617,26 @@ class BehaviorDetectionService:
                                             det['is_anomaly'] = self._is_anomaly_behavior(behavior)
                             except Exception as e:
                                 print(f"实时SlowFast处理错误: {e}")
+                        cap.release_clip(clip)
                 
                 # 🔧 新增：更新实时统计数据
                 current_time = time.time()
                 frame_processing_time = current_time - (current_time - 0.04)  # 估算处理时间
                 realtime_stats.update_frame_stats(fps=25.0, processing_time=frame_processing_time)
+                if isinstance(cap, LatestFrameVideoCapture):
+                    realtime_stats.update_pipeline_stats(dropped_frames=cap.dropped_frames)
+                if self.yolo_scheduler is not None:
+                    realtime_stats.update_pipeline_stats(yolo_micro_batch=self.yolo_scheduler.get_stats())
+                if self.slowfast_scheduler is not None:
+                    realtime_stats.update_pipeline_stats(slowfast_batch=self.slowfast_scheduler.get_stats())
+                if stride.stride > 1:
+                    realtime_stats.update_pipeline_stats(yolo_skip_ratio=round(stride.skip_ratio, 3))
+                if motion_gate is not None:
+                    realtime_stats.update_pipeline_stats(motion_skip_ratio=round(motion_gate.skip_ratio, 3))
+                if action_refresh is not None:
+                    realtime_stats.update_pipeline_stats(action_skip_ratio=round(action_refresh.skip_ratio, 3))
+                if tracker.reid_on_demand:
+                    realtime_stats.update_pipeline_stats(reid_skip_ratio=round(tracker.reid_skip_ratio, 3))
 
                 if detections:
                     realtime_stats.add_detections(detections)
@@ -1279,7 +1680,120 @@ class BehaviorDetectionService:
         except Exception as e:
             print(f"实时检测错误: {e}")
             raise e
+        finally:
+            self.tracker_pool.release(task_id)
+            if self.yolo_scheduler is not None:
+                self.yolo_scheduler.remove_stream(task_id)
+            if self.slowfast_scheduler is not None:
+                self.slowfast_scheduler.remove_stream(task_id)
     
+    def _detect_stream_frame(self, stream_id: Any, img):
+        """
+        实时流单帧YOLO检测，启用微批调度时与其它流的帧合并推理
+
+        Args:
+            stream_id: 视频流标识
+            img: BGR图像
+
+        Returns:
+            Results: 该帧的YOLO检测结果
+        """
+        if self.yolo_scheduler is not None:
+            return self.yolo_scheduler.predict(stream_id, img)
+        return self.yolo_model.predict(source=img, imgsz=self.input_size, device=self.device, verbose=False)[0]
+
+    def _new_detection_stride(self) -> 'DetectionStride':
+        """按当前配置创建检测步长控制器（每路视频一个）"""
+        return DetectionStride(self.detection_stride, self.adaptive_stride, self.stride_max_uncertainty)
+
+    def _get_roi(self, source: Any) -> Optional['RegionOfInterest']:
+        """获取视频源配置的关注区域，未配置时返回None"""
+        region = self.camera_rois.get(str(source))
+        return RegionOfInterest(region) if region else None
+
+    def _boxes_to_pred(self, boxes, roi: Optional['RegionOfInterest'], frame_shape) -> np.ndarray:
+        """
+        YOLO检测框转换为 [N, 6] 数组（x1, y1, x2, y2, 置信度, 类别）
+
+        Args:
+            boxes: YOLO检测框
+            roi: 检测所用的关注区域，不为None时坐标映射回原图并丢弃区域外目标
+            frame_shape: 原图尺寸
+
+        Returns:
+            np.ndarray: 原图坐标的检测结果
+        """
+        pred_xyxy = boxes.xyxy.cpu().numpy()
+        pred_conf = boxes.conf.cpu().numpy().reshape(-1, 1)
+        pred_cls = boxes.cls.cpu().numpy().reshape(-1, 1)
+        pred = np.hstack((pred_xyxy, pred_conf, pred_cls))
+        if roi is not None:
+            pred = roi.to_frame(pred, frame_shape)
+        return pred
+
+    def _new_motion_gate(self) -> Optional['MotionGate']:
+        """按当前配置创建运动门控（每路视频一个），未启用时返回None"""
+        if not self.motion_gate:
+            return None
+        return MotionGate(self.motion_threshold, self.motion_force_interval)
+
+    def _new_action_refresh(self) -> Optional['ActionRefreshPolicy']:
+        """按当前配置创建行为识别刷新策略（每路视频一个），未启用时返回None"""
+        if not self.action_refresh:
+            return None
+        return ActionRefreshPolicy(self.action_max_label_age, self.action_motion_threshold,
+                                   self.action_shape_threshold, self.action_alert_max_age,
+                                   is_alert=self._is_anomaly_behavior)
+
+    def _crop_action_clip(self, clip, tracks, crop_size: int, roi: 'RegionOfInterest' = None):
+        """
+        按关注区域和 SlowFast 裁剪模式裁剪片段
+
+        Args:
+            clip: 片段张量 (C, T, H, W)
+            tracks: 跟踪结果 [N, 8]
+            crop_size: 整帧时的短边目标尺寸
+            roi: 该视频源的关注区域
+
+        Returns:
+            Tuple: (裁剪后片段, 裁剪图坐标的目标框, 短边目标尺寸)
+        """
+        boxes = tracks[:, 0:4]
+        if roi is not None:
+            clip, boxes, crop_size = roi.crop_clip(clip, boxes, crop_size)
+        if self.slowfast_crop_mode == 'person':
+            clip, boxes, crop_size = person_crop_clip(clip, np.hstack((boxes, tracks[:, 4:])), crop_size,
+                                                      self.person_crop_margin)
+        return clip, boxes, crop_size
+
+    def _infer_actions(self, stream_id: Any, clips: List[Tuple[Any, Any]]) -> List[Any]:
+        """
+        SlowFast行为识别，启用批量推理时与其它流的片段合并前向
+
+        Args:
+            stream_id: 视频流标识
+            clips: [(ava_inference_transform 输出的片段, 目标框 [N, 4]), ...]
+
+        Returns:
+            List: 各片段的行为得分 [N, 类别数]
+        """
+        if self.slowfast_scheduler is not None:
+            requests = [self.slowfast_scheduler.submit_clip(stream_id, inputs, boxes) for inputs, boxes in clips]
+            return [request.wait() for request in requests]
+        return batch_slowfast_inference(self.video_model, clips, self.device, self.slowfast_max_batch)
+
+    def _open_capture(self, source: Any):
+        """
+        按当前读取模式打开视频源
+
+        Args:
+            source: 摄像头ID或视频文件路径
+
+        Returns:
+            MyVideoCapture: 视频读取器（预解码模式下为 PrefetchVideoCapture，最新帧模式下为 LatestFrameVideoCapture）
+        """
+        return open_video_capture(source, self.capture_mode, self.prefetch_depth)
+
     def _is_anomaly_behavior(self, behavior: str) -> bool:
         """
         判断是否为异常行为
@@ -1337,6 +1851,97 @@ class BehaviorDetectionService:
             self.alert_behaviors = new_config['alert_behaviors']
             print(f"✓ 更新报警行为配置: {self.alert_behaviors}")
 
+        if 'capture_mode' in new_config:
+            self.capture_mode = new_config['capture_mode']
+            print(f"✓ 更新视频读取模式: {self.capture_mode}")
+
+        if 'prefetch_depth' in new_config:
+            self.prefetch_depth = new_config['prefetch_depth']
+            print(f"✓ 更新预解码队列深度: {self.prefetch_depth}")
+
+        if 'yolo_batch_size' in new_config:
+            self.yolo_batch_size = new_config['yolo_batch_size']
+            print(f"✓ 更新YOLO批量大小: {self.yolo_batch_size}")
+
+        if 'detection_stride' in new_config:
+            self.detection_stride = new_config['detection_stride']
+            print(f"✓ 更新检测步长: {self.detection_stride}")
+
+        if 'adaptive_stride' in new_config:
+            self.adaptive_stride = new_config['adaptive_stride']
+            print(f"✓ 更新自适应检测步长: {self.adaptive_stride}")
+
+        if 'motion_gate' in new_config:
+            self.motion_gate = new_config['motion_gate']
+            print(f"✓ 更新运动门控: {self.motion_gate}")
+
+        if 'action_refresh' in new_config:
+            self.action_refresh = new_config['action_refresh']
+            print(f"✓ 更新行为识别按目标刷新: {self.action_refresh}")
+
+        if 'action_max_label_age' in new_config:
+            self.action_max_label_age = new_config['action_max_label_age']
+            print(f"✓ 更新行为标签最长沿用帧数: {self.action_max_label_age}")
+
+        if 'clip_queue_size' in new_config:
+            self.clip_queue_size = new_config['clip_queue_size']
+            print(f"✓ 更新行为识别片段队列长度: {self.clip_queue_size}")
+
+        if 'clip_queue_policy' in new_config:
+            self.clip_queue_policy = new_config['clip_queue_policy']
+            print(f"✓ 更新行为识别片段队列策略: {self.clip_queue_policy}")
+
+        if 'slowfast_crop_mode' in new_config:
+            self.slowfast_crop_mode = new_config['slowfast_crop_mode']
+            print(f"✓ 更新SlowFast裁剪模式: {self.slowfast_crop_mode}")
+
+        if 'tracker_idle_timeout' in new_config:
+            self.tracker_idle_timeout = new_config['tracker_idle_timeout']
+            if self.tracker_pool is not None:
+                self.tracker_pool.idle_timeout = self.tracker_idle_timeout
+            print(f"✓ 更新跟踪器空闲回收时间: {self.tracker_idle_timeout}秒")
+
+        if 'reid_gallery_mode' in new_config or 'reid_gallery_dtype' in new_config:
+            self.reid_gallery_mode = new_config.get('reid_gallery_mode', self.reid_gallery_mode)
+            self.reid_gallery_dtype = new_config.get('reid_gallery_dtype', self.reid_gallery_dtype)
+            # 只影响之后新建的跟踪器，正在运行的视频流保持原有特征库
+            if self.tracker_pool is not None:
+                self.tracker_pool.deepsort_kwargs.update(gallery=self.reid_gallery_mode,
+                                                         gallery_dtype=self.reid_gallery_dtype)
+            print(f"✓ 更新外观特征库: {self.reid_gallery_mode}, {self.reid_gallery_dtype}")
+
+        if 'reid_on_demand' in new_config or 'reid_refresh_interval' in new_config:
+            self.reid_on_demand = new_config.get('reid_on_demand', self.reid_on_demand)
+            self.reid_refresh_interval = new_config.get('reid_refresh_interval', self.reid_refresh_interval)
+            if self.tracker_pool is not None:
+                self.tracker_pool.deepsort_kwargs.update(reid_on_demand=self.reid_on_demand,
+                                                         reid_refresh_interval=self.reid_refresh_interval)
+            print(f"✓ 更新按需提取外观特征: {self.reid_on_demand}, 刷新间隔={self.reid_refresh_interval}")
+
+        if 'reid_preprocess_workers' in new_config:
+            self.reid_preprocess_workers = new_config['reid_preprocess_workers']
+            if self.deepsort_tracker is not None:
+                self.deepsort_tracker.extractor.preprocess.num_workers = self.reid_preprocess_workers
+            print(f"✓ 更新ReID预处理线程数: {self.reid_preprocess_workers}")
+
+        if 'tracker_matching' in new_config:
+            self.tracker_matching = new_config['tracker_matching']
+            if self.tracker_pool is not None:
+                self.tracker_pool.deepsort_kwargs['matching'] = self.tracker_matching
+            print(f"✓ 更新跟踪关联方式: {self.tracker_matching}")
+
+        if 'camera_rois' in new_config:
+            self.camera_rois = new_config['camera_rois']
+            print(f"✓ 更新关注区域配置: {len(self.camera_rois)} 个视频源")
+
+        if 'video_segments' in new_config:
+            self.video_segments = new_config['video_segments']
+            print(f"✓ 更新视频分段数量: {self.video_segments}")
+
+        if 'segment_overlap_frames' in new_config:
+            self.segment_overlap_frames = new_config['segment_overlap_frames']
+            print(f"✓ 更新分段重叠帧数: {self.segment_overlap_frames}")
+
         print(f"✓ 配置更新完成，当前配置: device={self.device}, confidence={self.confidence_threshold}, alert_behaviors={self.alert_behaviors}")
 
 
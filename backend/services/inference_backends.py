@@ -0,0 +1,267 @@
+"""
+推理后端抽象
+YOLO、SlowFast、DeepSort ReID 三个模型可分别选择 PyTorch（eager）或 ONNX Runtime（CPU）执行。
+ONNX 模型在首次使用时导出，并缓存在权重文件旁（权重更新后自动重新导出），流水线代码无需改动。
+"""
+import os
+import inspect
+from typing import Any, Dict, List
+
+import torch
+
+BACKEND_PYTORCH = 'pytorch'
+BACKEND_ONNX = 'onnx'
+MODEL_NAMES = ('yolo', 'slowfast', 'reid')
+
+ONNX_OPSET = 17
+QUANT_MODES = ('dynamic', 'static')
+
+
+def _export_kwargs() -> Dict[str, Any]:
+    # 新版本 torch 默认使用 dynamo 导出器，这里固定使用兼容 dynamic_axes 的 TorchScript 导出器
+    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+        return {'dynamo': False}
+    return {}
+
+
+def resolve_backends(backends: Dict[str, str] = None) -> Dict[str, str]:
+    """
+    补全并校验各模型的推理后端配置
+
+    Args:
+        backends: {模型名: 'pytorch' | 'onnx'}，未配置的模型使用 PyTorch
+
+    Returns:
+        Dict: 三个模型的推理后端
+    """
+    resolved = {name: BACKEND_PYTORCH for name in MODEL_NAMES}
+    for name, backend in (backends or {}).items():
+        if name not in resolved:
+            raise ValueError(f"未知的模型: {name}，可选: {', '.join(MODEL_NAMES)}")
+        if backend not in (BACKEND_PYTORCH, BACKEND_ONNX):
+            raise ValueError(f"未知的推理后端: {backend}，可选: {BACKEND_PYTORCH}, {BACKEND_ONNX}")
+        resolved[name] = backend
+    return resolved
+
+
+def onnx_cache_path(weights_path: str) -> str:
+    """权重文件对应的ONNX缓存路径（同目录同名，扩展名为 .onnx）"""
+    return os.path.splitext(weights_path)[0] + '.onnx'
+
+
+def _needs_export(onnx_path: str, weights_path: str) -> bool:
+    if not os.path.exists(onnx_path):
+        return True
+    return os.path.exists(weights_path) and os.path.getmtime(weights_path) > os.path.getmtime(onnx_path)
+
+
+def create_ort_session(onnx_path: str, num_threads: int = 0):
+    """
+    创建 ONNX Runtime CPU 推理会话
+
+    Args:
+        onnx_path: ONNX模型路径
+        num_threads: 算子内线程数，0 表示由 ONNX Runtime 决定
+    """
+    try:
+        import onnxruntime as ort
+    except ImportError as e:
+        raise RuntimeError('ONNX推理后端需要安装 onnxruntime: pip install onnxruntime') from e
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if num_threads > 0:
+        options.intra_op_num_threads = num_threads
+    return ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+
+
+class OnnxModule:
+    """以 nn.Module 的调用方式运行ONNX模型：输入可为张量或张量列表，输出为CPU张量"""
+
+    def __init__(self, onnx_path: str, num_threads: int = 0):
+        self.onnx_path = onnx_path
+        self.session = create_ort_session(onnx_path, num_threads)
+        self.input_names = [node.name for node in self.session.get_inputs()]
+        # 首个输入的批量维度：动态维度为 None，旧版本导出的固定批量模型为具体数值
+        batch_dim = self.session.get_inputs()[0].shape[0] if self.session.get_inputs()[0].shape else None
+        self.max_batch = batch_dim if isinstance(batch_dim, int) else None
+
+    def feeds(self, *inputs) -> Dict[str, Any]:
+        """将调用参数转换为 ONNX Runtime 的输入字典"""
+        tensors = []
+        for item in inputs:
+            tensors.extend(item if isinstance(item, (list, tuple)) else [item])
+        return {name: tensor.detach().cpu().float().contiguous().numpy()
+                for name, tensor in zip(self.input_names, tensors)}
+
+    def __call__(self, *inputs):
+        outputs = self.session.run(None, self.feeds(*inputs))
+        if len(outputs) == 1:
+            return torch.from_numpy(outputs[0])
+        return tuple(torch.from_numpy(output) for output in outputs)
+
+    def eval(self):
+        return self
+
+    def to(self, *args, **kwargs):
+        # ONNX Runtime 会话固定在CPU上执行
+        return self
+
+
+class _SlowFastExportWrapper(torch.nn.Module):
+    """将 SlowFast 的 ([slow, fast], boxes) 输入展开为独立参数，便于导出"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, slow, fast, boxes):
+        return self.model([slow, fast], boxes)
+
+
+def export_slowfast_onnx(model, onnx_path: str, crop_size: int = 640):
+    """
+    导出 slowfast_r50_detection 为ONNX（批量、输入分辨率与目标框数量均为动态维度）
+
+    Args:
+        model: 已加载权重的 SlowFast 模型
+        onnx_path: 输出路径
+        crop_size: 导出时样例输入的短边尺寸
+    """
+    height, width = crop_size, int(crop_size * 16 / 9)
+    slow = torch.randn(1, 3, 8, height, width)
+    fast = torch.randn(1, 3, 32, height, width)
+    boxes = torch.tensor([[0, 0.1 * width, 0.1 * height, 0.5 * width, 0.9 * height]], dtype=torch.float32)
+    clip_axes = {0: 'batch', 3: 'height', 4: 'width'}
+    torch.onnx.export(
+        _SlowFastExportWrapper(model.cpu().eval()), (slow, fast, boxes), onnx_path,
+        input_names=['slow', 'fast', 'boxes'], output_names=['scores'],
+        dynamic_axes={'slow': clip_axes, 'fast': clip_axes, 'boxes': {0: 'num_boxes'}, 'scores': {0: 'num_boxes'}},
+        opset_version=ONNX_OPSET, **_export_kwargs()
+    )
+
+
+def export_reid_onnx(net, onnx_path: str):
+    """
+    导出 DeepSort ReID 网络为ONNX（批量维度为动态维度）
+
+    Args:
+        net: 已加载权重的 ReID 网络（reid=True）
+        onnx_path: 输出路径
+    """
+    crops = torch.randn(1, 3, 128, 64)
+    torch.onnx.export(
+        net.cpu().eval(), (crops,), onnx_path,
+        input_names=['crops'], output_names=['features'],
+        dynamic_axes={'crops': {0: 'batch'}, 'features': {0: 'batch'}},
+        opset_version=ONNX_OPSET, **_export_kwargs()
+    )
+
+
+def load_yolo(model_path: str, backend: str = BACKEND_PYTORCH, imgsz: int = 640):
+    """
+    加载YOLO模型，ONNX后端时使用 ultralytics 导出（动态输入尺寸）并以 ONNX Runtime 推理
+
+    Args:
+        model_path: .pt 权重路径
+        backend: 推理后端
+        imgsz: 导出时的输入尺寸
+
+    Returns:
+        YOLO: ultralytics 模型，两种后端的 predict 接口一致
+    """
+    from ultralytics import YOLO
+
+    if backend != BACKEND_ONNX:
+        return YOLO(model_path)
+
+    onnx_path = onnx_cache_path(model_path)
+    if _needs_export(onnx_path, model_path):
+        print(f"⏳ 导出YOLO ONNX模型: {onnx_path}")
+        exported = YOLO(model_path).export(format='onnx', imgsz=imgsz, dynamic=True, opset=ONNX_OPSET)
+        if os.path.abspath(exported) != os.path.abspath(onnx_path):
+            os.replace(exported, onnx_path)
+    return YOLO(onnx_path, task='detect')
+
+
+def to_onnx_slowfast(model, weights_path: str, crop_size: int = 640, num_threads: int = 0) -> OnnxModule:
+    """
+    将 SlowFast 模型切换为 ONNX Runtime 执行（缓存不存在或已过期时先导出）
+
+    Returns:
+        OnnxModule: 调用方式与原模型相同：model([slow, fast], boxes)
+    """
+    onnx_path = onnx_cache_path(weights_path)
+    if _needs_export(onnx_path, weights_path):
+        print(f"⏳ 导出SlowFast ONNX模型: {onnx_path}")
+        export_slowfast_onnx(model, onnx_path, crop_size)
+    module = OnnxModule(onnx_path, num_threads)
+    if module.max_batch is not None:
+        # 旧版本导出的缓存批量维度固定为1，批量推理会失败，重新导出
+        print(f"⏳ 缓存的SlowFast ONNX模型批量维度固定为 {module.max_batch}，重新导出: {onnx_path}")
+        export_slowfast_onnx(model, onnx_path, crop_size)
+        module = OnnxModule(onnx_path, num_threads)
+    return module
+
+
+def to_onnx_reid(extractor, weights_path: str, num_threads: int = 0) -> Any:
+    """
+    将 DeepSort 特征提取器的 ReID 网络切换为 ONNX Runtime 执行（缓存不存在或已过期时先导出）
+
+    Args:
+        extractor: deep_sort Extractor
+        weights_path: ReID 权重路径
+        num_threads: 算子内线程数
+
+    Returns:
+        Extractor: 原特征提取器（net 已替换）
+    """
+    onnx_path = onnx_cache_path(weights_path)
+    if _needs_export(onnx_path, weights_path):
+        print(f"⏳ 导出ReID ONNX模型: {onnx_path}")
+        export_reid_onnx(extractor.net, onnx_path)
+    extractor.net = OnnxModule(onnx_path, num_threads)
+    extractor.device = 'cpu'
+    return extractor
+
+
+def quantized_onnx_path(weights_path: str, mode: str) -> str:
+    """权重文件对应的INT8量化模型路径"""
+    return os.path.splitext(weights_path)[0] + f'.int8-{mode}.onnx'
+
+
+def quantize_onnx(onnx_path: str, output_path: str, mode: str = 'dynamic', calibration_feeds: List[Dict] = None):
+    """
+    使用 ONNX Runtime 将FP32模型量化为INT8
+
+    Args:
+        onnx_path: FP32 ONNX模型路径
+        output_path: 量化模型输出路径
+        mode: 'dynamic' 仅离线量化权重，激活在运行时量化；'static' 用校准数据确定激活量化参数
+        calibration_feeds: 静态量化的校准输入（OnnxModule.feeds 的输出列表）
+    """
+    try:
+        from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                              quantize_dynamic, quantize_static)
+    except ImportError as e:
+        raise RuntimeError('INT8量化需要安装 onnxruntime: pip install onnxruntime') from e
+
+    if mode == 'dynamic':
+        # ConvInteger 在 CPU 上只支持 uint8 权重
+        quantize_dynamic(onnx_path, output_path, weight_type=QuantType.QUInt8)
+        return
+    if mode != 'static':
+        raise ValueError(f"未知的量化模式: {mode}，可选: {', '.join(QUANT_MODES)}")
+    if not calibration_feeds:
+        raise ValueError('静态量化需要校准数据')
+
+    class _FeedReader(CalibrationDataReader):
+        def __init__(self, feeds):
+            self._feeds = iter(feeds)
+
+        def get_next(self):
+            return next(self._feeds, None)
+
+    quantize_static(onnx_path, output_path, _FeedReader(calibration_feeds),
+                    quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
@@ -0,0 +1,249 @@
+"""
+跨视频流的微批推理调度器
+收集各路视频流在很短时间窗口内提交的推理请求，合并为一次批量推理，再把结果分发回各路流
+- YoloBatchScheduler: 逐帧目标检测
+- SlowFastBatchScheduler: 25帧片段的行为识别
+"""
+import time
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Dict, List
+
+
+class _InferenceRequest:
+    """单个推理请求"""
+
+    __slots__ = ('payload', 'submit_time', 'done', 'result', 'error')
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.submit_time = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self):
+        """等待并返回推理结果"""
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class MicroBatchScheduler:
+    """微批调度器基类，子类实现 _infer 完成一批请求的推理
+
+    - 最大等待：任一请求最多等待 max_wait_ms 即随批次下发（批次已满时更早下发）
+    - 公平性：组批时按流轮询，每轮每路流最多取一个请求，下一批从上次之后的流开始，避免单路流占满批次
+    """
+
+    name = '推理'
+
+    def __init__(self, max_batch_size: int = 8, max_wait_ms: float = 8.0):
+        """
+        初始化调度器
+
+        Args:
+            max_batch_size: 单批最多请求数
+            max_wait_ms: 请求的最长等待时间（毫秒）
+        """
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+
+        self._pending = OrderedDict()  # 流ID -> 待处理请求队列
+        self._cond = threading.Condition()
+        self._running = True
+
+        # 运行指标
+        self.batch_count = 0
+        self.frame_count = 0
+
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, stream_id: Any, payload) -> _InferenceRequest:
+        """
+        提交一个推理请求（不等待结果）
+
+        Args:
+            stream_id: 视频流标识
+            payload: 推理输入
+
+        Returns:
+            _InferenceRequest: 调用其 wait() 获取结果
+        """
+        request = _InferenceRequest(payload)
+        with self._cond:
+            if not self._running:
+                raise RuntimeError(f'{self.name}调度器已停止')
+            self._pending.setdefault(stream_id, deque()).append(request)
+            self._cond.notify()
+        return request
+
+    def remove_stream(self, stream_id: Any):
+        """移除已结束的视频流"""
+        with self._cond:
+            requests = self._pending.pop(stream_id, None)
+        for request in requests or []:
+            request.error = RuntimeError('视频流已移除')
+            request.done.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取调度器运行指标"""
+        with self._cond:
+            pending = sum(len(q) for q in self._pending.values())
+            streams = len(self._pending)
+        return {
+            'batches': self.batch_count,
+            'frames': self.frame_count,
+            'avg_batch_size': round(self.frame_count / self.batch_count, 2) if self.batch_count else 0,
+            'pending': pending,
+            'streams': streams
+        }
+
+    def shutdown(self):
+        """停止调度线程，未处理的请求以异常结束"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._worker.join(timeout=2.0)
+        with self._cond:
+            for stream_id in list(self._pending):
+                for request in self._pending.pop(stream_id):
+                    request.error = RuntimeError(f'{self.name}调度器已停止')
+                    request.done.set()
+
+    def _infer(self, payloads: List[Any]) -> List[Any]:
+        """对一批输入执行推理，按顺序返回各请求的结果"""
+        raise NotImplementedError
+
+    def _pending_count(self) -> int:
+        return sum(len(q) for q in self._pending.values())
+
+    def _collect_batch(self) -> List[_InferenceRequest]:
+        with self._cond:
+            while self._running and not self._pending_count():
+                self._cond.wait()
+            if not self._running:
+                return []
+
+            # 以最早请求的提交时间计算截止时间，保证最大等待
+            oldest = min(q[0].submit_time for q in self._pending.values() if q)
+            deadline = oldest + self.max_wait
+            while self._running and self._pending_count() < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = []
+            while len(batch) < self.max_batch_size and self._pending_count():
+                for stream_id in list(self._pending):
+                    queue_ = self._pending[stream_id]
+                    if queue_ and len(batch) < self.max_batch_size:
+                        batch.append(queue_.popleft())
+                        # 被服务过的流移到末尾，下一批优先其它流
+                        self._pending.move_to_end(stream_id)
+            return batch
+
+    def _run(self):
+        while self._running:
+            batch = self._collect_batch()
+            if not batch:
+                continue
+            try:
+                results = self._infer([request.payload for request in batch])
+                for request, result in zip(batch, results):
+                    request.result = result
+            except Exception as e:
+                print(f"{self.name}批量推理错误: {e}")
+                for request in batch:
+                    request.error = e
+            finally:
+                self.batch_count += 1
+                self.frame_count += len(batch)
+                for request in batch:
+                    request.done.set()
+
+
+class YoloBatchScheduler(MicroBatchScheduler):
+    """YOLO微批调度器：合并各路流的单帧检测请求"""
+
+    name = 'YOLO'
+
+    def __init__(self, model, imgsz: int, device: str, max_batch_size: int = 8, max_wait_ms: float = 8.0):
+        """
+        初始化调度器
+
+        Args:
+            model: 共享的YOLO模型
+            imgsz: 推理输入尺寸
+            device: 推理设备
+            max_batch_size: 单批最多帧数
+            max_wait_ms: 请求的最长等待时间（毫秒）
+        """
+        self.model = model
+        self.imgsz = imgsz
+        self.device = device
+        super().__init__(max_batch_size, max_wait_ms)
+
+    def predict(self, stream_id: Any, image):
+        """
+        提交一帧并等待检测结果
+
+        Args:
+            stream_id: 视频流标识
+            image: BGR图像
+
+        Returns:
+            ultralytics Results: 该帧的检测结果
+        """
+        return self.submit(stream_id, image).wait()
+
+    def _infer(self, payloads):
+        return self.model.predict(source=payloads if len(payloads) > 1 else payloads[0],
+                                  imgsz=self.imgsz, device=self.device, verbose=False)
+
+
+class SlowFastBatchScheduler(MicroBatchScheduler):
+    """SlowFast微批调度器：合并各路流（或同一路流积压的多个窗口）的片段，按输入尺寸分组后批量推理"""
+
+    name = 'SlowFast'
+
+    def __init__(self, model, device: str, max_batch_size: int = 4, max_wait_ms: float = 20.0):
+        """
+        初始化调度器
+
+        Args:
+            model: 共享的SlowFast模型
+            device: 推理设备
+            max_batch_size: 单批最多片段数
+            max_wait_ms: 请求的最长等待时间（毫秒）
+        """
+        from yolo_slowfast import batch_slowfast_inference
+
+        self.model = model
+        self.device = device
+        self._batch_inference = batch_slowfast_inference
+        super().__init__(max_batch_size, max_wait_ms)
+
+    def submit_clip(self, stream_id: Any, inputs, boxes) -> _InferenceRequest:
+        """
+        提交一个片段（不等待结果）
+
+        Args:
+            stream_id: 视频流标识
+            inputs: ava_inference_transform 输出的片段（不含批量维度）
+            boxes: 片段上的目标框 [N, 4]
+
+        Returns:
+            _InferenceRequest: wait() 返回该片段各目标的行为得分 [N, 类别数]
+        """
+        return self.submit(stream_id, (inputs, boxes))
+
+    def predict(self, stream_id: Any, inputs, boxes):
+        """提交一个片段并等待行为得分"""
+        return self.submit_clip(stream_id, inputs, boxes).wait()
+
+    def _infer(self, payloads):
+        return self._batch_inference(self.model, payloads, self.device, self.max_batch_size)
@@ -46,6 +46,9 @@ class RealtimeStatistics:
         self.fps_history = deque(maxlen=30)  # 保留最近30秒的FPS
         self.processing_times = deque(maxlen=30)  # 保留最近30次的处理时间
 
+        # 处理流水线指标（丢帧数、跳帧比例等）
+        self.pipeline_stats = {}
+
         # 线程锁
         self._lock = threading.Lock()
         
@@ -78,6 +81,16 @@ class RealtimeStatistics:
             if processing_time > 0:
                 self.processing_times.append(processing_time)
     
+    def update_pipeline_stats(self, **stats):
+        """
+        更新处理流水线指标
+
+        Args:
+            **stats: 指标名称到数值的映射，例如 dropped_frames=12
+        """
+        with self._lock:
+            self.pipeline_stats.update(stats)
+
     def add_detections(self, detections: List[Dict[str, Any]]):
         """
         添加检测结果（使用时间窗口去重统计）
@@ -227,7 +240,9 @@ class RealtimeStatistics:
                 'alert_behaviors': self.alert_behaviors,
                 # 🔧 新增：时间窗口统计信息
                 'time_window_seconds': self.time_window_seconds,
-                'counting_method': f'{self.time_window_seconds}秒内去重统计'
+                'counting_method': f'{self.time_window_seconds}秒内去重统计',
+                # 处理流水线指标
+                'pipeline_stats': dict(self.pipeline_stats)
             }
     
     def reset(self):
@@ -243,6 +258,7 @@ class RealtimeStatistics:
             self.recent_alerts.clear()
             self.fps_history.clear()
             self.processing_times.clear()
+            self.pipeline_stats.clear()
             # 🔧 清理时间窗口记录
             self.behavior_last_time.clear()
             self.alert_last_time.clear()
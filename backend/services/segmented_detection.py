@@ -0,0 +1,349 @@
+"""
+视频分段并行检测模块
+将上传的视频按时间切分为多个区间，在进程池中并行检测（每个进程持有独立的 YOLO/SlowFast/DeepSort 实例），
+再通过重叠区间的框匹配统一各段的 DeepSort 跟踪ID，合并为与单进程检测相同格式的结果
+"""
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Tuple, Any
+
+import cv2
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+
+# 进程内的检测服务实例（由进程池 initializer 创建）
+_worker_service = None
+
+
+def plan_segments(total_frames: int, num_segments: int, overlap_frames: int) -> List[Tuple[int, int, int]]:
+    """
+    划分视频区间
+
+    Args:
+        total_frames: 视频总帧数
+        num_segments: 区间数量
+        overlap_frames: 相邻区间的重叠帧数（后一段提前开始读取，用于预热跟踪器和匹配跟踪ID）
+
+    Returns:
+        List: [(读取起始帧, 输出起始帧, 结束帧), ...]，结束帧不含
+    """
+    num_segments = max(1, min(num_segments, total_frames))
+    bounds = np.linspace(0, total_frames, num_segments + 1).astype(int)
+    segments = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        segments.append((max(0, int(start) - overlap_frames), int(start), int(end)))
+    return segments
+
+
+def _init_worker(service_config: Dict[str, Any], torch_threads: int):
+    """进程池初始化：每个进程创建并初始化自己的检测服务"""
+    global _worker_service
+    import torch
+    from .detection_service import BehaviorDetectionService
+
+    torch.set_num_threads(max(1, torch_threads))
+    _worker_service = BehaviorDetectionService(service_config)
+    if not _worker_service.initialize_models():
+        raise RuntimeError('分段检测进程模型初始化失败')
+
+
+def _detect_segment(video_path: str, read_start: int, end_frame: int, imsize: int) -> Dict[str, Any]:
+    """
+    在工作进程中检测一个区间
+
+    Returns:
+        Dict: 包含逐帧跟踪记录 records 和视频帧率 fps
+
+    Raises:
+        RuntimeError: 区间检测失败（_run_detection 返回了错误结果）
+    """
+    service = _worker_service
+    config = type('Config', (), {})()
+    config.input = video_path
+    config.output = ''
+    config.imsize = imsize
+    config.device = service.device
+    config.show = False
+    config.conf = service.confidence_threshold
+    config.iou = 0.4
+    config.classes = None
+
+    task_id = f"segment_{read_start}_{end_frame}"
+    records = []
+    detection_result = service._run_detection(config, task_id, None, start_frame=read_start,
+                                              end_frame=end_frame, frame_records=records)
+    # _run_detection 出错时只打印错误并返回 error 标记，这里转为异常交给主进程处理
+    if detection_result.get('statistics', {}).get('error'):
+        raise RuntimeError(f'区间 {read_start}-{end_frame} 检测失败')
+    return {
+        'records': records,
+        'fps': detection_result.get('statistics', {}).get('fps', 25)
+    }
+
+
+def _box_iou(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """计算两组 xyxy 框的两两 IoU"""
+    tl = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    br = np.minimum(boxes_a[:, None, 2:4], boxes_b[None, :, 2:4])
+    wh = np.clip(br - tl, 0, None)
+    inter = wh[..., 0] * wh[..., 1]
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+def match_overlap_tracks(prev_records: Dict[int, np.ndarray], next_records: Dict[int, np.ndarray],
+                         min_iou: float = 0.3) -> Dict[int, int]:
+    """
+    根据重叠区间内的框位置匹配前后两段的跟踪ID
+
+    Args:
+        prev_records: 前一段在重叠区间内的 {帧序号: 跟踪结果}（ID已统一为全局ID）
+        next_records: 后一段在重叠区间内的 {帧序号: 跟踪结果}（段内局部ID）
+        min_iou: 平均IoU低于该值的配对视为不同目标
+
+    Returns:
+        Dict: {后一段局部ID: 全局ID}
+    """
+    iou_sum, overlap_count = {}, {}
+    for frame_number, next_tracks in next_records.items():
+        prev_tracks = prev_records.get(frame_number)
+        if prev_tracks is None or not len(prev_tracks) or not len(next_tracks):
+            continue
+        ious = _box_iou(prev_tracks[:, 0:4].astype(np.float64), next_tracks[:, 0:4].astype(np.float64))
+        for i, prev_row in enumerate(prev_tracks):
+            for j, next_row in enumerate(next_tracks):
+                # 只在同类别之间匹配
+                if int(prev_row[4]) != int(next_row[4]):
+                    continue
+                key = (int(prev_row[5]), int(next_row[5]))
+                iou_sum[key] = iou_sum.get(key, 0.0) + ious[i, j]
+                overlap_count[key] = overlap_count.get(key, 0) + 1
+
+    if not iou_sum:
+        return {}
+
+    prev_ids = sorted({k[0] for k in iou_sum})
+    next_ids = sorted({k[1] for k in iou_sum})
+    cost = np.ones((len(prev_ids), len(next_ids)))
+    for (prev_id, next_id), total in iou_sum.items():
+        # 以共同出现帧上的平均IoU作为相似度
+        cost[prev_ids.index(prev_id), next_ids.index(next_id)] = 1.0 - total / overlap_count[(prev_id, next_id)]
+
+    mapping = {}
+    rows, cols = linear_sum_assignment(cost)
+    for row, col in zip(rows, cols):
+        if 1.0 - cost[row, col] >= min_iou:
+            mapping[next_ids[col]] = prev_ids[row]
+    return mapping
+
+
+def merge_segment_records(segments: List[Tuple[int, int, int]], segment_records: List[list],
+                          min_iou: float = 0.3) -> List[Tuple[int, np.ndarray, List[str]]]:
+    """
+    合并各段的逐帧跟踪记录，统一跟踪ID
+
+    Args:
+        segments: plan_segments 的输出
+        segment_records: 与 segments 对应的逐帧记录 [(帧序号, 跟踪结果, 行为标签列表), ...]
+        min_iou: 跟踪ID匹配的最小平均IoU
+
+    Returns:
+        List: 按帧排序的 [(帧序号, 跟踪结果, 行为标签列表)]，跟踪ID为全局ID，行为标签已补全
+    """
+    merged = []
+    next_global_id = 1
+    last_labels = {}          # 全局ID -> 最近一次识别出的行为
+    prev_overlap = {}         # 前一段在下一段重叠区间内的 {帧序号: 跟踪结果(全局ID)}
+
+    for segment_index, ((read_start, start, end), records) in enumerate(zip(segments, segment_records)):
+        # 与前一段匹配重叠区间内的跟踪ID
+        overlap = {frame_number: tracks for frame_number, tracks, _ in records if frame_number <= start}
+        id_map = match_overlap_tracks(prev_overlap, overlap, min_iou) if segment_index > 0 else {}
+        if id_map:
+            print(f"🔗 区间 {segment_index}: 跨段匹配跟踪ID {len(id_map)} 个")
+
+        next_read_start = segments[segment_index + 1][0] if segment_index + 1 < len(segments) else end
+        prev_overlap = {}
+        for frame_number, tracks, behaviors in records:
+            # 为本段新出现的跟踪目标分配全局ID
+            for row in tracks:
+                local_id = int(row[5])
+                if local_id not in id_map:
+                    id_map[local_id] = next_global_id
+                    next_global_id += 1
+
+            global_tracks = tracks.copy()
+            if len(global_tracks):
+                global_tracks[:, 5] = [id_map[int(row[5])] for row in tracks]
+
+            if frame_number > next_read_start:
+                prev_overlap[frame_number] = global_tracks
+            if frame_number <= start:
+                # 重叠区间的帧以前一段的结果为准
+                continue
+
+            labels = []
+            for row, behavior in zip(global_tracks, behaviors):
+                global_id = int(row[5])
+                if behavior is None:
+                    # 本段尚未完成首次行为识别时，沿用跨段匹配到的目标在前一段的行为
+                    behavior = last_labels.get(global_id, 'walking')
+                else:
+                    last_labels[global_id] = behavior
+                labels.append(behavior)
+            merged.append((frame_number, global_tracks, labels))
+
+    merged.sort(key=lambda item: item[0])
+    return merged
+
+
+def run_segmented_detection(service, config, task_id: str, num_segments: int,
+                            overlap_frames: int = 25, progress_callback: callable = None) -> Dict[str, Any]:
+    """
+    分段并行检测视频文件
+
+    Args:
+        service: 主进程中的检测服务（用于结果统计、渲染和任务状态）
+        config: 检测参数（与 _run_detection 相同）
+        task_id: 任务ID
+        num_segments: 并行区间数量
+        overlap_frames: 相邻区间的重叠帧数
+        progress_callback: 进度回调函数
+
+    Returns:
+        Dict: 与 _run_detection 相同格式的检测结果
+    """
+    from .detection_service import VideoResultCollector
+
+    video = cv2.VideoCapture(config.input)
+    total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = int(video.get(cv2.CAP_PROP_FPS)) or 25
+    width, height = int(video.get(3)), int(video.get(4))
+    video.release()
+    if total_frames <= 0:
+        print("⚠ 无法获取视频总帧数，回退到单进程检测")
+        return service._run_detection(config, task_id, progress_callback)
+
+    segments = plan_segments(total_frames, num_segments, overlap_frames)
+    print(f"📹 分段并行检测: {len(segments)} 个区间, 重叠 {overlap_frames} 帧, 总帧数 {total_frames}")
+
+    service_config = {
+        'device': service.device,
+        'input_size': service.input_size,
+        'confidence_threshold': service.confidence_threshold,
+        'alert_behaviors': service.alert_behaviors,
+        'capture_mode': service.capture_mode,
+        'prefetch_depth': service.prefetch_depth,
+        'pipeline_clip_queue_size': service.pipeline_clip_queue_size,
+        'pipeline_render_queue_size': service.pipeline_render_queue_size,
+        'yolo_batch_size': service.yolo_batch_size,
+        'detection_stride': service.detection_stride,
+        'adaptive_stride': service.adaptive_stride,
+        'stride_max_uncertainty': service.stride_max_uncertainty,
+        'camera_rois': service.camera_rois,
+        'slowfast_crop_mode': service.slowfast_crop_mode,
+        'person_crop_margin': service.person_crop_margin,
+        'action_refresh': service.action_refresh,
+        'action_max_label_age': service.action_max_label_age,
+        'action_motion_threshold': service.action_motion_threshold,
+        'action_shape_threshold': service.action_shape_threshold,
+        'action_alert_max_age': service.action_alert_max_age,
+        'inference_backends': service.inference_backends,
+        'onnx_threads': service.onnx_threads,
+        'slowfast_quantization': service.slowfast_quantization,
+        'slowfast_max_batch': service.slowfast_max_batch,
+        'reid_gallery_mode': service.reid_gallery_mode,
+        'reid_gallery_dtype': service.reid_gallery_dtype,
+        'reid_on_demand': service.reid_on_demand,
+        'reid_refresh_interval': service.reid_refresh_interval,
+        'reid_preprocess_workers': service.reid_preprocess_workers,
+        'tracker_matching': service.tracker_matching,
+    }
+    torch_threads = (os.cpu_count() or 1) // len(segments)
+
+    segment_records = [None] * len(segments)
+    start_time = time.time()
+    try:
+        # 使用 spawn，避免 fork 已加载模型/CUDA 上下文的父进程
+        with ProcessPoolExecutor(max_workers=len(segments),
+                                 mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker,
+                                 initargs=(service_config, torch_threads)) as executor:
+            futures = {
+                executor.submit(_detect_segment, config.input, read_start, end, config.imsize): index
+                for index, (read_start, _, end) in enumerate(segments)
+            }
+            for completed, future in enumerate(as_completed(futures), start=1):
+                index = futures[future]
+                try:
+                    segment_records[index] = future.result()['records']
+                except Exception:
+                    for pending in futures:
+                        pending.cancel()
+                    raise
+                print(f"✓ 区间 {index} 检测完成 ({completed}/{len(segments)})")
+                if progress_callback:
+                    # 并行检测占 90% 进度，剩余为合并与渲染
+                    progress_callback(task_id, completed / len(segments) * 90)
+
+                with service.task_lock:
+                    if task_id in service.current_tasks and service.current_tasks[task_id]['status'] == 'stopped':
+                        for pending in futures:
+                            pending.cancel()
+                        break
+    except Exception as e:
+        # 任一区间失败（包括工作进程初始化失败）时不合并残缺结果，整段视频改为单进程检测
+        print(f"⚠ 分段检测失败: {e}，回退到单进程检测")
+        return service._run_detection(config, task_id, progress_callback)
+
+    if any(records is None for records in segment_records):
+        print("⚠ 分段检测被中止")
+        segment_records = [records or [] for records in segment_records]
+    print(f"✓ 分段检测耗时 {time.time() - start_time:.1f} 秒")
+
+    merged = merge_segment_records(segments, segment_records)
+
+    # 按帧顺序统计结果；需要输出视频时重新解码原视频并绘制统一ID后的结果
+    collector = VideoResultCollector(service, fps, time_window_seconds=0.5)
+    outputvideo = None
+    cap = None
+    if config.output:
+        outputvideo, config.output = service._open_video_writer(config.output, fps, (width, height))
+        cap = cv2.VideoCapture(config.input)
+
+    current_frame = 0
+    for frame_number, tracks, behaviors in merged:
+        vis_img = None
+        if cap is not None:
+            # 帧序号从1开始，跳过未被记录的帧
+            while current_frame < frame_number:
+                ret, vis_img = cap.read()
+                current_frame += 1
+                if not ret:
+                    vis_img = None
+                    break
+        collector.add_frame(frame_number, tracks, behaviors, vis_img)
+        if outputvideo and vis_img is not None:
+            service._write_video_frame(outputvideo, vis_img, (width, height), frame_number)
+
+    if cap is not None:
+        cap.release()
+    if outputvideo:
+        outputvideo.release()
+        print(f"✓ 视频保存成功: {config.output}")
+    if progress_callback:
+        progress_callback(task_id, 100.0)
+
+    collector.print_summary()
+    statistics = collector.get_statistics()
+    statistics['segments'] = len(segments)
+    statistics['yolo_batch_size'] = service.yolo_batch_size
+    return {
+        'results': collector.results,
+        'statistics': statistics
+    }
@@ -0,0 +1,97 @@
+"""
+按视频流隔离的 DeepSort 跟踪器池
+每个任务/视频流使用独立的 Tracker 与外观特征库（NearestNeighborDistanceMetric），
+多路视频同时运行时跟踪ID互不干扰；所有跟踪器共享同一个 ReID 特征提取器（权重只加载一次）。
+视频流结束后跟踪器进入空闲状态，空闲超过 idle_timeout 秒后自动回收。
+"""
+import time
+import threading
+from typing import Any, Dict
+
+
+class TrackerPool:
+    """DeepSort 跟踪器池"""
+
+    def __init__(self, extractor, idle_timeout: float = 60.0, **deepsort_kwargs):
+        """
+        初始化跟踪器池
+
+        Args:
+            extractor: 共享的 ReID 特征提取器（deep_sort Extractor）
+            idle_timeout: 释放后的跟踪器保留时间（秒），期间同一视频流重新获取可延续跟踪ID
+            **deepsort_kwargs: 创建 DeepSort 的其它参数
+        """
+        self.extractor = extractor
+        self.idle_timeout = max(0.0, idle_timeout)
+        self.deepsort_kwargs = deepsort_kwargs
+
+        self._trackers = {}  # 流ID -> DeepSort
+        self._users = {}  # 流ID -> 正在使用的数量
+        self._released_at = {}  # 流ID -> 最后释放时间
+        self._lock = threading.Lock()
+
+        # 运行指标
+        self.created_count = 0
+        self.evicted_count = 0
+
+    def acquire(self, stream_id: Any):
+        """
+        获取视频流的跟踪器，不存在时创建
+
+        Args:
+            stream_id: 任务ID或视频流标识
+
+        Returns:
+            DeepSort: 该视频流独立的跟踪器
+        """
+        from deep_sort.deep_sort import DeepSort
+
+        self.cleanup_idle()
+        with self._lock:
+            tracker = self._trackers.get(stream_id)
+            if tracker is None:
+                tracker = DeepSort(None, extractor=self.extractor, **self.deepsort_kwargs)
+                self._trackers[stream_id] = tracker
+                self.created_count += 1
+            self._users[stream_id] = self._users.get(stream_id, 0) + 1
+            self._released_at.pop(stream_id, None)
+            return tracker
+
+    def release(self, stream_id: Any):
+        """视频流结束时调用，跟踪器空闲 idle_timeout 秒后回收"""
+        with self._lock:
+            if stream_id not in self._trackers:
+                return
+            self._users[stream_id] = max(0, self._users.get(stream_id, 0) - 1)
+            if not self._users[stream_id]:
+                self._released_at[stream_id] = time.monotonic()
+        self.cleanup_idle()
+
+    def cleanup_idle(self) -> int:
+        """
+        回收空闲超时的跟踪器
+
+        Returns:
+            int: 回收的数量
+        """
+        now = time.monotonic()
+        with self._lock:
+            expired = [stream_id for stream_id, released_at in self._released_at.items()
+                       if now - released_at >= self.idle_timeout]
+            for stream_id in expired:
+                del self._trackers[stream_id]
+                del self._released_at[stream_id]
+                self._users.pop(stream_id, None)
+            self.evicted_count += len(expired)
+        return len(expired)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取跟踪器池运行指标"""
+        with self._lock:
+            active = sum(1 for users in self._users.values() if users)
+            return {
+                'active': active,
+                'idle': len(self._trackers) - active,
+                'created': self.created_count,
+                'evicted': self.evicted_count
+            }
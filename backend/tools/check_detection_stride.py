@@ -0,0 +1,81 @@
+"""
+DeepSort 检测步长计数检查工具
+在不同检测步长（每 N 帧检测一次，中间帧调用 Tracker.propagate）下跟踪一个匀速运动、随后消失的目标，
+检查 n_init（确认所需命中次数）与 max_age（删除前允许的连续丢失次数）只按检测帧计数，
+而 track.age 按所有帧计数，各步长下的结果应与每帧检测时一致。
+
+用法:
+    python tools/check_detection_stride.py --strides 1 2 4 8 --max-age 30 --n-init 3
+"""
+import os
+import sys
+import argparse
+
+import numpy as np
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(backend_dir), 'yolo_slowfast-master'))
+
+from deep_sort.deep_sort.sort.detection import Detection
+from deep_sort.deep_sort.sort.nn_matching import NearestNeighborDistanceMetric
+from deep_sort.deep_sort.sort.tracker import Tracker
+
+
+def run_stride(stride, visible_detections, args):
+    """
+    目标在前 visible_detections 个检测帧可见，之后消失
+
+    Returns:
+        Dict: 确认时的检测帧序号、删除前连续丢失的检测帧数、确认时与删除前最后一帧的 track.age 及对应帧数
+    """
+    tracker = Tracker(NearestNeighborDistanceMetric('cosine', 0.2, 100), max_age=args.max_age, n_init=args.n_init)
+    feature = np.ones(128, np.float32)
+    result = {'confirmed_at': None, 'missed': None}
+    detection_frames, frame = 0, 0
+    while result['missed'] is None:
+        if frame % stride:
+            tracker.propagate()
+        else:
+            detections = []
+            if detection_frames < visible_detections:
+                detections.append(Detection(np.array([100. + 3 * frame, 200., 60., 150.]), 0.9, 0, feature))
+            tracker.predict()
+            tracker.update(detections)
+            detection_frames += 1
+            if not tracker.tracks:
+                result['missed'] = detection_frames - visible_detections
+                break
+            track = tracker.tracks[0]
+            if result['confirmed_at'] is None and track.is_confirmed():
+                result['confirmed_at'] = detection_frames
+                result['confirmed_age'] = (track.age, frame + 1)
+        result['last_age'] = (tracker.tracks[0].age, frame + 1)
+        frame += 1
+    return result
+
+
+def main(args):
+    expected_missed = args.max_age + 1
+    print(f"max_age {args.max_age}, n_init {args.n_init}: 应在第 {args.n_init} 个检测帧确认, "
+          f"连续丢失 {expected_missed} 个检测帧后删除")
+    print(f"{'步长':>4} | {'确认于检测帧':>10} | {'删除前丢失检测帧':>12} | {'age/帧数':>10}")
+    ok = True
+    for stride in args.strides:
+        result = run_stride(stride, args.visible, args)
+        age, frames = result['last_age']
+        valid = (result['confirmed_at'] == args.n_init and result['missed'] == expected_missed
+                 and result['confirmed_age'][0] == result['confirmed_age'][1] and age == frames)
+        ok &= valid
+        print(f"{stride:>6} | {result['confirmed_at']:>16} | {result['missed']:>22} | "
+              f"{age:>6}/{frames:<5} {'✓' if valid else '✗'}")
+    print(f"\n{'✓' if ok else '✗'} n_init 与 max_age {'只按检测帧计数' if ok else '计数与检测步长有关'}")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--strides', nargs='+', type=int, default=[1, 2, 4, 8])
+    parser.add_argument('--max-age', type=int, default=30)
+    parser.add_argument('--n-init', type=int, default=3)
+    parser.add_argument('--visible', type=int, default=10, help='detection frames before the target disappears')
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,164 @@
+"""
+ONNX 推理后端一致性检查工具
+在样例视频片段上分别用 PyTorch 与 ONNX Runtime 运行 YOLO、SlowFast、DeepSort ReID，
+比较输出差异与耗时，用于切换推理后端前的验证。
+
+用法:
+    python tools/check_onnx_parity.py --video ../fall_1.mp4 --models yolo slowfast reid
+"""
+import os
+import sys
+import time
+import argparse
+
+import cv2
+import numpy as np
+import torch
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+yolo_slowfast_path = os.path.join(os.path.dirname(backend_dir), 'yolo_slowfast-master')
+sys.path.append(backend_dir)
+sys.path.append(yolo_slowfast_path)
+
+from services.inference_backends import BACKEND_ONNX, load_yolo, to_onnx_slowfast, to_onnx_reid
+
+
+def read_sample_clip(video_path, start_frame, length=25):
+    """读取样例片段（BGR帧列表）"""
+    cap = cv2.VideoCapture(video_path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    frames = []
+    while len(frames) < length:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    if len(frames) < length:
+        raise RuntimeError(f"视频帧数不足: 需要 {length} 帧，读取到 {len(frames)} 帧")
+    return frames
+
+
+def timed(fn, repeat):
+    """运行 repeat 次，返回最后一次输出与平均耗时（毫秒）"""
+    output = fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        output = fn()
+    return output, (time.perf_counter() - start) / max(1, repeat) * 1000
+
+
+def report(name, max_diff, pytorch_ms, onnx_ms, atol, extra=''):
+    passed = max_diff <= atol
+    status = '✓' if passed else '✗'
+    print(f"{status} {name}: 最大绝对误差={max_diff:.2e} (atol={atol:g}) | "
+          f"PyTorch {pytorch_ms:.1f}ms, ONNX {onnx_ms:.1f}ms, 加速 {pytorch_ms / max(onnx_ms, 1e-6):.2f}x {extra}")
+    return passed
+
+
+def check_yolo(args, frame):
+    torch_model = load_yolo(args.yolo_weights, imgsz=args.imsize)
+    onnx_model = load_yolo(args.yolo_weights, BACKEND_ONNX, args.imsize)
+    predict = lambda model: model.predict(source=frame, imgsz=args.imsize, device='cpu', verbose=False)[0].boxes
+    ref, pytorch_ms = timed(lambda: predict(torch_model), args.repeat)
+    out, onnx_ms = timed(lambda: predict(onnx_model), args.repeat)
+
+    if len(ref) != len(out):
+        print(f"✗ YOLO: 检测数量不一致 PyTorch={len(ref)}, ONNX={len(out)}")
+        return False, ref
+    if not len(ref):
+        return report('YOLO', 0.0, pytorch_ms, onnx_ms, args.box_atol, '(无检测结果)'), ref
+    ref_rows = ref.data.cpu().numpy()
+    out_rows = out.data.cpu().numpy()
+    order_ref = np.lexsort(ref_rows[:, :4].T[::-1])
+    order_out = np.lexsort(out_rows[:, :4].T[::-1])
+    max_diff = float(np.abs(ref_rows[order_ref, :4] - out_rows[order_out, :4]).max())
+    return report('YOLO', max_diff, pytorch_ms, onnx_ms, args.box_atol, f'({len(ref)} 个目标, 框坐标像素)'), ref
+
+
+def check_slowfast(args, frames, person_boxes):
+    from pytorchvideo.models.hub import slowfast_r50_detection
+    from yolo_slowfast import ClipBuffer, ava_inference_transform
+
+    model = slowfast_r50_detection(False)
+    model.load_state_dict(torch.load(args.slowfast_weights, map_location='cpu')['model_state'])
+    model = model.eval()
+
+    stack = ClipBuffer(len(frames), frames[0].shape)
+    for frame in frames:
+        stack.append(frame)
+    clip = stack.get_video_clip()
+    if not len(person_boxes):
+        height, width = frames[0].shape[:2]
+        person_boxes = np.array([[0.25 * width, 0.1 * height, 0.75 * width, 0.9 * height]], dtype=np.float32)
+    inputs, inp_boxes, _ = ava_inference_transform(clip, person_boxes, crop_size=args.imsize)
+    inputs = [inp.unsqueeze(0) for inp in inputs]
+    inp_boxes = torch.cat([torch.zeros(inp_boxes.shape[0], 1), inp_boxes.float()], dim=1)
+
+    with torch.no_grad():
+        ref, pytorch_ms = timed(lambda: model(inputs, inp_boxes), args.repeat)
+    onnx_model = to_onnx_slowfast(model, args.slowfast_weights, args.imsize)
+    out, onnx_ms = timed(lambda: onnx_model(inputs, inp_boxes), args.repeat)
+
+    max_diff = float((ref - out).abs().max())
+    top1_agree = float((ref.argmax(dim=1) == out.argmax(dim=1)).float().mean())
+    return report('SlowFast', max_diff, pytorch_ms, onnx_ms, args.atol, f'(top-1 一致率 {top1_agree:.0%})')
+
+
+def check_reid(args, frame, person_boxes):
+    from deep_sort.deep_sort.deep.feature_extractor import Extractor
+
+    extractor = Extractor(args.reid_weights, use_cuda=False)
+    height, width = frame.shape[:2]
+    if not len(person_boxes):
+        person_boxes = np.array([[0.25 * width, 0.1 * height, 0.75 * width, 0.9 * height]], dtype=np.float32)
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    crops = [rgb[int(y1):int(y2), int(x1):int(x2)] for x1, y1, x2, y2 in person_boxes.astype(int)]
+
+    ref, pytorch_ms = timed(lambda: extractor(crops), args.repeat)
+    to_onnx_reid(extractor, args.reid_weights)
+    out, onnx_ms = timed(lambda: extractor(crops), args.repeat)
+
+    max_diff = float(np.abs(ref - out).max())
+    return report('ReID', max_diff, pytorch_ms, onnx_ms, args.atol, f'({len(crops)} 个裁剪)')
+
+
+def main(args):
+    os.chdir(yolo_slowfast_path)
+    frames = read_sample_clip(args.video, args.start_frame)
+    key_frame = frames[len(frames) // 2]
+    print(f"样例片段: {args.video} 第 {args.start_frame} 帧起 {len(frames)} 帧")
+
+    results = []
+    person_boxes = np.zeros((0, 4), dtype=np.float32)
+    if 'yolo' in args.models:
+        passed, boxes = check_yolo(args, key_frame)
+        results.append(passed)
+        person_boxes = boxes.xyxy.cpu().numpy()[boxes.cls.cpu().numpy() == 0]
+    if 'slowfast' in args.models:
+        results.append(check_slowfast(args, frames, person_boxes))
+    if 'reid' in args.models:
+        results.append(check_reid(args, key_frame, person_boxes))
+
+    if all(results):
+        print("✓ 一致性检查通过")
+        return 0
+    print("✗ 一致性检查未通过")
+    return 1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--video', type=str, required=True, help='sample video used for the comparison')
+    parser.add_argument('--start-frame', type=int, default=0)
+    parser.add_argument('--models', nargs='+', default=['yolo', 'slowfast', 'reid'], choices=['yolo', 'slowfast', 'reid'])
+    parser.add_argument('--imsize', type=int, default=640)
+    parser.add_argument('--yolo-weights', type=str, default='yolov8n.pt')
+    parser.add_argument('--slowfast-weights', type=str, default='SLOWFAST_8x8_R50_DETECTION.pyth')
+    parser.add_argument('--reid-weights', type=str, default='deep_sort/deep_sort/deep/checkpoint/ckpt.t7')
+    parser.add_argument('--atol', type=float, default=1e-3, help='tolerance for SlowFast scores and ReID features')
+    parser.add_argument('--box-atol', type=float, default=1.0, help='tolerance for YOLO box coordinates in pixels')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per backend')
+    config = parser.parse_args()
+    config.video = os.path.abspath(config.video)
+    sys.exit(main(config))
@@ -0,0 +1,212 @@
+"""
+DeepSort 关联方式一致性检查工具
+在录制的检测序列上分别用级联匹配（cascade）、单代价矩阵分组求解（grouped）与单次带年龄偏置求解（single）
+运行跟踪器，比较各方式相对级联匹配的输出一致帧占比、ID切换次数与关联耗时。
+
+录制序列（需要 ultralytics 与 ReID 权重）:
+    python tools/check_tracker_matching.py --record ../fall_1.mp4 --output fall_1.npz
+检查已录制的序列:
+    python tools/check_tracker_matching.py --sequences fall_1.npz
+未指定序列时使用带遮挡与交叉运动、含真实身份的合成序列。
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+yolo_slowfast_path = os.path.join(os.path.dirname(backend_dir), 'yolo_slowfast-master')
+sys.path.append(yolo_slowfast_path)
+
+from deep_sort.deep_sort.sort.detection import Detection
+from deep_sort.deep_sort.sort.nn_matching import NearestNeighborDistanceMetric
+from deep_sort.deep_sort.sort.tracker import Tracker
+
+MODES = list(Tracker.MATCHING)
+
+
+def record_sequence(video_path, yolo_weights, reid_weights, max_frames, imsize):
+    """用YOLO检测视频中的人并提取ReID特征，按帧记录检测框（tlwh）、置信度与特征"""
+    import cv2
+    from ultralytics import YOLO
+    from deep_sort.deep_sort import DeepSort
+
+    yolo_model = YOLO(yolo_weights)
+    deepsort = DeepSort(reid_weights, use_cuda=False)
+    cap = cv2.VideoCapture(video_path)
+    frame_index, boxes, confidences, features = [], [], [], []
+    frame = 0
+    while not max_frames or frame < max_frames:
+        ret, img = cap.read()
+        if not ret:
+            break
+        pred = yolo_model.predict(source=img, imgsz=imsize, device='cpu', verbose=False)[0].boxes
+        person = pred.cls.cpu().numpy() == 0
+        xywh = pred.xywh.cpu().numpy()[person]
+        if len(xywh):
+            rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+            deepsort.height, deepsort.width = rgb.shape[:2]
+            features.append(deepsort._get_features(xywh, rgb))
+            boxes.append(DeepSort._xywh_to_tlwh(xywh))
+            confidences.append(pred.conf.cpu().numpy()[person])
+            frame_index.append(np.full(len(xywh), frame))
+        frame += 1
+    cap.release()
+    return {
+        'num_frames': frame,
+        'frame_index': np.concatenate(frame_index) if frame_index else np.zeros(0, int),
+        'boxes': np.concatenate(boxes) if boxes else np.zeros((0, 4)),
+        'confidences': np.concatenate(confidences) if confidences else np.zeros(0),
+        'features': np.concatenate(features) if features else np.zeros((0, 512), np.float32),
+    }
+
+
+def synthetic_sequence(num_objects, num_frames, seed, feature_noise=0.3, width=1920, height=1080, dim=512):
+    """生成行人来回走动、相互交叉并间歇被遮挡的序列，附带每个检测框的真实身份"""
+    rng = np.random.default_rng(seed)
+    pos = np.c_[rng.uniform(0, width - 80, num_objects), rng.uniform(0, height - 200, num_objects)]
+    vel = rng.normal(0, 6, (num_objects, 2))
+    size = np.c_[rng.uniform(40, 80, num_objects), rng.uniform(100, 200, num_objects)]
+    appearance = rng.normal(size=(num_objects, dim))
+    hidden_until = np.zeros(num_objects, int)
+
+    frame_index, boxes, features, identities = [], [], [], []
+    for frame in range(num_frames):
+        pos += vel
+        bounce = (pos < 0) | (pos > [width - 80, height - 200])
+        vel[bounce] *= -1
+        # 每帧约 2% 的目标开始被遮挡 1~30 帧
+        occluded = rng.random(num_objects) < 0.02
+        hidden_until[occluded] = np.maximum(hidden_until[occluded], frame + rng.integers(1, 30, occluded.sum()))
+        for i in np.flatnonzero(hidden_until <= frame):
+            frame_index.append(frame)
+            boxes.append(np.r_[pos[i] + rng.normal(0, 2, 2), size[i] + rng.normal(0, 2, 2)])
+            features.append(appearance[i] + rng.normal(0, feature_noise, dim))
+            identities.append(i)
+    return {
+        'num_frames': num_frames,
+        'frame_index': np.asarray(frame_index),
+        'boxes': np.asarray(boxes),
+        'confidences': np.full(len(boxes), 0.9),
+        'features': np.asarray(features, np.float32),
+        'identities': np.asarray(identities),
+    }
+
+
+class RecordingTracker(Tracker):
+    """记录每帧关联结果（跟踪目标, 检测序号）的跟踪器"""
+
+    def _match(self, detections, pre_matches):
+        matches, unmatched_tracks, unmatched_detections = super()._match(detections, pre_matches)
+        self.last_matches = [(self.tracks[track_idx], detection_idx) for track_idx, detection_idx in matches]
+        return matches, unmatched_tracks, unmatched_detections
+
+
+def run_tracker(sequence, matching, args):
+    """按帧回放序列，返回每帧输出的 (跟踪ID, tlwh, 检测序号) 与每帧关联耗时"""
+    tracker = RecordingTracker(NearestNeighborDistanceMetric('cosine', args.max_dist, args.nn_budget),
+                      max_iou_distance=0.7, max_age=args.max_age, n_init=args.n_init, matching=matching)
+    starts = np.searchsorted(sequence['frame_index'], np.arange(sequence['num_frames'] + 1))
+    outputs, elapsed = [], 0.0
+    for frame in range(sequence['num_frames']):
+        rows = range(starts[frame], starts[frame + 1])
+        detections = [Detection(sequence['boxes'][i], sequence['confidences'][i], 0, sequence['features'][i])
+                      for i in rows]
+        start = time.perf_counter()
+        tracker.predict()
+        tracker.update(detections)
+        elapsed += time.perf_counter() - start
+        outputs.append([(track.track_id, track.to_tlwh(), starts[frame] + detection_idx)
+                        for track, detection_idx in tracker.last_matches if track.is_confirmed()])
+    return outputs, elapsed / max(sequence['num_frames'], 1) * 1000
+
+
+def id_switches(outputs, reference_ids):
+    """参考身份（真实身份或级联匹配的跟踪ID）对应的跟踪ID发生变化的次数"""
+    last, switches = {}, 0
+    for frame_outputs in outputs:
+        for track_id, _, detection in frame_outputs:
+            key = reference_ids[detection]
+            if key is None:
+                continue
+            if key in last and last[key] != track_id:
+                switches += 1
+            last[key] = track_id
+    return switches
+
+
+def same_frames(outputs, reference):
+    """输出的 (跟踪ID, 检测框) 与参考完全一致的帧数"""
+    same = 0
+    for a, b in zip(outputs, reference):
+        if len(a) == len(b) and all(x[0] == y[0] and x[2] == y[2] and np.allclose(x[1], y[1])
+                                    for x, y in zip(sorted(a, key=lambda o: o[0]), sorted(b, key=lambda o: o[0]))):
+            same += 1
+    return same
+
+
+def check_sequence(name, sequence, args):
+    results = {mode: run_tracker(sequence, mode, args) for mode in MODES}
+    reference, _ = results['cascade']
+    # 以级联匹配在每个检测框上的跟踪ID作为参考身份
+    cascade_ids = [None] * len(sequence['boxes'])
+    for frame_outputs in reference:
+        for track_id, _, detection in frame_outputs:
+            cascade_ids[detection] = track_id
+    identities = sequence.get('identities')
+
+    print(f"\n📊 {name}: {sequence['num_frames']} 帧, {len(sequence['boxes'])} 个检测框")
+    header = f"{'关联方式':<8} | {'一致帧':>10} | {'相对级联ID切换':>12} | {'耗时/帧':>9}"
+    if identities is not None:
+        header += f" | {'真实ID切换':>8}"
+    print(header)
+    all_equal = True
+    for mode, (outputs, ms) in results.items():
+        same = same_frames(outputs, reference)
+        switches = id_switches(outputs, cascade_ids)
+        line = f"{mode:<10} | {same:>5}/{len(outputs):<5} | {switches:>16} | {ms:>7.2f}ms"
+        if identities is not None:
+            line += f" | {id_switches(outputs, identities):>11}"
+        print(line)
+        if mode == 'grouped':
+            all_equal &= same == len(outputs)
+    return all_equal
+
+
+def main(args):
+    if args.record:
+        sequence = record_sequence(args.record, args.yolo_weights, args.reid_weights, args.max_frames, args.imsize)
+        output = args.output or os.path.splitext(os.path.basename(args.record))[0] + '.npz'
+        np.savez_compressed(output, **sequence)
+        print(f"✓ 已录制 {sequence['num_frames']} 帧, {len(sequence['boxes'])} 个检测框: {os.path.abspath(output)}")
+        return 0
+
+    if args.sequences:
+        sequences = [(os.path.basename(path), dict(np.load(path))) for path in args.sequences]
+    else:
+        sequences = [(f'synthetic-{n}', synthetic_sequence(n, args.max_frames or 300, args.seed + n, args.feature_noise))
+                     for n in args.objects]
+    ok = all([check_sequence(name, sequence, args) for name, sequence in sequences])
+    print(f"\n{'✓' if ok else '✗'} grouped 与级联匹配{'完全一致' if ok else '存在差异'}")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sequences', nargs='+', help='recorded .npz sequences (default: synthetic)')
+    parser.add_argument('--objects', nargs='+', type=int, default=[20, 60], help='people per synthetic sequence')
+    parser.add_argument('--feature-noise', type=float, default=0.3, help='appearance noise of synthetic detections')
+    parser.add_argument('--record', type=str, default='', help='record a sequence from this video instead of checking')
+    parser.add_argument('--output', type=str, default='', help='where to save the recorded sequence')
+    parser.add_argument('--max-frames', type=int, default=0, help='frames to record / synthesize (0 = whole video, 300 synthetic)')
+    parser.add_argument('--imsize', type=int, default=640)
+    parser.add_argument('--yolo-weights', type=str, default='yolov8n.pt')
+    parser.add_argument('--reid-weights', type=str, default='deep_sort/deep_sort/deep/checkpoint/ckpt.t7')
+    parser.add_argument('--max-dist', type=float, default=0.2)
+    parser.add_argument('--nn-budget', type=int, default=100)
+    parser.add_argument('--max-age', type=int, default=70)
+    parser.add_argument('--n-init', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    sys.exit(main(parser.parse_args()))
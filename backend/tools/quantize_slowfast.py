@@ -0,0 +1,158 @@
+"""
+SlowFast INT8 量化工具（离线步骤）
+1. 导出FP32 ONNX模型（与推理后端共用缓存）
+2. 在样例视频片段上校准并用 ONNX Runtime 量化为INT8（dynamic / static）
+3. 在评估片段上比较INT8与FP32 PyTorch模型的 AVA top-1 标签一致率与推理耗时，输出报告
+
+量化模型保存为 <权重名>.int8-<mode>.onnx，检测配置中设置 slowfast_quantization 为对应模式即可启用。
+
+用法:
+    python tools/quantize_slowfast.py --mode static --calib-videos ../fall_1.mp4 --eval-videos ../fall_2.mp4
+"""
+import os
+import sys
+import json
+import argparse
+
+import cv2
+import numpy as np
+import torch
+
+# check_onnx_parity 导入时会把 backend 目录和算法目录加入 sys.path
+from check_onnx_parity import read_sample_clip, timed, yolo_slowfast_path
+from services.inference_backends import QUANT_MODES, OnnxModule, quantize_onnx, quantized_onnx_path, to_onnx_slowfast
+
+
+def sample_clips(video_paths, clips_per_video, clip_length=25):
+    """在每个视频中均匀选取若干片段"""
+    clips = []
+    for video_path in video_paths:
+        cap = cv2.VideoCapture(video_path)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        if total_frames < clip_length:
+            print(f"⚠ 视频过短，跳过: {video_path}")
+            continue
+        for start in np.linspace(0, total_frames - clip_length, clips_per_video).astype(int):
+            clips.append((video_path, int(start), read_sample_clip(video_path, int(start), clip_length)))
+    return clips
+
+
+def prepare_inputs(frames, yolo_model, imsize):
+    """按检测流水线的方式生成 SlowFast 输入：YOLO 检测关键帧中的人，片段经 ava_inference_transform 预处理"""
+    from yolo_slowfast import ClipBuffer, ava_inference_transform
+
+    key_frame = frames[len(frames) // 2]
+    boxes = yolo_model.predict(source=key_frame, imgsz=imsize, device='cpu', verbose=False)[0].boxes
+    person_boxes = boxes.xyxy.cpu().numpy()[boxes.cls.cpu().numpy() == 0]
+    if not len(person_boxes):
+        height, width = key_frame.shape[:2]
+        person_boxes = np.array([[0.25 * width, 0.1 * height, 0.75 * width, 0.9 * height]], dtype=np.float32)
+
+    stack = ClipBuffer(len(frames), frames[0].shape)
+    for frame in frames:
+        stack.append(frame)
+    inputs, inp_boxes, _ = ava_inference_transform(stack.get_video_clip(), person_boxes, crop_size=imsize)
+    inputs = [inp.unsqueeze(0) for inp in inputs]
+    inp_boxes = torch.cat([torch.zeros(inp_boxes.shape[0], 1), inp_boxes.float()], dim=1)
+    return inputs, inp_boxes
+
+
+def evaluate(fp32_model, int8_model, samples, repeat):
+    """比较INT8与FP32模型在评估片段上的 top-1 标签与耗时"""
+    agree, total = 0, 0
+    fp32_times, int8_times, clip_reports = [], [], []
+    for (video_path, start, _), (inputs, inp_boxes) in samples:
+        with torch.no_grad():
+            ref, fp32_ms = timed(lambda: fp32_model(inputs, inp_boxes), repeat)
+        out, int8_ms = timed(lambda: int8_model(inputs, inp_boxes), repeat)
+        ref_top1 = ref.argmax(dim=1)
+        out_top1 = out.argmax(dim=1)
+        clip_agree = int((ref_top1 == out_top1).sum())
+        agree += clip_agree
+        total += len(ref_top1)
+        fp32_times.append(fp32_ms)
+        int8_times.append(int8_ms)
+        clip_reports.append({
+            'video': os.path.basename(video_path),
+            'start_frame': start,
+            'boxes': len(ref_top1),
+            'top1_agree': clip_agree,
+            'fp32_labels': (ref_top1 + 1).tolist(),
+            'int8_labels': (out_top1 + 1).tolist(),
+            'max_score_diff': float((ref - out).abs().max()),
+            'fp32_ms': round(fp32_ms, 1),
+            'int8_ms': round(int8_ms, 1)
+        })
+    return {
+        'top1_agreement': agree / total if total else 0.0,
+        'boxes': total,
+        'fp32_ms': float(np.mean(fp32_times)) if fp32_times else 0.0,
+        'int8_ms': float(np.mean(int8_times)) if int8_times else 0.0,
+        'clips': clip_reports
+    }
+
+
+def main(args):
+    from ultralytics import YOLO
+    from pytorchvideo.models.hub import slowfast_r50_detection
+
+    os.chdir(yolo_slowfast_path)
+    torch.set_num_threads(args.threads or torch.get_num_threads())
+
+    model = slowfast_r50_detection(False)
+    model.load_state_dict(torch.load(args.slowfast_weights, map_location='cpu')['model_state'])
+    model = model.eval()
+    yolo_model = YOLO(args.yolo_weights)
+
+    calib_clips = sample_clips(args.calib_videos, args.clips_per_video)
+    eval_clips = sample_clips(args.eval_videos or args.calib_videos, args.clips_per_video)
+    if not calib_clips or not eval_clips:
+        print("✗ 没有可用的样例片段")
+        return 1
+    calib_inputs = [prepare_inputs(frames, yolo_model, args.imsize) for _, _, frames in calib_clips]
+    eval_samples = [(clip, prepare_inputs(clip[2], yolo_model, args.imsize)) for clip in eval_clips]
+    print(f"校准片段 {len(calib_inputs)} 个，评估片段 {len(eval_samples)} 个")
+
+    fp32_onnx = to_onnx_slowfast(model, args.slowfast_weights, args.imsize, args.threads)
+    output_path = quantized_onnx_path(args.slowfast_weights, args.mode)
+    print(f"⏳ INT8 {args.mode} 量化: {output_path}")
+    quantize_onnx(fp32_onnx.onnx_path, output_path, args.mode,
+                  [fp32_onnx.feeds(inputs, inp_boxes) for inputs, inp_boxes in calib_inputs])
+
+    report = evaluate(model, OnnxModule(output_path, args.threads), eval_samples, args.repeat)
+    report.update({
+        'mode': args.mode,
+        'model': output_path,
+        'calibration_clips': len(calib_inputs),
+        'fp32_size_mb': round(os.path.getsize(fp32_onnx.onnx_path) / 2 ** 20, 1),
+        'int8_size_mb': round(os.path.getsize(output_path) / 2 ** 20, 1)
+    })
+    report_path = os.path.splitext(output_path)[0] + '.report.json'
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"\n📊 INT8 {args.mode} 量化报告（{report['boxes']} 个目标框）")
+    print(f"  top-1 标签一致率: {report['top1_agreement']:.1%}")
+    print(f"  平均耗时: FP32 PyTorch {report['fp32_ms']:.1f}ms -> INT8 {report['int8_ms']:.1f}ms "
+          f"({report['fp32_ms'] / max(report['int8_ms'], 1e-6):.2f}x)")
+    print(f"  模型大小: {report['fp32_size_mb']}MB -> {report['int8_size_mb']}MB")
+    print(f"  报告已保存: {os.path.abspath(report_path)}")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mode', default='static', choices=QUANT_MODES)
+    parser.add_argument('--calib-videos', nargs='+', required=True, help='videos sampled for calibration clips')
+    parser.add_argument('--eval-videos', nargs='+', help='videos sampled for the accuracy report (default: calibration videos)')
+    parser.add_argument('--clips-per-video', type=int, default=4)
+    parser.add_argument('--imsize', type=int, default=640)
+    parser.add_argument('--yolo-weights', type=str, default='yolov8n.pt')
+    parser.add_argument('--slowfast-weights', type=str, default='SLOWFAST_8x8_R50_DETECTION.pyth')
+    parser.add_argument('--threads', type=int, default=0, help='CPU threads for both models (0 = default)')
+    parser.add_argument('--repeat', type=int, default=1, help='timed runs per clip')
+    config = parser.parse_args()
+    config.calib_videos = [os.path.abspath(path) for path in config.calib_videos]
+    config.eval_videos = [os.path.abspath(path) for path in config.eval_videos or []]
+    sys.exit(main(config))
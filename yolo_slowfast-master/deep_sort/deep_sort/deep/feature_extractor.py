@@ -1,42 +1,109 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import torch
-import torchvision.transforms as transforms
 import numpy as np
 import cv2
 import logging
 
 from .model import Net
 
+
+class CropPreprocessor(object):
+    """
+    Batch preprocessing of person crops for the ReID network.
+
+    uint8 crops are resized straight into a reusable ``(N, 128, 64, 3)``
+    uint8 buffer, then converted and normalized in place into a reusable
+    ``(N, 3, 128, 64)`` float tensor. Buffers are kept per thread, so one
+    preprocessor can be shared by trackers running on different threads,
+    and only grow when a frame has more crops than any frame before.
+
+    Parameters
+    ----------
+    size : (int, int)
+        Network input size as ``(width, height)``.
+    mean, std : (float, float, float)
+        Per-channel normalization of pixels scaled to 0..1.
+    num_workers : int
+        If > 0, crops are resized on a thread pool of this size when a
+        frame has at least `parallel_threshold` crops.
+    parallel_threshold : int
+        Minimum number of crops that is resized on the thread pool.
+
+    """
+
+    def __init__(self, size=(64, 128), mean=(0.485, 0.456, 0.406), std=(0.229, 0.224, 0.225),
+                 num_workers=0, parallel_threshold=16):
+        self.size = size
+        # Normalize((x / 255 - mean) / std) as one subtraction and one scaling of the raw pixels.
+        self._offset = torch.tensor(mean).view(1, 3, 1, 1) * 255.
+        self._scale = 1. / (torch.tensor(std).view(1, 3, 1, 1) * 255.)
+        self.num_workers = num_workers
+        self.parallel_threshold = parallel_threshold
+        self._pool = None
+        self._local = threading.local()
+
+    def _buffers(self, n):
+        pixels = getattr(self._local, "pixels", None)
+        if pixels is None or len(pixels) < n:
+            capacity = max(n, 2 * len(pixels) if pixels is not None else 16)
+            width, height = self.size
+            self._local.pixels = pixels = np.empty((capacity, height, width, 3), dtype=np.uint8)
+            self._local.batch = torch.empty((capacity, 3, height, width), dtype=torch.float32)
+        return pixels, self._local.batch
+
+    def _resize_into(self, im_crops, pixels, start, stop):
+        for i in range(start, stop):
+            cv2.resize(im_crops[i], self.size, dst=pixels[i])
+
+    def __call__(self, im_crops):
+        """Preprocess a list of HxWx3 uint8 crops.
+
+        Returns
+        -------
+        torch.Tensor
+            A ``(N, 3, 128, 64)`` float tensor. It is a view onto a reused
+            buffer and is overwritten by the next call on the same thread.
+
+        """
+        n = len(im_crops)
+        pixels, batch = self._buffers(n)
+        if self.num_workers > 0 and n >= self.parallel_threshold:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.num_workers, thread_name_prefix="reid-preprocess")
+            bounds = np.linspace(0, n, self.num_workers + 1).astype(int)
+            list(self._pool.map(lambda b: self._resize_into(im_crops, pixels, b[0], b[1]),
+                                zip(bounds[:-1], bounds[1:])))
+        else:
+            self._resize_into(im_crops, pixels, 0, n)
+
+        batch = batch[:n]
+        batch.copy_(torch.from_numpy(pixels[:n]).permute(0, 3, 1, 2))
+        batch.sub_(self._offset).mul_(self._scale)
+        return batch
+
+
 class Extractor(object):
-    def __init__(self, model_path, use_cuda=True):
+    def __init__(self, model_path, use_cuda=True, num_workers=0):
         self.net = Net(reid=True)
         self.device = "cuda" if torch.cuda.is_available() and use_cuda else "cpu"
         state_dict = torch.load(model_path, map_location=lambda storage, loc: storage)['net_dict']
         self.net.load_state_dict(state_dict)
         logger = logging.getLogger("root.tracker")
         logger.info("Loading weights from {}... Done!".format(model_path))
-        self.net.to(self.device)
+        self.net.to(self.device).eval()
         self.size = (64, 128)
-        self.norm = transforms.Compose([
-            transforms.ToTensor(),
-            transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225]),
-        ])
-        
+        self.preprocess = CropPreprocessor(self.size, num_workers=num_workers)
+
 
 
     def _preprocess(self, im_crops):
         """
-        TODO:
-            1. to float with scale from 0 to 1
-            2. resize to (64, 128) as Market1501 dataset did
-            3. concatenate to a numpy array
-            3. to torch Tensor
-            4. normalize
+        Resize uint8 crops to (64, 128) as Market1501 dataset did, scale to
+        0..1 and normalize, see `CropPreprocessor`.
         """
-        def _resize(im, size):
-            return cv2.resize(im.astype(np.float32)/255., size)
-
-        im_batch = torch.cat([self.norm(_resize(im, self.size)).unsqueeze(0) for im in im_crops], dim=0).float()
-        return im_batch
+        return self.preprocess(im_crops)
 
 
     def __call__(self, im_crops):
@@ -52,4 +119,3 @@ if __name__ == '__main__':
     extr = Extractor("checkpoint/ckpt.t7")
     feature = extr(img)
     print(feature.shape)
-
@@ -12,19 +12,64 @@ __all__ = ['DeepSort']
 
 
 class DeepSort(object):
-    def __init__(self, model_path, max_dist=0.2, min_confidence=0.3, nms_max_overlap=3.0, max_iou_distance=0.7, max_age=70, n_init=2, nn_budget=100, use_cuda=True, use_appearence=True):
+    def __init__(self, model_path, max_dist=0.2, min_confidence=0.3, nms_max_overlap=3.0, max_iou_distance=0.7, max_age=70, n_init=2, nn_budget=100, use_cuda=True, use_appearence=True, extractor=None, gallery="full", gallery_dtype="float32", reid_on_demand=False, reid_min_iou=0.5, reid_ambiguous_iou=0.2, reid_refresh_interval=10, reid_workers=0, matching="cascade"):
+        """
+        Parameters
+        ----------
+        model_path : str
+            Path to the ReID checkpoint. Ignored when `extractor` is given.
+        extractor : Optional[Extractor]
+            An already loaded feature extractor to share between several
+            DeepSort instances. Only the ReID weights are shared; every
+            instance keeps its own tracks and appearance gallery.
+        gallery : str
+            Appearance memory per track: "full" (last `nn_budget` samples),
+            "ema" or "centroids". See `NearestNeighborDistanceMetric`.
+        gallery_dtype : str
+            Storage type of the appearance gallery, "float32" or "float16".
+        reid_on_demand : bool
+            If True, detections that pair up with exactly one confirmed track
+            by IoU (see `Tracker.confident_matches`) are associated without
+            running the ReID network; features are only extracted for
+            ambiguous and new detections and for tracks whose gallery has
+            not been refreshed for `reid_refresh_interval` updates.
+        reid_min_iou, reid_ambiguous_iou, reid_refresh_interval
+            Parameters of `Tracker.confident_matches`.
+        reid_workers : int
+            Threads used to resize ReID crops on frames with many
+            detections (0 = resize on the calling thread). Ignored when
+            `extractor` is given.
+        matching : str
+            Appearance association of confirmed tracks: "cascade",
+            "grouped" or "single", see `Tracker`.
+        """
         self.min_confidence = min_confidence
         self.nms_max_overlap = nms_max_overlap
         self.use_appearence=use_appearence
-        self.extractor = Extractor(model_path, use_cuda=use_cuda)
+        self.extractor = extractor if extractor is not None else Extractor(model_path, use_cuda=use_cuda, num_workers=reid_workers)
 
         max_cosine_distance = max_dist
         nn_budget = nn_budget
-        metric = NearestNeighborDistanceMetric("cosine", max_cosine_distance, nn_budget)
-        self.tracker = Tracker(metric, max_iou_distance=max_iou_distance, max_age=max_age, n_init=n_init)
+        metric = NearestNeighborDistanceMetric("cosine", max_cosine_distance, nn_budget,
+                                              gallery=gallery, dtype=gallery_dtype)
+        self.tracker = Tracker(metric, max_iou_distance=max_iou_distance, max_age=max_age, n_init=n_init, matching=matching)
+
+        self.reid_on_demand = reid_on_demand
+        self.reid_min_iou = reid_min_iou
+        self.reid_ambiguous_iou = reid_ambiguous_iou
+        self.reid_refresh_interval = reid_refresh_interval
+        self.reid_crops = 0
+        self.reid_crops_skipped = 0
+
+    @property
+    def reid_skip_ratio(self):
+        """Fraction of detections associated without extracting a feature."""
+        return self.reid_crops_skipped / self.reid_crops if self.reid_crops else 0.0
 
     def update(self, bbox_xywh, confidences, labels, ori_img):
         self.height, self.width = ori_img.shape[:2]
+        if self.use_appearence and self.reid_on_demand:
+            return self._update_on_demand(bbox_xywh, confidences, labels, ori_img)
         # generate detections
         
         if self.use_appearence:
@@ -44,6 +89,37 @@ class DeepSort(object):
         self.tracker.predict()
         self.tracker.update(detections)
 
+        return self._get_outputs()
+
+    def _update_on_demand(self, bbox_xywh, confidences, labels, ori_img):
+        bbox_tlwh = self._xywh_to_tlwh(bbox_xywh)
+        kept = [i for i, conf in enumerate(confidences) if conf > self.min_confidence]
+        detections = [Detection(bbox_tlwh[i], confidences[i], labels[i], None) for i in kept]
+
+        self.tracker.predict()
+        pre_matches = self.tracker.confident_matches(
+            detections, self.reid_min_iou, self.reid_ambiguous_iou, self.reid_refresh_interval)
+        skipped = {detection_idx for _, detection_idx in pre_matches}
+        needed = [j for j in range(len(detections)) if j not in skipped]
+        if needed:
+            features = self._get_features(bbox_xywh[[kept[j] for j in needed]], ori_img)
+            for j, feature in zip(needed, features):
+                detections[j].feature = feature
+        self.reid_crops += len(detections)
+        self.reid_crops_skipped += len(skipped)
+
+        self.tracker.update(detections, pre_matches)
+        return self._get_outputs()
+
+    def propagate(self, ori_img):
+        """Advance all tracks with the Kalman motion model only, for frames
+        where detection is skipped. Returns outputs in the same format as
+        `update`."""
+        self.height, self.width = ori_img.shape[:2]
+        self.tracker.propagate()
+        return self._get_outputs()
+
+    def _get_outputs(self):
         # output bbox identities
         outputs = []
         for track in self.tracker.tracks:
@@ -12,8 +12,9 @@ class Detection(object):
         Bounding box in format `(x, y, w, h)`.
     confidence : float
         Detector confidence score.
-    feature : array_like
-        A feature vector that describes the object contained in this image.
+    feature : Optional[array_like]
+        A feature vector that describes the object contained in this image,
+        or None when appearance extraction was skipped for this detection.
 
     Attributes
     ----------
@@ -30,7 +31,7 @@ class Detection(object):
         self.tlwh = np.asarray(tlwh, dtype=np.float64)
         self.confidence = float(confidence)
         self.label=label
-        self.feature = np.asarray(feature, dtype=np.float32)
+        self.feature = np.asarray(feature, dtype=np.float32) if feature is not None else None
 
     def to_tlbr(self):
         """Convert bounding box to format `(min x, min y, max x, max y)`, i.e.,
@@ -69,6 +69,38 @@ def iou(bbox, candidates):
     return area_intersection / (area_bbox + area_candidates - area_intersection)
 # %%
 
+def iou_matrix(bboxes, candidates):
+    """Computer pairwise intersection over union in one broadcasted
+    operation. Row `i` equals `iou(bboxes[i], candidates)` exactly.
+
+    Parameters
+    ----------
+    bboxes : ndarray
+        A matrix of bounding boxes (one per row) in format
+        `(top left x, top left y, width, height)`.
+    candidates : ndarray
+        A matrix of candidate bounding boxes (one per row) in the same format
+        as `bboxes`.
+
+    Returns
+    -------
+    ndarray
+        Matrix of shape len(bboxes), len(candidates) with the intersection
+        over union of every pair.
+
+    """
+    bboxes_tl = bboxes[:, np.newaxis, :2]
+    bboxes_br = bboxes_tl + bboxes[:, np.newaxis, 2:]
+    candidates_tl = candidates[np.newaxis, :, :2]
+    candidates_br = candidates_tl + candidates[np.newaxis, :, 2:]
+
+    wh = np.maximum(0., np.minimum(bboxes_br, candidates_br) - np.maximum(bboxes_tl, candidates_tl))
+    area_intersection = wh[..., 0] * wh[..., 1]
+    area_bboxes = (bboxes[:, 2] * bboxes[:, 3])[:, np.newaxis]
+    area_candidates = (candidates[:, 2] * candidates[:, 3])[np.newaxis, :]
+    return area_intersection / (area_bboxes + area_candidates - area_intersection)
+
+
 def iou_cost(tracks, detections, track_indices=None,
              detection_indices=None):
     """An intersection over union distance metric.
@@ -92,6 +124,8 @@ def iou_cost(tracks, detections, track_indices=None,
         Returns a cost matrix of shape
         len(track_indices), len(detection_indices) where entry (i, j) is
         `1 - iou(tracks[track_indices[i]], detections[detection_indices[j]])`.
+        Rows of tracks that were not updated in the last frame are set to
+        `linear_assignment.INFTY_COST`.
 
     """
     if track_indices is None:
@@ -99,13 +133,12 @@ def iou_cost(tracks, detections, track_indices=None,
     if detection_indices is None:
         detection_indices = np.arange(len(detections))
 
-    cost_matrix = np.zeros((len(track_indices), len(detection_indices)))
-    for row, track_idx in enumerate(track_indices):
-        if tracks[track_idx].time_since_update > 1:
-            cost_matrix[row, :] = linear_assignment.INFTY_COST
-            continue
+    cost_matrix = np.full((len(track_indices), len(detection_indices)), linear_assignment.INFTY_COST)
+    live = np.array([tracks[i].time_since_update <= 1 for i in track_indices], dtype=bool)
+    if not live.any() or not len(detection_indices):
+        return cost_matrix
 
-        bbox = tracks[track_idx].to_tlwh()
-        candidates = np.asarray([detections[i].tlwh for i in detection_indices])
-        cost_matrix[row, :] = 1. - iou(bbox, candidates)
+    bboxes = np.asarray([tracks[i].to_tlwh() for i, is_live in zip(track_indices, live) if is_live])
+    candidates = np.asarray([detections[i].tlwh for i in detection_indices])
+    cost_matrix[live] = 1. - iou_matrix(bboxes, candidates)
     return cost_matrix
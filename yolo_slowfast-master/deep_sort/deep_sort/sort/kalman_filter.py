@@ -227,3 +227,131 @@ class KalmanFilter(object):
             overwrite_b=True)
         squared_maha = np.sum(z * z, axis=0)
         return squared_maha
+
+    def predict_batch(self, means, covariances):
+        """Run Kalman filter prediction step for many tracks at once.
+
+        Parameters
+        ----------
+        means : ndarray
+            The Nx8 dimensional mean matrix of the object states at the
+            previous time step.
+        covariances : ndarray
+            The Nx8x8 dimensional covariance matrices of the object states at
+            the previous time step.
+
+        Returns
+        -------
+        (ndarray, ndarray)
+            Returns the Nx8 mean matrix and Nx8x8 covariance matrices of the
+            predicted states. Row `i` equals `predict(means[i],
+            covariances[i])`.
+
+        """
+        height = means[:, 3]
+        std = np.empty_like(means)
+        std[:, [0, 1, 3]] = self._std_weight_position * height[:, np.newaxis]
+        std[:, 2] = 1e-2
+        std[:, [4, 5, 7]] = self._std_weight_velocity * height[:, np.newaxis]
+        std[:, 6] = 1e-5
+
+        means = np.dot(means, self._motion_mat.T)
+        covariances = np.matmul(np.matmul(self._motion_mat, covariances), self._motion_mat.T)
+        diagonal = np.arange(means.shape[1])
+        covariances[:, diagonal, diagonal] += np.square(std)
+        return means, covariances
+
+    def project_batch(self, means, covariances):
+        """Project many state distributions to measurement space.
+
+        Parameters
+        ----------
+        means : ndarray
+            The Nx8 dimensional mean matrix.
+        covariances : ndarray
+            The Nx8x8 dimensional covariance matrices.
+
+        Returns
+        -------
+        (ndarray, ndarray)
+            Returns the Nx4 projected means and Nx4x4 projected covariance
+            matrices.
+
+        """
+        height = means[:, 3]
+        std = np.empty((len(means), 4))
+        std[:, [0, 1, 3]] = self._std_weight_position * height[:, np.newaxis]
+        std[:, 2] = 1e-1
+
+        # The observation model selects the first four state dimensions.
+        projected_means = means[:, :4].copy()
+        projected_covariances = covariances[:, :4, :4].copy()
+        diagonal = np.arange(4)
+        projected_covariances[:, diagonal, diagonal] += np.square(std)
+        return projected_means, projected_covariances
+
+    def update_batch(self, means, covariances, measurements):
+        """Run Kalman filter correction step for many tracks at once.
+
+        Parameters
+        ----------
+        means : ndarray
+            The Nx8 dimensional predicted mean matrix.
+        covariances : ndarray
+            The Nx8x8 dimensional predicted covariance matrices.
+        measurements : ndarray
+            The Nx4 dimensional matrix of measurements (x, y, a, h), one per
+            track.
+
+        Returns
+        -------
+        (ndarray, ndarray)
+            Returns the measurement-corrected state distributions.
+
+        """
+        projected_means, projected_covariances = self.project_batch(means, covariances)
+
+        # K = P H^T S^-1, solved as S K^T = (P H^T)^T since S is symmetric.
+        kalman_gains = np.linalg.solve(
+            projected_covariances, covariances[:, :, :4].transpose(0, 2, 1)).transpose(0, 2, 1)
+        innovations = measurements - projected_means
+
+        new_means = means + np.matmul(kalman_gains, innovations[:, :, np.newaxis])[:, :, 0]
+        new_covariances = covariances - np.matmul(
+            np.matmul(kalman_gains, projected_covariances), kalman_gains.transpose(0, 2, 1))
+        return new_means, new_covariances
+
+    def gating_distance_batch(self, means, covariances, measurements,
+                              only_position=False):
+        """Compute gating distances between many state distributions and
+        measurements.
+
+        Parameters
+        ----------
+        means : ndarray
+            The Nx8 dimensional mean matrix.
+        covariances : ndarray
+            The Nx8x8 dimensional covariance matrices.
+        measurements : ndarray
+            An Mx4 dimensional matrix of M measurements in format (x, y, a, h).
+        only_position : Optional[bool]
+            If True, distance computation is done with respect to the bounding
+            box center position only.
+
+        Returns
+        -------
+        ndarray
+            Returns an NxM matrix, where element (i, j) contains the squared
+            Mahalanobis distance between (means[i], covariances[i]) and
+            `measurements[j]`.
+
+        """
+        projected_means, projected_covariances = self.project_batch(means, covariances)
+        if only_position:
+            projected_means = projected_means[:, :2]
+            projected_covariances = projected_covariances[:, :2, :2]
+            measurements = measurements[:, :2]
+
+        d = measurements[np.newaxis, :, :] - projected_means[:, np.newaxis, :]
+        solved = np.linalg.solve(projected_covariances, d.transpose(0, 2, 1))
+        return np.sum(d.transpose(0, 2, 1) * solved, axis=1)
@@ -55,17 +55,33 @@ def min_cost_matching(
 
     cost_matrix = distance_metric(
         tracks, detections, track_indices, detection_indices)
+    return _solve_assignment(
+        cost_matrix, max_distance, track_indices, detection_indices)
+
+
+def _solve_assignment(cost_matrix, max_distance, track_indices,
+                      detection_indices):
+    """Solve the assignment problem on a precomputed cost matrix.
+
+    Implements the bookkeeping of `min_cost_matching`: entries above
+    `max_distance` are clamped (in place) and assigned pairs whose cost
+    exceeds `max_distance` are reported as unmatched.
+
+    """
     cost_matrix[cost_matrix > max_distance] = max_distance + 1e-5
 
     row_indices, col_indices = linear_assignment(cost_matrix)
 
-    matches, unmatched_tracks, unmatched_detections = [], [], []
-    for col, detection_idx in enumerate(detection_indices):
-        if col not in col_indices:
-            unmatched_detections.append(detection_idx)
-    for row, track_idx in enumerate(track_indices):
-        if row not in row_indices:
-            unmatched_tracks.append(track_idx)
+    assigned_rows = np.zeros(len(track_indices), dtype=bool)
+    assigned_cols = np.zeros(len(detection_indices), dtype=bool)
+    assigned_rows[row_indices] = True
+    assigned_cols[col_indices] = True
+
+    matches = []
+    unmatched_tracks = [
+        track_indices[row] for row in np.flatnonzero(~assigned_rows)]
+    unmatched_detections = [
+        detection_indices[col] for col in np.flatnonzero(~assigned_cols)]
     for row, col in zip(row_indices, col_indices):
         track_idx = track_indices[row]
         detection_idx = detection_indices[col]
@@ -143,6 +159,102 @@ def matching_cascade(
     return matches, unmatched_tracks, unmatched_detections
 
 
+def grouped_matching(
+        distance_metric, max_distance, cascade_depth, tracks, detections,
+        track_indices=None, detection_indices=None):
+    """Run the matching cascade on a single precomputed cost matrix.
+
+    Produces the same associations as `matching_cascade`, but evaluates
+    `distance_metric` once for all tracks and detections and then solves
+    one assignment per distinct track age (youngest first) on the rows of
+    that age and the detections left over by the previous groups, instead
+    of visiting all `cascade_depth` levels.
+
+    Parameters and return value are the same as for `matching_cascade`.
+
+    """
+    if track_indices is None:
+        track_indices = list(range(len(tracks)))
+    if detection_indices is None:
+        detection_indices = list(range(len(detections)))
+
+    ages = np.array(
+        [tracks[k].time_since_update for k in track_indices], dtype=int)
+    rows = np.flatnonzero((ages >= 1) & (ages <= cascade_depth))
+    unmatched_detections = detection_indices
+    matches = []
+    if len(rows) and len(detection_indices):
+        eligible_tracks = [track_indices[row] for row in rows]
+        cost_matrix = distance_metric(
+            tracks, detections, eligible_tracks, detection_indices)
+        ages = ages[rows]
+        column = {idx: col for col, idx in enumerate(detection_indices)}
+        for age in np.unique(ages):
+            if len(unmatched_detections) == 0:
+                break
+            group = np.flatnonzero(ages == age)
+            cols = [column[idx] for idx in unmatched_detections]
+            matches_l, _, unmatched_detections = _solve_assignment(
+                cost_matrix[np.ix_(group, cols)], max_distance,
+                [eligible_tracks[row] for row in group], unmatched_detections)
+            matches += matches_l
+    unmatched_tracks = list(set(track_indices) - set(k for k, _ in matches))
+    return matches, unmatched_tracks, unmatched_detections
+
+
+def single_pass_matching(
+        distance_metric, max_distance, cascade_depth, tracks, detections,
+        track_indices=None, detection_indices=None, age_cost=1e-3):
+    """Associate all tracks in one assignment with an age-based cost bias.
+
+    Instead of matching recently updated tracks first, every feasible entry
+    of the cost matrix is raised by `age_cost` per frame since the track's
+    last update, so that among otherwise equal candidates the younger track
+    wins. Feasibility is still decided on the unbiased cost. The result can
+    differ from `matching_cascade` when a stale track would have to give up
+    a detection to a younger one.
+
+    Parameters
+    ----------
+    age_cost : float
+        Cost added per frame of `time_since_update` beyond the first.
+
+    Other parameters and the return value are the same as for
+    `matching_cascade`.
+
+    """
+    if track_indices is None:
+        track_indices = list(range(len(tracks)))
+    if detection_indices is None:
+        detection_indices = list(range(len(detections)))
+
+    ages = np.array(
+        [tracks[k].time_since_update for k in track_indices], dtype=int)
+    rows = np.flatnonzero((ages >= 1) & (ages <= cascade_depth))
+    if len(rows) == 0 or len(detection_indices) == 0:
+        return [], list(set(track_indices)), detection_indices
+
+    eligible_tracks = [track_indices[row] for row in rows]
+    cost_matrix = distance_metric(
+        tracks, detections, eligible_tracks, detection_indices)
+    feasible = cost_matrix <= max_distance
+    biased = cost_matrix + age_cost * (ages[rows] - 1)[:, None]
+    biased[~feasible] = max_distance + age_cost * cascade_depth + 1e-5
+
+    row_indices, col_indices = linear_assignment(biased)
+    accepted = feasible[row_indices, col_indices]
+    matches = [
+        (eligible_tracks[row], detection_indices[col]) for row, col in
+        zip(row_indices[accepted], col_indices[accepted])]
+
+    matched_cols = np.zeros(len(detection_indices), dtype=bool)
+    matched_cols[col_indices[accepted]] = True
+    unmatched_detections = [
+        detection_indices[col] for col in np.flatnonzero(~matched_cols)]
+    unmatched_tracks = list(set(track_indices) - set(k for k, _ in matches))
+    return matches, unmatched_tracks, unmatched_detections
+
+
 def gate_cost_matrix(
         kf, cost_matrix, tracks, detections, track_indices, detection_indices,
         gated_cost=INFTY_COST, only_position=False):
@@ -182,11 +294,13 @@ def gate_cost_matrix(
     """
     gating_dim = 2 if only_position else 4
     gating_threshold = kalman_filter.chi2inv95[gating_dim]
+    if not len(track_indices) or not len(detection_indices):
+        return cost_matrix
     measurements = np.asarray(
         [detections[i].to_xyah() for i in detection_indices])
-    for row, track_idx in enumerate(track_indices):
-        track = tracks[track_idx]
-        gating_distance = kf.gating_distance(
-            track.mean, track.covariance, measurements, only_position)
-        cost_matrix[row, gating_distance > gating_threshold] = gated_cost
+    means = np.asarray([tracks[i].mean for i in track_indices])
+    covariances = np.asarray([tracks[i].covariance for i in track_indices])
+    gating_distance = kf.gating_distance_batch(
+        means, covariances, measurements, only_position)
+    cost_matrix[gating_distance > gating_threshold] = gated_cost
     return cost_matrix
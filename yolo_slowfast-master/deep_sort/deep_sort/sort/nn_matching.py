@@ -1,5 +1,6 @@
 # vim: expandtab:ts=4:sw=4
 import numpy as np
+import torch
 
 
 def _pdist(a, b):
@@ -96,6 +97,341 @@ def _nn_cosine_distance(x, y):
     return distances.min(axis=0)
 
 
+class FeatureGallery(object):
+    """
+    Fixed-size appearance gallery stored in a single preallocated array.
+
+    Each target owns one row of a ``(targets, budget, dim)`` array that is
+    used as a ring buffer: a per-target write cursor points to the slot that
+    is overwritten next, so appending never copies or re-slices samples.
+    Rows of targets that leave the scene are recycled.
+
+    The sample axis starts at 8 slots and doubles up to `budget` as targets
+    accumulate samples, and the target axis doubles when all rows are taken.
+    Once every target has a full budget the array therefore holds up to
+    twice as many rows as live targets (e.g. 64 rows for 50 targets), which
+    is more than a per-target list of samples would use; the headroom is
+    what lets new targets and new samples be written without reallocating.
+
+    Parameters
+    ----------
+    budget : Optional[int]
+        Number of samples kept per target. If None, the sample axis grows
+        on demand and no sample is ever overwritten.
+    normalize : bool
+        If True, samples are normalized to unit length before they are
+        stored (used by the cosine metric).
+    dtype : Optional[type]
+        Storage type of the samples. ``np.float16`` halves the gallery
+        memory; distances are still computed in float32, converting the
+        queried samples into a reused float32 buffer.
+    capacity : int
+        Initial number of target rows; doubled when exhausted.
+
+    """
+
+    def __init__(self, budget=None, normalize=True, dtype=np.float32, capacity=32):
+        self.budget = budget
+        self.normalize = normalize
+        self.dtype = np.dtype(dtype)
+        self._capacity = capacity
+        self._data = None  # (targets, budget, dim) samples
+        self._sq_norms = None  # (targets, budget) squared sample norms
+        self._counts = None  # number of valid samples per row
+        self._cursors = None  # next slot to write per row
+        self._rows = {}  # target -> row
+        self._free = []
+        self._scratch = None  # float32 copy of float16 samples in `nearest`
+
+    def _allocate(self, dim):
+        slots = min(self.budget, 8) if self.budget is not None else 8
+        self._data = np.zeros((self._capacity, slots, dim), dtype=self.dtype)
+        self._sq_norms = np.zeros((self._capacity, slots), dtype=np.float32)
+        self._counts = np.zeros(self._capacity, dtype=np.int64)
+        self._cursors = np.zeros(self._capacity, dtype=np.int64)
+        self._free = list(range(self._capacity - 1, -1, -1))
+
+    def _grow_rows(self):
+        old = len(self._data)
+        pad = ((0, old), (0, 0), (0, 0))
+        self._data = np.pad(self._data, pad)
+        self._sq_norms = np.pad(self._sq_norms, pad[:2])
+        self._counts = np.pad(self._counts, pad[:1])
+        self._cursors = np.pad(self._cursors, pad[:1])
+        self._free.extend(range(2 * old - 1, old - 1, -1))
+
+    def _grow_slots(self):
+        slots = self._data.shape[1]
+        pad = slots if self.budget is None else min(slots, self.budget - slots)
+        self._data = np.pad(self._data, ((0, 0), (0, pad), (0, 0)))
+        self._sq_norms = np.pad(self._sq_norms, ((0, 0), (0, pad)))
+
+    def _reserve_slots(self, max_slot):
+        while max_slot >= self._data.shape[1]:
+            self._grow_slots()
+
+    def _row(self, target):
+        row = self._rows.get(target)
+        if row is None:
+            if not self._free:
+                self._grow_rows()
+            row = self._free.pop()
+            self._rows[target] = row
+            self._counts[row] = 0
+            self._cursors[row] = 0
+        return row
+
+    def _prepare(self, features):
+        features = np.asarray(features, dtype=np.float32)
+        if self.normalize:
+            features = features / np.linalg.norm(features, axis=1, keepdims=True)
+        return features
+
+    def __contains__(self, target):
+        return target in self._rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    @property
+    def nbytes(self):
+        """int: Memory held by the gallery arrays."""
+        if self._data is None:
+            return 0
+        return self._data.nbytes + self._sq_norms.nbytes + self._counts.nbytes + self._cursors.nbytes
+
+    def _store(self, rows, slots, features):
+        features = features.astype(self.dtype)
+        self._data[rows, slots] = features
+        self._sq_norms[rows, slots] = np.square(features.astype(np.float32)).sum(axis=-1)
+
+    def add(self, features, targets):
+        """Append samples to the ring buffers of their targets.
+
+        Parameters
+        ----------
+        features : ndarray
+            An NxM matrix of N features of dimensionality M.
+        targets : array_like
+            The target identity of each feature.
+
+        """
+        if len(features) == 0:
+            return
+        features = self._prepare(features)
+        if self._data is None:
+            self._allocate(features.shape[1])
+
+        # Several samples of one target are written to consecutive slots.
+        rows = np.array([self._row(target) for target in targets], dtype=np.int64)
+        order = np.argsort(rows, kind="stable")
+        sorted_rows = rows[order]
+        first = np.r_[0, np.flatnonzero(np.diff(sorted_rows)) + 1]
+        offsets = np.empty(len(rows), dtype=np.int64)
+        offsets[order] = np.arange(len(rows)) - np.repeat(first, np.diff(np.r_[first, len(rows)]))
+        unique_rows = sorted_rows[first]
+        added = np.bincount(sorted_rows, minlength=len(self._counts))[unique_rows]
+
+        slots = self._cursors[rows] + offsets
+        if self.budget is None:
+            self._cursors[unique_rows] += added
+            self._counts[unique_rows] = self._cursors[unique_rows]
+        else:
+            slots %= self.budget
+            self._cursors[unique_rows] = (self._cursors[unique_rows] + added) % self.budget
+            self._counts[unique_rows] = np.minimum(self._counts[unique_rows] + added, self.budget)
+        self._reserve_slots(slots.max())
+        self._store(rows, slots, features)
+
+    def retain(self, active_targets):
+        """Release the rows of all targets not in `active_targets`."""
+        active_targets = set(active_targets)
+        for target in [t for t in self._rows if t not in active_targets]:
+            self._free.append(self._rows.pop(target))
+
+    def samples(self, target):
+        """Return the stored samples of `target`, oldest first."""
+        row = self._rows[target]
+        count, cursor = self._counts[row], self._cursors[row]
+        if self.budget is None or count < self.budget:
+            return self._data[row, :count].copy()
+        return np.roll(self._data[row, :self.budget], -cursor, axis=0)
+
+    def _dot(self, samples, features):
+        """Products of an (n, dim) sample matrix with N query features."""
+        if self.dtype != np.float16:
+            return np.dot(samples, features.T)
+        # numpy upcasts float16 operands element by element into a fresh
+        # array, which costs more than the product itself.
+        if self._scratch is None or len(self._scratch) < len(samples):
+            capacity = max(len(samples), 2 * len(self._scratch) if self._scratch is not None else 0)
+            self._scratch = torch.empty((capacity, samples.shape[1]), dtype=torch.float32)
+        scratch = self._scratch[:len(samples)]
+        scratch.copy_(torch.from_numpy(samples))
+        return torch.mm(scratch, torch.from_numpy(features).t()).numpy()
+
+    def nearest(self, features, targets, metric):
+        """Smallest distance between each target's samples and each feature.
+
+        Parameters
+        ----------
+        features : ndarray
+            An NxM matrix of N query features.
+        targets : List[int]
+            Targets to compare against; targets without samples get an
+            infinite distance.
+        metric : str
+            Either "euclidean" (squared distance) or "cosine".
+
+        Returns
+        -------
+        ndarray
+            A matrix of shape len(targets), len(features).
+
+        """
+        cost_matrix = np.full((len(targets), len(features)), np.inf)
+        rows = np.array([self._rows.get(t, -1) for t in targets], dtype=np.int64)
+        known = rows >= 0
+        if len(features) == 0 or not known.any():
+            return cost_matrix
+        rows = rows[known]
+        features = self._prepare(features)
+
+        # One (targets * budget, dim) x (dim, N) product for all targets. When
+        # most rows are queried, the used part of the gallery is multiplied
+        # in place instead of gathering a copy of the requested rows.
+        num_rows, slots, dim = self._data.shape
+        used = rows.max() + 1
+        if 2 * len(rows) >= used:
+            products = self._dot(self._data[:used].reshape(-1, dim), features)
+            products = products.reshape(used, slots, -1)[rows]
+        else:
+            products = self._dot(self._data[rows].reshape(-1, dim), features)
+            products = products.reshape(len(rows), slots, -1)
+        if metric == "cosine":
+            distances = 1. - products
+        else:
+            distances = -2. * products
+            distances += self._sq_norms[rows][:, :, None]
+            distances += np.square(features).sum(axis=1)[None, None, :]
+            np.maximum(distances, 0., out=distances)
+
+        empty = np.arange(slots)[None, :] >= self._counts[rows][:, None]
+        distances[empty] = np.inf
+        cost_matrix[known] = distances.min(axis=1)
+        return cost_matrix
+
+
+class EmaGallery(FeatureGallery):
+    """
+    Gallery that keeps a single exponential moving average embedding per
+    target instead of a sample history.
+
+    Parameters
+    ----------
+    alpha : float
+        Weight of the previous embedding; each new sample contributes
+        ``1 - alpha``.
+    normalize : bool
+        If True, samples and the running average are kept at unit length.
+    dtype : Optional[type]
+        Storage type of the embeddings.
+
+    """
+
+    def __init__(self, alpha=0.9, normalize=True, dtype=np.float32, capacity=32):
+        super(EmaGallery, self).__init__(1, normalize, dtype, capacity)
+        self.alpha = alpha
+
+    def add(self, features, targets):
+        if len(features) == 0:
+            return
+        features = self._prepare(features)
+        if self._data is None:
+            self._allocate(features.shape[1])
+        for feature, target in zip(features, targets):
+            row = self._row(target)
+            if self._counts[row]:
+                feature = self.alpha * self._data[row, 0].astype(np.float32) + (1. - self.alpha) * feature
+                if self.normalize:
+                    feature /= np.linalg.norm(feature)
+            self._store(row, 0, feature)
+            self._counts[row] = 1
+
+
+class CentroidGallery(FeatureGallery):
+    """
+    Gallery that summarizes each target by up to `num_centroids` centroids
+    maintained with online k-means.
+
+    The first samples of a target seed the centroids; every later sample
+    moves its nearest centroid towards it by ``1 / weight``, where the
+    weight counts the samples absorbed by that centroid and is capped at
+    `max_weight` so that the summary keeps adapting to appearance changes.
+
+    Parameters
+    ----------
+    num_centroids : int
+        Number of centroids per target.
+    max_weight : int
+        Cap on the per-centroid sample count.
+    normalize : bool
+        If True, samples and centroids are kept at unit length.
+    dtype : Optional[type]
+        Storage type of the centroids.
+
+    """
+
+    def __init__(self, num_centroids=8, max_weight=30, normalize=True, dtype=np.float32, capacity=32):
+        super(CentroidGallery, self).__init__(num_centroids, normalize, dtype, capacity)
+        self.max_weight = max_weight
+        self._weights = None
+
+    def _allocate(self, dim):
+        super(CentroidGallery, self)._allocate(dim)
+        self._weights = np.zeros(self._data.shape[:2], dtype=np.float32)
+
+    def _grow_rows(self):
+        super(CentroidGallery, self)._grow_rows()
+        self._weights = np.pad(self._weights, ((0, len(self._data) - len(self._weights)), (0, 0)))
+
+    def _grow_slots(self):
+        super(CentroidGallery, self)._grow_slots()
+        self._weights = np.pad(self._weights, ((0, 0), (0, self._data.shape[1] - self._weights.shape[1])))
+
+    @property
+    def nbytes(self):
+        return super(CentroidGallery, self).nbytes + (0 if self._weights is None else self._weights.nbytes)
+
+    def add(self, features, targets):
+        if len(features) == 0:
+            return
+        features = self._prepare(features)
+        if self._data is None:
+            self._allocate(features.shape[1])
+        for feature, target in zip(features, targets):
+            row = self._row(target)
+            count = self._counts[row]
+            if count < self.budget:
+                self._reserve_slots(count)
+                self._store(row, count, feature)
+                self._weights[row, count] = 1.
+                self._counts[row] = count + 1
+                continue
+
+            centroids = self._data[row, :self.budget].astype(np.float32)
+            if self.normalize:
+                slot = int(np.argmax(np.dot(centroids, feature)))
+            else:
+                slot = int(np.argmin(np.square(centroids - feature).sum(axis=1)))
+            weight = min(self._weights[row, slot] + 1., self.max_weight)
+            centroid = centroids[slot] + (feature - centroids[slot]) / weight
+            if self.normalize:
+                centroid /= np.linalg.norm(centroid)
+            self._store(row, slot, centroid)
+            self._weights[row, slot] = weight
+
+
 class NearestNeighborDistanceMetric(object):
     """
     A nearest neighbor distance metric that, for each target, returns
@@ -110,29 +446,54 @@ class NearestNeighborDistanceMetric(object):
         invalid match.
     budget : Optional[int]
         If not None, fix samples per class to at most this number. Removes
-        the oldest samples when the budget is reached.
+        the oldest samples when the budget is reached. Only used by the
+        "full" gallery.
+    gallery : str
+        Appearance memory of each target: "full" keeps the last `budget`
+        samples, "ema" a single moving-average embedding and "centroids"
+        `num_centroids` online k-means centroids.
+    dtype : Optional[type]
+        Storage type of the gallery, e.g. ``np.float16``.
+    ema_alpha : float
+        Weight of the previous embedding in "ema" mode.
+    num_centroids : int
+        Centroids per target in "centroids" mode.
 
     Attributes
     ----------
-    samples : Dict[int -> List[ndarray]]
-        A dictionary that maps from target identities to the list of samples
-        that have been observed so far.
+    gallery : FeatureGallery
+        Storage of the samples (or summaries) observed so far for each
+        target. Samples are stored unit-normalized for the cosine metric.
 
     """
 
-    def __init__(self, metric, matching_threshold, budget=None):
+    GALLERY_MODES = ("full", "ema", "centroids")
 
+    def __init__(self, metric, matching_threshold, budget=None, gallery="full",
+                 dtype=np.float32, ema_alpha=0.9, num_centroids=8):
 
-        if metric == "euclidean":
-            self._metric = _nn_euclidean_distance
-        elif metric == "cosine":
-            self._metric = _nn_cosine_distance
-        else:
+
+        if metric not in ("euclidean", "cosine"):
             raise ValueError(
                 "Invalid metric; must be either 'euclidean' or 'cosine'")
+        if gallery not in self.GALLERY_MODES:
+            raise ValueError(
+                "Invalid gallery; must be one of %s" % ", ".join(self.GALLERY_MODES))
+        self.metric = metric
         self.matching_threshold = matching_threshold
         self.budget = budget
-        self.samples = {}
+        normalize = metric == "cosine"
+        if gallery == "ema":
+            self.gallery = EmaGallery(ema_alpha, normalize, dtype)
+        elif gallery == "centroids":
+            self.gallery = CentroidGallery(num_centroids, normalize=normalize, dtype=dtype)
+        else:
+            self.gallery = FeatureGallery(budget, normalize, dtype)
+
+    @property
+    def samples(self):
+        """Dict[int -> ndarray]: the stored samples of each target, oldest first."""
+        return {target: self.gallery.samples(target) for target in self.gallery._rows}
 
     def partial_fit(self, features, targets, active_targets):
         """Update the distance metric with new data.
@@ -147,11 +508,8 @@ class NearestNeighborDistanceMetric(object):
             A list of targets that are currently present in the scene.
 
         """
-        for feature, target in zip(features, targets):
-            self.samples.setdefault(target, []).append(feature)
-            if self.budget is not None:
-                self.samples[target] = self.samples[target][-self.budget:]
-        self.samples = {k: self.samples[k] for k in active_targets}
+        self.gallery.add(features, targets)
+        self.gallery.retain(active_targets)
 
     def distance(self, features, targets):
         """Compute distance between features and targets.
@@ -171,7 +529,4 @@ class NearestNeighborDistanceMetric(object):
             `targets[i]` and `features[j]`.
 
         """
-        cost_matrix = np.zeros((len(targets), len(features)))
-        for i, target in enumerate(targets):
-            cost_matrix[i, :] = self._metric(self.samples[target], features)
-        return cost_matrix
+        return self.gallery.nearest(features, targets, self.metric)
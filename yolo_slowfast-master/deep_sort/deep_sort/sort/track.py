@@ -1,4 +1,70 @@
 # vim: expandtab:ts=4:sw=4
+import numpy as np
+
+
+class TrackStateStore:
+    """
+    Struct-of-arrays storage for the Kalman state of a set of tracks.
+
+    Means and covariances of all live tracks are kept in the first `size`
+    rows of contiguous (N, 8) and (N, 8, 8) arrays, so the Kalman filter can
+    predict, update and gate every track with a few vectorized calls.
+    Removing a track moves the last row into the freed slot.
+
+    Parameters
+    ----------
+    capacity : int
+        Initial number of rows. The arrays double in size when full.
+    ndim : int
+        Dimension of the state space.
+
+    Attributes
+    ----------
+    size : int
+        Number of rows in use.
+
+    """
+
+    def __init__(self, capacity=32, ndim=8):
+        capacity = max(1, capacity)
+        self.means = np.zeros((capacity, ndim))
+        self.covariances = np.zeros((capacity, ndim, ndim))
+        self.size = 0
+        self._owners = []
+
+    def add(self, owner, mean, covariance):
+        """Append a state and return its row index."""
+        if self.size == len(self.means):
+            self.means = np.concatenate([self.means, np.zeros_like(self.means)])
+            self.covariances = np.concatenate([self.covariances, np.zeros_like(self.covariances)])
+        slot = self.size
+        self.means[slot] = mean
+        self.covariances[slot] = covariance
+        self._owners.append(owner)
+        self.size += 1
+        return slot
+
+    def remove(self, slot):
+        """Free a row, moving the last row into its place."""
+        last = self.size - 1
+        if slot != last:
+            self.means[slot] = self.means[last]
+            self.covariances[slot] = self.covariances[last]
+            owner = self._owners[last]
+            owner._slot = slot
+            self._owners[slot] = owner
+        self._owners.pop()
+        self.size -= 1
+
+    @property
+    def active_means(self):
+        """View of the means of all stored tracks, in row order."""
+        return self.means[:self.size]
+
+    @property
+    def active_covariances(self):
+        """View of the covariances of all stored tracks, in row order."""
+        return self.covariances[:self.size]
 
 
 class TrackState:
@@ -40,13 +106,18 @@ class Track:
     feature : Optional[ndarray]
         Feature vector of the detection this track originates from. If not None,
         this feature is added to the `features` cache.
+    store : Optional[TrackStateStore]
+        Shared state storage. The track keeps its mean and covariance in one
+        row of the store. Defaults to a private single-row store.
 
     Attributes
     ----------
     mean : ndarray
-        Mean vector of the initial state distribution.
+        Mean vector of the current state distribution (a view onto the
+        store row).
     covariance : ndarray
-        Covariance matrix of the initial state distribution.
+        Covariance matrix of the current state distribution (a view onto the
+        store row).
     track_id : int
         A unique track identifier.
     hits : int
@@ -60,13 +131,16 @@ class Track:
     features : List[ndarray]
         A cache of features. On each measurement update, the associated feature
         vector is added to this list.
+    time_since_feature : int
+        Number of measurement updates since the last one that carried a
+        feature vector.
 
     """
 
     def __init__(self, mean, covariance, track_id, n_init, max_age,
-                 feature=None,label=None):
-        self.mean = mean
-        self.covariance = covariance
+                 feature=None,label=None, store=None):
+        self._store = store if store is not None else TrackStateStore(capacity=1)
+        self._slot = self._store.add(self, mean, covariance)
         self.track_id = track_id
         self.hits = 1
         self.age = 1
@@ -74,6 +148,7 @@ class Track:
 
         self.state = TrackState.Tentative
         self.features = []
+        self.time_since_feature = 0
         self.label=label if label is not None else -1
         if feature is not None:
             self.features.append(feature)
@@ -81,6 +156,33 @@ class Track:
         self._n_init = n_init
         self._max_age = max_age
 
+    @property
+    def mean(self):
+        return self._store.means[self._slot]
+
+    @mean.setter
+    def mean(self, value):
+        self._store.means[self._slot] = value
+
+    @property
+    def covariance(self):
+        return self._store.covariances[self._slot]
+
+    @covariance.setter
+    def covariance(self, value):
+        self._store.covariances[self._slot] = value
+
+    @property
+    def slot(self):
+        """Row of this track in its state store."""
+        return self._slot
+
+    def release(self):
+        """Remove the state of this track from its store."""
+        if self._slot is not None:
+            self._store.remove(self._slot)
+            self._slot = None
+
     def to_tlwh(self):
         """Get current position in bounding box format `(top left x, top left y,
         width, height)`.
@@ -124,6 +226,23 @@ class Track:
         self.age += 1
         self.time_since_update += 1
 
+    def propagate(self, kf):
+        """Propagate the state distribution one time step forward on a frame
+        where the detector was skipped.
+
+        Unlike `predict`, this does not count as a missed measurement, so
+        `time_since_update` keeps its value from the last detection frame and
+        the matching cascade sees the track as if no frame had been skipped.
+
+        Parameters
+        ----------
+        kf : kalman_filter.KalmanFilter
+            The Kalman filter.
+
+        """
+        self.mean, self.covariance = kf.predict(self.mean, self.covariance)
+        self.age += 1
+
     def update(self, kf, detection):
         """Perform Kalman filter measurement update step and update the feature
         cache.
@@ -138,7 +257,17 @@ class Track:
         """
         self.mean, self.covariance = kf.update(
             self.mean, self.covariance, detection.to_xyah())
-        self.features.append(detection.feature)
+        self.mark_updated(detection)
+
+    def mark_updated(self, detection):
+        """Record an associated detection after the Kalman state has been
+        corrected: update the feature cache, label, hit counter and state.
+        """
+        if detection.feature is not None:
+            self.features.append(detection.feature)
+            self.time_since_feature = 0
+        else:
+            self.time_since_feature += 1
         self.label=detection.label
         self.hits += 1
         self.time_since_update = 0
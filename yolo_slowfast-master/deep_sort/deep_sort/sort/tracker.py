@@ -4,7 +4,7 @@ import numpy as np
 from . import kalman_filter
 from . import linear_assignment
 from . import iou_matching
-from .track import Track
+from .track import Track, TrackStateStore
 
 
 class Tracker:
@@ -21,6 +21,11 @@ class Tracker:
         Number of consecutive detections before the track is confirmed. The
         track state is set to `Deleted` if a miss occurs within the first
         `n_init` frames.
+    matching : str
+        Association of confirmed tracks by appearance: "cascade" runs
+        `linear_assignment.matching_cascade`, "grouped" the equivalent
+        `grouped_matching` on a single cost matrix and "single" one
+        age-biased assignment (`single_pass_matching`).
 
     Attributes
     ----------
@@ -33,18 +38,32 @@ class Tracker:
     kf : kalman_filter.KalmanFilter
         A Kalman filter to filter target trajectories in image space.
     tracks : List[Track]
-        The list of active tracks at the current time step.
+        The list of active tracks at the current time step. Their Kalman
+        states live in one shared `TrackStateStore`, so predict, update and
+        gating run vectorized over all tracks.
 
     """
 
-    def __init__(self, metric, max_iou_distance=0.7, max_age=70, n_init=3):
+    MATCHING = {
+        "cascade": linear_assignment.matching_cascade,
+        "grouped": linear_assignment.grouped_matching,
+        "single": linear_assignment.single_pass_matching,
+    }
+
+    def __init__(self, metric, max_iou_distance=0.7, max_age=70, n_init=3,
+                 matching="cascade"):
+        if matching not in self.MATCHING:
+            raise ValueError(
+                "Invalid matching; must be one of %s" % ", ".join(self.MATCHING))
         self.metric = metric
+        self.matching = matching
         self.max_iou_distance = max_iou_distance
         self.max_age = max_age
         self.n_init = n_init
 
         self.kf = kalman_filter.KalmanFilter()
         self.tracks = []
+        self._store = TrackStateStore()
         self._next_id = 1
 
     def predict(self):
@@ -52,30 +71,68 @@ class Tracker:
 
         This function should be called once every time step, before `update`.
         """
+        self._predict_states()
         for track in self.tracks:
-            track.predict(self.kf)
+            track.age += 1
+            track.time_since_update += 1
 
-    def update(self, detections):
+    def propagate(self):
+        """Propagate track state distributions one time step forward on a
+        frame without detections (detector skipped on purpose).
+
+        Call this instead of `predict`/`update` on skipped frames. Track
+        `age` still counts every frame, but the miss counter
+        (`time_since_update`) and the hit counter are left untouched, so
+        `max_age` and `n_init` keep counting detection frames only.
+        """
+        self._predict_states()
+        for track in self.tracks:
+            track.age += 1
+
+    def _predict_states(self):
+        # The store holds exactly the states of `self.tracks`.
+        size = self._store.size
+        if not size:
+            return
+        means, covariances = self.kf.predict_batch(
+            self._store.active_means, self._store.active_covariances)
+        self._store.means[:size] = means
+        self._store.covariances[:size] = covariances
+
+    def update(self, detections, pre_matches=None):
         """Perform measurement update and track management.
 
         Parameters
         ----------
         detections : List[deep_sort.detection.Detection]
             A list of detections at the current time step.
+        pre_matches : Optional[List[(int, int)]]
+            Pairs of track and detection indices that are already associated,
+            e.g. by `confident_matches`. They bypass the matching cascade.
 
         """
         # Run matching cascade.
         matches, unmatched_tracks, unmatched_detections = \
-            self._match(detections)
+            self._match(detections, pre_matches or [])
 
         # Update track set.
+        if matches:
+            slots = [self.tracks[track_idx].slot for track_idx, _ in matches]
+            measurements = np.asarray(
+                [detections[detection_idx].to_xyah() for _, detection_idx in matches])
+            means, covariances = self.kf.update_batch(
+                self._store.means[slots], self._store.covariances[slots], measurements)
+            self._store.means[slots] = means
+            self._store.covariances[slots] = covariances
         for track_idx, detection_idx in matches:
-            self.tracks[track_idx].update(
-                self.kf, detections[detection_idx])
+            self.tracks[track_idx].mark_updated(detections[detection_idx])
         for track_idx in unmatched_tracks:
             self.tracks[track_idx].mark_missed()
         for detection_idx in unmatched_detections:
             self._initiate_track(detections[detection_idx])
+        for track in self.tracks:
+            if track.is_deleted():
+                track.release()
         self.tracks = [t for t in self.tracks if not t.is_deleted()]
 
         # Update distance metric.
@@ -90,7 +147,51 @@ class Tracker:
         self.metric.partial_fit(
             np.asarray(features), np.asarray(targets), active_targets)
 
-    def _match(self, detections):
+    def confident_matches(self, detections, min_iou=0.5, ambiguous_iou=0.2,
+                          refresh_interval=10):
+        """Find track/detection pairs that can be associated by overlap alone.
+
+        A confirmed track that was updated on the previous time step and a
+        detection form a confident pair if their IoU is at least `min_iou`
+        and neither of them overlaps any other detection or track by more
+        than `ambiguous_iou`. Tracks that have gone `refresh_interval`
+        updates without a feature vector are left out, so that their
+        appearance gallery is refreshed periodically. Call after `predict`.
+
+        Parameters
+        ----------
+        detections : List[deep_sort.detection.Detection]
+            Detections at the current time step; features are not needed.
+        min_iou : float
+            Minimum overlap of a confident pair.
+        ambiguous_iou : float
+            Overlap above which another track or detection makes the pair
+            ambiguous. Must be smaller than `min_iou`.
+        refresh_interval : int
+            Maximum number of consecutive updates without a feature vector.
+
+        Returns
+        -------
+        List[(int, int)]
+            Confident pairs of track and detection indices.
+
+        """
+        if not self.tracks or not detections:
+            return []
+        overlap = iou_matching.iou_matrix(
+            np.asarray([t.to_tlwh() for t in self.tracks]),
+            np.asarray([d.tlwh for d in detections]))
+        ambiguous = overlap > ambiguous_iou
+        isolated = (ambiguous.sum(axis=1) == 1)[:, None] & \
+            (ambiguous.sum(axis=0) == 1)[None, :]
+        eligible = np.array([
+            t.is_confirmed() and t.time_since_update == 1 and
+            t.time_since_feature < refresh_interval for t in self.tracks])
+        rows, cols = np.nonzero(
+            (overlap >= min_iou) & isolated & eligible[:, None])
+        return list(zip(rows.tolist(), cols.tolist()))
+
+    def _match(self, detections, pre_matches):
 
         def gated_metric(tracks, dets, track_indices, detection_indices):
             features = np.array([dets[i].feature for i in detection_indices])
@@ -103,16 +204,22 @@ class Tracker:
             return cost_matrix
 
         # Split track set into confirmed and unconfirmed tracks.
+        matched_tracks = {track_idx for track_idx, _ in pre_matches}
+        matched_detections = {detection_idx for _, detection_idx in pre_matches}
         confirmed_tracks = [
-            i for i, t in enumerate(self.tracks) if t.is_confirmed()]
+            i for i, t in enumerate(self.tracks)
+            if t.is_confirmed() and i not in matched_tracks]
         unconfirmed_tracks = [
-            i for i, t in enumerate(self.tracks) if not t.is_confirmed()]
+            i for i, t in enumerate(self.tracks)
+            if not t.is_confirmed() and i not in matched_tracks]
+        detection_indices = [
+            i for i in range(len(detections)) if i not in matched_detections]
 
         # Associate confirmed tracks using appearance features.
         matches_a, unmatched_tracks_a, unmatched_detections = \
-            linear_assignment.matching_cascade(
+            self.MATCHING[self.matching](
                 gated_metric, self.metric.matching_threshold, self.max_age,
-                self.tracks, detections, confirmed_tracks)
+                self.tracks, detections, confirmed_tracks, detection_indices)
 
         # Associate remaining tracks together with unconfirmed tracks using IOU.
         iou_track_candidates = unconfirmed_tracks + [
@@ -126,7 +233,7 @@ class Tracker:
                 iou_matching.iou_cost, self.max_iou_distance, self.tracks,
                 detections, iou_track_candidates, unmatched_detections)
 
-        matches = matches_a + matches_b
+        matches = list(pre_matches) + matches_a + matches_b
         unmatched_tracks = list(set(unmatched_tracks_a + unmatched_tracks_b))
         return matches, unmatched_tracks, unmatched_detections
 
@@ -134,5 +241,5 @@ class Tracker:
         mean, covariance = self.kf.initiate(detection.to_xyah())
         self.tracks.append(Track(
             mean, covariance, self._next_id, self.n_init, self.max_age,
-            detection.feature,detection.label))
+            detection.feature,detection.label, store=self._store))
         self._next_id += 1
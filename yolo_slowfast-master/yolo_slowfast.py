@@ -1,6 +1,6 @@
 from ultralytics import YOLO
 import numpy as np
-import os, cv2, time, torch, random, warnings, argparse, math
+import os, cv2, time, torch, random, warnings, argparse, math, traceback
 import threading
 import queue
 import contextlib
@@ -22,6 +22,92 @@ from pytorchvideo.models.hub import slowfast_r50_detection
 from deep_sort.deep_sort import DeepSort
 
 
+class ClipBuffer:
+    """SlowFast 片段缓冲区
+
+    帧数据直接写入预分配的 uint8 (T,H,W,3) 数组（写入时完成 BGR->RGB），取片段时返回该数组的
+    零拷贝 (C,T,H,W) 视图。片段的使用方在用完片段后调用 release(clip) 归还数组，之后的帧才会复用它；
+    没有已归还的数组时分配新数组。未归还的片段（如被片段队列丢弃）不会被覆盖，其数组随片段对象一起回收。
+    写满后继续追加会覆盖最旧的帧。
+    """
+
+    # 最多记录的未归还片段数，更早的记录被遗忘（对应数组不再复用，不影响正确性）
+    MAX_LEASES = 16
+
+    def __init__(self, length=25, frame_shape=None, num_buffers=2):
+        self.length = length
+        self.num_buffers = max(1, num_buffers)
+        self._free = []  # 已归还、可复用的数组
+        self._leases = {}  # 片段数据地址 -> 已取出片段引用的数组
+        self._lock = threading.Lock()  # release 在行为识别线程中调用
+        self._buffer = None
+        self._pos = 0
+        self._count = 0
+        if frame_shape is not None and all(frame_shape):
+            self._buffer = self._acquire(tuple(frame_shape))
+
+    def __len__(self):
+        return min(self._count, self.length)
+
+    def _acquire(self, frame_shape):
+        with self._lock:
+            for i in range(len(self._free)):
+                if self._free[i].shape[1:] == frame_shape:
+                    return self._free.pop(i)
+        return np.empty((self.length,) + frame_shape, dtype=np.uint8)
+
+    def _recycle(self, array):
+        # 调用方需持有 self._lock
+        self._free.append(array)
+        if len(self._free) > self.num_buffers:
+            self._free.pop(0)
+
+    def append(self, img):
+        if self._buffer is None:
+            self._buffer = self._acquire(img.shape)
+        slot = self._buffer[self._pos]
+        if img.shape != slot.shape:
+            img = cv2.resize(img, (slot.shape[1], slot.shape[0]))
+        cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=slot)
+        self._pos = (self._pos + 1) % self.length
+        self._count += 1
+
+    def get_video_clip(self):
+        assert len(self) > 0, "clip length must large than 0 !"
+        buf = self._buffer
+        rolled = self._count > self.length and self._pos != 0
+        if rolled:
+            # 发生过覆盖时按时间顺序重排（仅此情况会产生一次拷贝）
+            buf = np.roll(buf, -self._pos, axis=0)
+        elif self._count < self.length:
+            buf = buf[:self._count]
+        clip = torch.from_numpy(buf).permute(3, 0, 1, 2)
+
+        with self._lock:
+            if rolled:
+                # 重排后的片段是拷贝，原数组可直接复用
+                self._recycle(self._buffer)
+            else:
+                self._leases[clip.data_ptr()] = self._buffer
+                while len(self._leases) > self.MAX_LEASES:
+                    del self._leases[next(iter(self._leases))]
+        self._buffer = None
+        self._pos = 0
+        self._count = 0
+        return clip
+
+    def release(self, clip):
+        """归还 get_video_clip 取出的片段，其数组可被后续帧覆盖，调用后不能再使用该片段"""
+        with self._lock:
+            array = self._leases.pop(clip.data_ptr(), None)
+            if array is not None:
+                self._recycle(array)
+
+    def clear(self):
+        self._pos = 0
+        self._count = 0
+
+
 class MyVideoCapture:
 
     def __init__(self, source):
@@ -46,18 +132,24 @@ class MyVideoCapture:
         print(f"视频源分辨率: {actual_width}x{actual_height}")
         self.idx = -1
         self.end = False
-        self.stack = []
+        self.stack = ClipBuffer(25, (int(actual_height), int(actual_width), 3))
+
+    def _read_frame(self):
+        """从视频源解码下一帧，子类可重写以改变取帧方式"""
+        return self.cap.read()
 
-    def read(self):
+    def read(self, push_to_stack=True):
+        """读取下一帧；push_to_stack 为 False 时由调用方自行按处理顺序写入 stack（批量检测时使用）"""
         self.idx += 1
-        ret, img = self.cap.read()
+        ret, img = self._read_frame()
         if not ret:
             print(f"警告: 无法读取视频帧 {self.idx}，可能是摄像头断开连接")
             self.end = True
             return ret, None
         if img is None or img.size == 0:
             print(f"警告: 读取到空图像 {self.idx}")
-            self.stack.append(np.zeros((480, 640, 3), dtype=np.uint8))  # 返回黑色占位图像
+            if push_to_stack:
+                self.stack.append(np.zeros((480, 640, 3), dtype=np.uint8))  # 返回黑色占位图像
             return ret, img
         # 显示原始摄像头帧用于调试 (仅在GUI模式下)
         if ENABLE_GUI:
@@ -67,7 +159,8 @@ class MyVideoCapture:
             except cv2.error as e:
                 print(f"GUI显示失败 (这在服务器环境中是正常的): {e}")
         print(f"原始图像尺寸: {img.shape}, 数据类型: {img.dtype}, 数据范围: [{img.min()}, {img.max()}]")
-        self.stack.append(img)
+        if push_to_stack:
+            self.stack.append(img)
         return ret, img
 
     def to_tensor(self, img):
@@ -75,12 +168,11 @@ class MyVideoCapture:
         return img.unsqueeze(0)
 
     def get_video_clip(self):
-        assert len(self.stack) > 0, "clip length must large than 0 !"
-        self.stack = [self.to_tensor(img) for img in self.stack]
-        clip = torch.cat(self.stack).permute(-1, 0, 1, 2)
-        del self.stack
-        self.stack = []
-        return clip
+        return self.stack.get_video_clip()
+
+    def release_clip(self, clip):
+        """片段用完后归还其缓冲数组，见 ClipBuffer.release"""
+        self.stack.release(clip)
 
     def release(self):
         """释放摄像头资源，确保完全关闭"""
@@ -106,6 +198,535 @@ class MyVideoCapture:
             self.end = True
 
 
+class PrefetchVideoCapture(MyVideoCapture):
+    """后台线程预解码的视频读取器
+
+    解码在独立线程中进行并写入有界队列，主线程的 read() 直接从队列取帧，
+    使解码与 YOLO/DeepSort/渲染重叠执行。read()/stack/get_video_clip() 的行为与 MyVideoCapture 一致。
+    """
+
+    def __init__(self, source, depth=8):
+        super().__init__(source)
+        self.depth = max(1, int(depth))
+        self._frames = queue.Queue(maxsize=self.depth)
+        self._stop_event = threading.Event()
+        self._reader = None
+
+    def _start_reader(self):
+        # 首次取帧时才启动线程，之前调用方仍可安全地读取 cap 的属性（帧数、帧率等）
+        self._reader = threading.Thread(target=self._reader_loop, daemon=True)
+        self._reader.start()
+
+    def _reader_loop(self):
+        while not self._stop_event.is_set():
+            ret, img = self.cap.read()
+            self._enqueue((ret, img))
+            if not ret:
+                break
+
+    def _enqueue(self, item):
+        while not self._stop_event.is_set():
+            try:
+                self._frames.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _read_frame(self):
+        if self._reader is None:
+            self._start_reader()
+        while True:
+            try:
+                return self._frames.get(timeout=0.5)
+            except queue.Empty:
+                if not self._reader.is_alive():
+                    return False, None
+
+    def release(self):
+        """先停止解码线程，再释放视频源"""
+        self._stop_event.set()
+        if self._reader is not None:
+            # 清空队列，避免解码线程阻塞在 put 上
+            while not self._frames.empty():
+                try:
+                    self._frames.get_nowait()
+                except queue.Empty:
+                    break
+            self._reader.join(timeout=2.0)
+            self._reader = None
+        super().release()
+
+
+class LatestFrameVideoCapture(PrefetchVideoCapture):
+    """实时视频源的最新帧读取器
+
+    后台线程持续抓帧，队列中只保留最新一帧，推理跟不上时丢弃旧帧并计数，
+    使端到端延迟不随推理耗时累积。仅适用于摄像头/网络流，视频文件请使用 PrefetchVideoCapture。
+    """
+
+    def __init__(self, source):
+        super().__init__(source, depth=1)
+        self.dropped_frames = 0
+
+    def _enqueue(self, item):
+        while not self._stop_event.is_set():
+            try:
+                self._frames.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._frames.get_nowait()
+                    self.dropped_frames += 1
+                except queue.Empty:
+                    pass
+
+
+def is_live_source(source):
+    """判断视频源是否为摄像头或网络流"""
+    if isinstance(source, int):
+        return True
+    return str(source).lower().startswith(('rtsp://', 'rtmp://', 'http://', 'https://'))
+
+
+def open_video_capture(source, mode='sync', prefetch_depth=8):
+    """按读取模式创建视频读取器
+
+    Args:
+        source: 摄像头ID或视频文件路径
+        mode: 'sync' 同步解码；'prefetch' 后台线程预解码；'latest' 实时源只取最新帧（视频文件按 'prefetch' 处理）
+        prefetch_depth: 预解码队列深度
+    """
+    if mode == 'latest' and is_live_source(source):
+        return LatestFrameVideoCapture(source)
+    if mode in ('prefetch', 'latest'):
+        return PrefetchVideoCapture(source, depth=prefetch_depth)
+    return MyVideoCapture(source)
+
+
+class ClipQueue(queue.Queue):
+    """有界的行为识别片段队列
+
+    SlowFast 跟不上时按 policy 丢弃片段，而不是让整段高分辨率片段无限积压：
+    - drop_oldest: 队列满时丢弃最早的片段
+    - drop_newest: 队列满时丢弃新提交的片段
+    - coalesce: 只保留最新片段，提交时丢弃所有尚未处理的片段
+    - block: 不丢弃，队列满时 put 阻塞等待（视频文件离线处理使用，保证每个片段都被识别）
+    除 block 外停止信号 None 不受容量限制，也不会被丢弃。get()/task_done() 与 queue.Queue 相同。
+    """
+
+    POLICIES = ('drop_oldest', 'drop_newest', 'coalesce', 'block')
+
+    def __init__(self, maxsize=2, policy='drop_oldest'):
+        """
+        Args:
+            maxsize: 最多积压的片段数
+            policy: 队列满时的丢弃策略
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"未知的片段队列策略: {policy}，可选: {', '.join(self.POLICIES)}")
+        self.capacity = max(1, int(maxsize))
+        # 丢弃策略的容量在 _put 中控制，put 从不阻塞检测线程
+        super().__init__(self.capacity if policy == 'block' else 0)
+        self.policy = policy
+        self.dropped_clips = 0
+        self.lag_frames = 0
+        self.max_lag_frames = 0
+
+    def _drop(self, item):
+        self.queue.remove(item)
+        self.dropped_clips += 1
+        self.unfinished_tasks -= 1
+
+    def _put(self, item):
+        if item is not None and self.policy != 'block':
+            pending = [clip for clip in self.queue if clip is not None]
+            if self.policy == 'coalesce':
+                for clip in pending:
+                    self._drop(clip)
+            elif len(pending) >= self.capacity:
+                if self.policy == 'drop_newest':
+                    # put() 随后会计入 unfinished_tasks，这里预先抵消
+                    self.dropped_clips += 1
+                    self.unfinished_tasks -= 1
+                    return
+                self._drop(pending[0])
+        self.queue.append(item)
+
+    def record_result(self, clip_index, frame_index):
+        """记录片段结果被应用时的延迟：当前帧序号 - 片段结束帧序号"""
+        self.lag_frames = max(0, frame_index - clip_index)
+        self.max_lag_frames = max(self.max_lag_frames, self.lag_frames)
+
+    def get_stats(self):
+        """队列深度、丢弃片段数与结果延迟（帧）"""
+        with self.mutex:
+            depth = sum(1 for clip in self.queue if clip is not None)
+        return {
+            'depth': depth,
+            'capacity': self.capacity,
+            'policy': self.policy,
+            'dropped_clips': self.dropped_clips,
+            'lag_frames': self.lag_frames,
+            'max_lag_frames': self.max_lag_frames
+        }
+
+
+class DetectionStride:
+    """检测步长控制：每 stride 帧运行一次 YOLO，中间帧用 DeepSort 的卡尔曼预测框代替检测
+
+    adaptive 为 True 时，若出现尚未确认的新目标，或已确认目标的位置不确定度
+    （卡尔曼协方差的位置标准差 / 框高）超过 max_uncertainty，则提前在中间帧检测。
+    """
+
+    def __init__(self, stride=1, adaptive=False, max_uncertainty=0.15):
+        """
+        Args:
+            stride: 检测间隔帧数，1 表示每帧检测
+            adaptive: 是否根据跟踪状态提前检测
+            max_uncertainty: 允许的最大相对位置不确定度
+        """
+        self.stride = max(1, int(stride))
+        self.adaptive = adaptive
+        self.max_uncertainty = max_uncertainty
+        self.detected_frames = 0
+        self.propagated_frames = 0
+
+    def is_scheduled(self, frame_index):
+        """按固定步长该帧是否需要检测（frame_index 从 0 开始）"""
+        return frame_index % self.stride == 0
+
+    def needs_refresh(self, tracker):
+        """自适应模式下，根据跟踪器状态判断中间帧是否需要提前检测"""
+        if not self.adaptive or self.stride == 1:
+            return False
+        for track in tracker.tracks:
+            if track.is_tentative():
+                return True
+            if track.is_confirmed() and track.time_since_update <= 1:
+                position_std = math.sqrt(track.covariance[0, 0] + track.covariance[1, 1])
+                if position_std / max(track.mean[3], 1e-6) > self.max_uncertainty:
+                    return True
+        return False
+
+    def should_detect(self, frame_index, tracker):
+        """该帧是否运行检测器"""
+        return self.is_scheduled(frame_index) or self.needs_refresh(tracker)
+
+    def record(self, detected):
+        """记录该帧是检测帧还是预测帧"""
+        if detected:
+            self.detected_frames += 1
+        else:
+            self.propagated_frames += 1
+
+    @property
+    def skip_ratio(self):
+        """跳过检测的帧占比"""
+        total = self.detected_frames + self.propagated_frames
+        return self.propagated_frames / total if total else 0.0
+
+
+class MotionGate:
+    """运动门控：在缩小的灰度图上与背景模型做差分，画面静止时跳过整条检测流水线
+
+    背景使用 cv2.accumulateWeighted 滑动平均更新；每隔 force_interval 帧强制放行一次，
+    保证静止目标（如倒地不动的人）仍会被周期性检测。
+    """
+
+    def __init__(self, threshold=0.005, force_interval=50, scale_width=160,
+                 pixel_threshold=25, learning_rate=0.05):
+        """
+        Args:
+            threshold: 变化像素占比达到该值视为有运动
+            force_interval: 连续跳过该帧数后强制检测一次
+            scale_width: 差分时图像缩放到的宽度
+            pixel_threshold: 单个像素灰度差超过该值视为变化
+            learning_rate: 背景模型更新速率
+        """
+        self.threshold = threshold
+        self.force_interval = max(1, int(force_interval))
+        self.scale_width = scale_width
+        self.pixel_threshold = pixel_threshold
+        self.learning_rate = learning_rate
+        self._background = None
+        self._since_pass = 0
+        self.passed_frames = 0
+        self.skipped_frames = 0
+
+    def _preprocess(self, img):
+        height, width = img.shape[:2]
+        scale = self.scale_width / float(width)
+        small = cv2.resize(img, (self.scale_width, max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def check(self, img):
+        """
+        判断该帧是否需要运行检测
+
+        Args:
+            img: BGR图像
+
+        Returns:
+            bool: True 表示有运动或到达强制检测间隔
+        """
+        gray = self._preprocess(img)
+        if self._background is None or self._background.shape != gray.shape:
+            self._background = gray.astype(np.float32)
+            return self._record(True)
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+        moving = np.count_nonzero(diff > self.pixel_threshold) >= self.threshold * diff.size
+        cv2.accumulateWeighted(gray, self._background, self.learning_rate)
+
+        self._since_pass += 1
+        return self._record(moving or self._since_pass >= self.force_interval)
+
+    def _record(self, passed):
+        if passed:
+            self._since_pass = 0
+            self.passed_frames += 1
+        else:
+            self.skipped_frames += 1
+        return passed
+
+    @property
+    def skip_ratio(self):
+        """被门控跳过的帧占比"""
+        total = self.passed_frames + self.skipped_frames
+        return self.skipped_frames / total if total else 0.0
+
+
+class ActionRefreshPolicy:
+    """行为识别刷新策略：按目标决定该片段是否需要重新运行 SlowFast，其余目标沿用缓存标签
+
+    以下目标需要刷新：新目标；标签年龄超过 max_label_age 帧；自上次识别以来框中心位移
+    （相对框高）超过 motion_threshold，或框宽高比的对数变化超过 shape_threshold；
+    当前标签为报警行为且年龄达到 alert_max_age 帧（报警行为更频繁地复核）。
+
+    select() 只负责选择，识别结果被应用时再调用 record() 记录识别时的状态；片段被队列丢弃或
+    推理失败时目标不会被记为已刷新，下一个片段会重新选中它们。
+    """
+
+    def __init__(self, max_label_age=75, motion_threshold=0.3, shape_threshold=0.2,
+                 alert_max_age=25, is_alert=None):
+        """
+        Args:
+            max_label_age: 标签最长沿用帧数
+            motion_threshold: 框中心位移 / 框高 超过该值时刷新
+            shape_threshold: |log(当前宽高比 / 识别时宽高比)| 超过该值时刷新（如站立变为倒地）
+            alert_max_age: 报警行为标签的最长沿用帧数
+            is_alert: 判断标签是否为报警行为的函数，None 表示不区分
+        """
+        self.max_label_age = max_label_age
+        self.motion_threshold = motion_threshold
+        self.shape_threshold = shape_threshold
+        self.alert_max_age = alert_max_age
+        self.is_alert = is_alert
+        self._states = {}  # 跟踪ID -> (识别时的帧序号, 识别时的框)
+        self.refreshed_tracks = 0
+        self.reused_tracks = 0
+
+    def _needs_refresh(self, track_id, box, frame_index, label):
+        state = self._states.get(track_id)
+        if state is None or label is None:
+            return True
+        label_frame, last_box = state
+        age = frame_index - label_frame
+        if age >= self.max_label_age:
+            return True
+        if self.is_alert is not None and age >= self.alert_max_age and self.is_alert(label):
+            return True
+
+        width, height = max(box[2] - box[0], 1.0), max(box[3] - box[1], 1.0)
+        last_width, last_height = max(last_box[2] - last_box[0], 1.0), max(last_box[3] - last_box[1], 1.0)
+        shift = math.hypot((box[0] + box[2] - last_box[0] - last_box[2]) / 2,
+                           (box[1] + box[3] - last_box[1] - last_box[3]) / 2)
+        if shift / max(height, last_height) > self.motion_threshold:
+            return True
+        return abs(math.log((width / height) / (last_width / last_height))) > self.shape_threshold
+
+    def select(self, tracks, frame_index, labels):
+        """
+        选出本片段需要重新识别的目标（不记录状态，见 record）
+
+        Args:
+            tracks: DeepSort 输出 [N, 8]（x1, y1, x2, y2, 类别, 跟踪ID, Vx, Vy）
+            frame_index: 当前帧序号
+            labels: 跟踪ID -> 当前行为标签
+
+        Returns:
+            np.ndarray: [N] 布尔掩码，True 表示需要提交 SlowFast
+        """
+        mask = np.zeros(len(tracks), dtype=bool)
+        for i, row in enumerate(tracks):
+            track_id = int(row[5])
+            box = [float(v) for v in row[:4]]
+            if self._needs_refresh(track_id, box, frame_index, labels.get(track_id)):
+                mask[i] = True
+        self.reused_tracks += len(tracks) - int(mask.sum())
+
+        # 丢弃已离开画面且标签过期的目标
+        present = {int(track_id) for track_id in tracks[:, 5]} if len(tracks) else set()
+        for track_id in [tid for tid, (label_frame, _) in self._states.items()
+                         if tid not in present and frame_index - label_frame > self.max_label_age]:
+            del self._states[track_id]
+        return mask
+
+    def record(self, tracks, frame_index):
+        """
+        识别结果被应用时记录目标的识别状态
+
+        Args:
+            tracks: 提交 SlowFast 的目标 [N, 8]（select 选出的行）
+            frame_index: 片段结束帧序号（提交时传给 select 的帧序号）
+        """
+        for row in tracks:
+            self._states[int(row[5])] = (frame_index, [float(v) for v in row[:4]])
+        self.refreshed_tracks += len(tracks)
+
+    @property
+    def skip_ratio(self):
+        """沿用缓存标签、未重新识别的目标占比"""
+        total = self.refreshed_tracks + self.reused_tracks
+        return self.reused_tracks / total if total else 0.0
+
+
+class RegionOfInterest:
+    """单路摄像头的关注区域（矩形或多边形）
+
+    检测只在区域外接矩形的裁剪图上进行，结果坐标映射回原图后，
+    丢弃中心点落在区域外的目标；SlowFast 片段同样裁剪到外接矩形。
+    """
+
+    def __init__(self, region):
+        """
+        Args:
+            region: 矩形 [x1, y1, x2, y2]，或多边形顶点列表 [[x, y], ...]
+        """
+        region = np.array(region, dtype=np.float32)
+        if region.ndim == 1:
+            if region.shape[0] != 4:
+                raise ValueError(f"矩形ROI需要4个坐标: {region.tolist()}")
+            x1, y1, x2, y2 = region
+            self.polygon = None
+        else:
+            if region.shape[0] < 3 or region.shape[1] != 2:
+                raise ValueError(f"多边形ROI至少需要3个顶点: {region.tolist()}")
+            x1, y1 = region.min(axis=0)
+            x2, y2 = region.max(axis=0)
+            self.polygon = region.reshape(-1, 1, 2)
+        self.rect = (int(math.floor(x1)), int(math.floor(y1)), int(math.ceil(x2)), int(math.ceil(y2)))
+
+    def bounds(self, frame_shape):
+        """外接矩形裁剪到图像范围内"""
+        height, width = frame_shape[:2]
+        x1, y1, x2, y2 = self.rect
+        x1, y1 = min(max(x1, 0), width - 1), min(max(y1, 0), height - 1)
+        return x1, y1, max(min(x2, width), x1 + 1), max(min(y2, height), y1 + 1)
+
+    def crop(self, img):
+        """裁剪出区域外接矩形（返回视图，不复制像素）"""
+        x1, y1, x2, y2 = self.bounds(img.shape)
+        return img[y1:y2, x1:x2]
+
+    def to_frame(self, pred, frame_shape):
+        """
+        将裁剪图上的检测结果映射回原图坐标，并丢弃中心点在区域外的目标
+
+        Args:
+            pred: 检测结果 [N, 6]，前4列为裁剪图上的 x1, y1, x2, y2
+            frame_shape: 原图尺寸
+
+        Returns:
+            np.ndarray: 保留的检测结果（原图坐标）
+        """
+        x1, y1, _, _ = self.bounds(frame_shape)
+        pred = pred.copy()
+        pred[:, [0, 2]] += x1
+        pred[:, [1, 3]] += y1
+        if self.polygon is None or not len(pred):
+            return pred
+        centers = (pred[:, 0:2] + pred[:, 2:4]) / 2
+        keep = [cv2.pointPolygonTest(self.polygon, (float(cx), float(cy)), False) >= 0 for cx, cy in centers]
+        return pred[np.array(keep, dtype=bool)]
+
+    def crop_clip(self, clip, boxes, crop_size):
+        """
+        将 SlowFast 片段裁剪到区域外接矩形，并按裁剪比例缩小短边目标尺寸，保持与整帧相同的缩放倍率
+
+        Args:
+            clip: 片段张量 (C, T, H, W)
+            boxes: 原图坐标的目标框 [N, 4]
+            crop_size: 整帧时的短边目标尺寸
+
+        Returns:
+            Tuple: (裁剪后片段, 裁剪图坐标的目标框, 短边目标尺寸)
+        """
+        height, width = clip.shape[2], clip.shape[3]
+        x1, y1, x2, y2 = self.bounds((height, width))
+        boxes = np.array(boxes, dtype=np.float32)
+        boxes[:, [0, 2]] -= x1
+        boxes[:, [1, 3]] -= y1
+        scale = min(x2 - x1, y2 - y1) / float(min(height, width))
+        return clip[:, :, y1:y2, x1:x2], boxes, max(1, int(round(crop_size * scale)))
+
+
+def person_crop_clip(clip, tracks, crop_size, margin=0.25, min_crop_size=160, max_area_ratio=0.8):
+    """
+    以人为中心裁剪 SlowFast 片段：取片段内各目标轨迹所覆盖区域的并集（加边距）作为裁剪区域，
+    短边目标尺寸按裁剪比例缩小，保持与整帧相同的缩放倍率，计算量随人物占据的面积而非摄像头分辨率变化
+
+    tracks 为片段最后一帧的跟踪结果，片段起始帧的位置由 DeepSort 速度（Vx, Vy 为每帧位移的10倍）回推。
+
+    Args:
+        clip: 片段张量 (C, T, H, W)
+        tracks: 跟踪结果 [N, 8]（x1, y1, x2, y2, 类别, 跟踪ID, Vx, Vy）或目标框 [N, 4]
+        crop_size: 整帧时的短边目标尺寸
+        margin: 边距，相对于最大目标框高
+        min_crop_size: 裁剪后短边目标尺寸的下限，过小时以区域中心扩大裁剪范围
+        max_area_ratio: 裁剪区域超过整帧该面积占比时不裁剪
+
+    Returns:
+        Tuple: (裁剪后片段, 裁剪图坐标的目标框, 短边目标尺寸)
+    """
+    height, width = clip.shape[2], clip.shape[3]
+    tracks = np.asarray(tracks, dtype=np.float32)
+    boxes = tracks[:, 0:4].copy()
+    if not len(boxes):
+        return clip, boxes, crop_size
+
+    regions = [boxes]
+    if tracks.shape[1] >= 8:
+        shift = tracks[:, 6:8] / 10.0 * (clip.shape[1] - 1)
+        regions.append(boxes - np.hstack((shift, shift)))
+    regions = np.concatenate(regions)
+    pad = margin * float((boxes[:, 3] - boxes[:, 1]).max())
+    x1, y1 = regions[:, 0].min() - pad, regions[:, 1].min() - pad
+    x2, y2 = regions[:, 2].max() + pad, regions[:, 3].max() + pad
+
+    # 保证裁剪区域的短边不小于 min_crop_size 对应的原图尺寸
+    frame_short = float(min(height, width))
+    min_side = min(min_crop_size * frame_short / crop_size, frame_short)
+    if x2 - x1 < min_side:
+        x1, x2 = (x1 + x2 - min_side) / 2, (x1 + x2 + min_side) / 2
+    if y2 - y1 < min_side:
+        y1, y2 = (y1 + y2 - min_side) / 2, (y1 + y2 + min_side) / 2
+
+    # 平移回图像范围内，再截断
+    x1, x2 = x1 - min(x1, 0) - max(x2 - width, 0), x2 - min(x1, 0) - max(x2 - width, 0)
+    y1, y2 = y1 - min(y1, 0) - max(y2 - height, 0), y2 - min(y1, 0) - max(y2 - height, 0)
+    x1, y1 = max(int(math.floor(x1)), 0), max(int(math.floor(y1)), 0)
+    x2, y2 = min(int(math.ceil(x2)), width), min(int(math.ceil(y2)), height)
+    if (x2 - x1) * (y2 - y1) > max_area_ratio * height * width:
+        return clip, boxes, crop_size
+
+    boxes[:, [0, 2]] -= x1
+    boxes[:, [1, 3]] -= y1
+    scale = min(x2 - x1, y2 - y1) / frame_short
+    return clip[:, :, y1:y2, x1:x2], boxes, max(1, int(round(crop_size * scale)))
+
+
 def tensor_to_numpy(tensor):
     img = tensor.cpu().numpy().transpose((1, 2, 0))
     return img
@@ -119,7 +740,17 @@ def ava_inference_transform(
         data_mean=[0.45, 0.45, 0.45],
         data_std=[0.225, 0.225, 0.225],
         slow_fast_alpha=4,  # if using slowfast_r50_detection, change this to 4, None for slow
+        fused=True,
 ):
+    """SlowFast 输入预处理
+
+    fused=True 时对 uint8 片段走融合路径：只取时间采样中不重复的帧，在 uint8 上缩放短边，
+    再在缩小后的张量上一次完成归一化，最后按采样索引展开到 num_frames 帧；
+    fused=False（或输入不是 uint8）时使用逐步转换整段片段的原始实现。
+    """
+    if fused and clip.dtype == torch.uint8:
+        return _fused_ava_inference_transform(clip, boxes, num_frames, crop_size, data_mean, data_std, slow_fast_alpha)
+
     boxes = np.array(boxes)
     roi_boxes = boxes.copy()
     clip = uniform_temporal_subsample(clip, num_frames)
@@ -141,6 +772,87 @@ def ava_inference_transform(
     return clip, torch.from_numpy(boxes), roi_boxes
 
 
+def _fused_ava_inference_transform(clip, boxes, num_frames, crop_size, data_mean, data_std, slow_fast_alpha):
+    boxes = np.array(boxes)
+    roi_boxes = boxes.copy()
+    channels, length, height, width = clip.shape
+
+    # 与 uniform_temporal_subsample 相同的采样索引，25 帧采样到 32 帧时只有 25 个不重复帧需要处理
+    indices = torch.clamp(torch.linspace(0, length - 1, num_frames), 0, length - 1).long()
+    unique_indices, inverse = torch.unique(indices, return_inverse=True)
+
+    # 与 short_side_scale 相同的输出尺寸，在 uint8 上逐帧双线性缩放
+    if width < height:
+        new_height, new_width = int(math.floor(float(height) / width * crop_size)), crop_size
+    else:
+        new_height, new_width = crop_size, int(math.floor(float(width) / height * crop_size))
+    frames = clip.permute(1, 2, 3, 0).numpy()  # (T, H, W, C) 视图，ClipBuffer 片段不复制
+    resized = np.empty((len(unique_indices), new_height, new_width, channels), dtype=np.uint8)
+    for i, index in enumerate(unique_indices.tolist()):
+        cv2.resize(frames[index], (new_width, new_height), dst=resized[i], interpolation=cv2.INTER_LINEAR)
+
+    # 一次完成 /255 与标准化：x * (1 / (255 * std)) - mean / std
+    mean = torch.tensor(data_mean, dtype=torch.float32).view(-1, 1, 1, 1)
+    std = torch.tensor(data_std, dtype=torch.float32).view(-1, 1, 1, 1)
+    reduced = torch.empty((channels, len(unique_indices), new_height, new_width), dtype=torch.float32)
+    reduced.copy_(torch.from_numpy(resized).permute(3, 0, 1, 2))
+    reduced.mul_(1.0 / (255.0 * std)).sub_(mean / std)
+    clip = torch.index_select(reduced, 1, inverse)
+
+    boxes = clip_boxes_to_image(boxes, height, width)
+    boxes = boxes * (float(new_height) / height if width < height else float(new_width) / width)
+    boxes = clip_boxes_to_image(boxes, new_height, new_width)
+    if slow_fast_alpha is not None:
+        slow_indices = torch.linspace(0, num_frames - 1, num_frames // slow_fast_alpha).long()
+        slow_pathway = torch.index_select(reduced, 1, inverse[slow_indices])
+        clip = [slow_pathway, clip]
+
+    return clip, torch.from_numpy(boxes), roi_boxes
+
+
+def batch_slowfast_inference(video_model, clips, device, max_batch_size=4):
+    """
+    多个片段合并为批量推理：按输入尺寸分组，每组堆叠为一个批次，目标框带上真实的批内序号
+
+    Args:
+        video_model: SlowFast 模型
+        clips: [(inputs, boxes), ...]，inputs 为 ava_inference_transform 输出的片段（不含批量维度），
+               boxes 为该片段上的目标框 [N, 4]
+        device: 推理设备
+        max_batch_size: 单次前向的最多片段数（模型的批量维度固定时，如旧版本导出的ONNX模型，不超过其 max_batch）
+
+    Returns:
+        list: 与 clips 顺序对应的行为得分张量 [N, 类别数]（CPU, float32）
+    """
+    model_max_batch = getattr(video_model, 'max_batch', None)
+    if model_max_batch is not None:
+        max_batch_size = min(max_batch_size, model_max_batch)
+    groups = {}
+    for i, (inputs, _) in enumerate(clips):
+        pathways = inputs if isinstance(inputs, list) else [inputs]
+        groups.setdefault(tuple(tuple(p.shape) for p in pathways), []).append(i)
+
+    results = [None] * len(clips)
+    for indices in groups.values():
+        for start in range(0, len(indices), max_batch_size):
+            chunk = indices[start:start + max_batch_size]
+            pathways = [clips[i][0] if isinstance(clips[i][0], list) else [clips[i][0]] for i in chunk]
+            inputs = [torch.stack(p).to(device, non_blocking=True) for p in zip(*pathways)]
+            boxes = torch.cat([
+                torch.cat([torch.full((len(clips[i][1]), 1), float(b)), torch.as_tensor(clips[i][1]).float()], dim=1)
+                for b, i in enumerate(chunk)
+            ], dim=0)
+            with torch.no_grad():
+                preds = video_model(inputs if isinstance(clips[chunk[0]][0], list) else inputs[0], boxes.to(device))
+            preds = preds.cpu().float()
+            offset = 0
+            for i in chunk:
+                count = len(clips[i][1])
+                results[i] = preds[offset:offset + count]
+                offset += count
+    return results
+
+
 def plot_one_box(x, img, color=[100, 100, 100], text_info="None",
                  velocity=None, thickness=1, fontsize=0.5, fontthickness=1):
     # Plots one bounding box on image img
@@ -230,7 +942,7 @@ def main(config):
     video_model.load_state_dict(checkpoint['model_state'])
     video_model = video_model.eval().to(device)
 
-    deepsort_tracker = DeepSort("ckpt.t7")
+    deepsort_tracker = DeepSort("ckpt.t7", reid_on_demand=getattr(config, 'reid_on_demand', False))
     ava_labelnames, _ = AvaLabeledVideoFramePaths.read_label_map("temp.pbtxt")
 
     coco_color_map = [[random.randint(0, 255) for _ in range(3)] for _ in range(80)]
@@ -257,13 +969,22 @@ def main(config):
         cap.release()
 
     print("开始处理...")
-    cap = MyVideoCapture(config.input)
+    prefetch = getattr(config, 'prefetch', 0)
+    if getattr(config, 'latest_frame', False):
+        capture_mode = 'latest'
+    else:
+        capture_mode = 'prefetch' if prefetch > 0 else 'sync'
+    cap = open_video_capture(config.input, capture_mode, prefetch)
     id_to_ava_labels = {}
     a = time.time()
 
     # 新增：clip 队列和动作识别线程
-    clip_queue = queue.Queue()
+    # 摄像头跟不上时丢弃片段，视频文件则阻塞等待以识别每个片段
+    clip_queue_policy = getattr(config, 'clip_queue_policy', None) or ('drop_oldest' if is_camera else 'block')
+    clip_queue = ClipQueue(getattr(config, 'clip_queue_size', 2), clip_queue_policy)
     result_queue = queue.Queue()
+    max_clip_batch = max(1, getattr(config, 'clip_batch', 4))
+    person_crop = getattr(config, 'person_crop', False)
 
     def slowfast_worker():
         # 仅当使用GPU时才创建独立的CUDA流
@@ -272,41 +993,54 @@ def main(config):
         # 使用 contextlib.nullcontext() 来优雅地处理 CPU 情况
         context_manager = torch.cuda.stream(stream) if stream else contextlib.nullcontext()
 
-        while True:
-            item = clip_queue.get()
-            if item is None:
-                break
-            idx, clip, pred_result = item
-            
-            # 所有在这个 'with' 块内的CUDA操作都将在我们创建的独立流上执行
-            with context_manager:
-                if pred_result.pred[0].shape[0]:
-                    inputs, inp_boxes, _ = ava_inference_transform(clip, pred_result.pred[0][:, 0:4], crop_size=imsize)
-                    inp_boxes = torch.cat([torch.zeros(inp_boxes.shape[0], 1), inp_boxes], dim=1)
-                    if isinstance(inputs, list):
-                        # non_blocking=True 允许主机(CPU)代码继续执行，而不会等待数据复制完成
-                        inputs = [inp.unsqueeze(0).to(device, non_blocking=True) for inp in inputs]
-                    else:
-                        inputs = inputs.unsqueeze(0).to(device, non_blocking=True)
-                    
-                    inp_boxes_gpu = inp_boxes.to(device, non_blocking=True)
-
-                    with torch.no_grad():
-                        # SlowFast模型推理被提交到独立的流
-                        slowfaster_preds = video_model(inputs, inp_boxes_gpu)
-                    
-                    # 修复数据类型转换问题 - 确保正确的数据类型转换
-                    slowfaster_preds_cpu = slowfaster_preds.cpu().float()  # 确保为float类型
-                    pred_labels = torch.argmax(slowfaster_preds_cpu, dim=1).numpy().astype(np.int32)
-                    track_ids = pred_result.pred[0][:, 5].astype(np.int32)
-
-                    result_queue.put((idx, track_ids.tolist(), pred_labels.tolist()))
-            clip_queue.task_done()
+        stop = False
+        while not stop:
+            # 取出所有已就绪的片段（推理跟不上时会积压多个窗口），合并为批量推理
+            items = [clip_queue.get()]
+            while len(items) < max_clip_batch:
+                try:
+                    items.append(clip_queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in items:
+                stop = True
+                items = items[:items.index(None)]
+
+            try:
+                batch = []
+                for idx, clip, tracks in items:
+                    clip_boxes, crop_size = tracks[:, 0:4], imsize
+                    if person_crop:
+                        clip, clip_boxes, crop_size = person_crop_clip(clip, tracks, imsize)
+                    inputs, inp_boxes, _ = ava_inference_transform(clip, clip_boxes, crop_size=crop_size)
+                    batch.append((idx, tracks, inputs, inp_boxes))
+
+                if batch:
+                    # 所有在这个 'with' 块内的CUDA操作都将在我们创建的独立流上执行
+                    with context_manager:
+                        preds = batch_slowfast_inference(video_model, [(inputs, boxes) for _, _, inputs, boxes in batch],
+                                                         device, max_clip_batch)
+                    for (idx, tracks, _, _), slowfaster_preds in zip(batch, preds):
+                        pred_labels = torch.argmax(slowfaster_preds, dim=1).numpy().astype(np.int32)
+                        result_queue.put((idx, tracks, pred_labels.tolist()))
+            except Exception as e:
+                # 单批推理失败只丢弃这批片段，线程继续处理后续片段
+                print(f"SlowFast处理错误: {e}")
+                traceback.print_exc()
+            finally:
+                for _, clip, _ in items:
+                    cap.release_clip(clip)
+                    clip_queue.task_done()
 
     threading.Thread(target=slowfast_worker, daemon=True).start()
 
     frame_count = 0
     total_frames = int(cap.cap.get(cv2.CAP_PROP_FRAME_COUNT)) if not is_camera else 0
+    detection_stride = DetectionStride(getattr(config, 'detect_stride', 1), getattr(config, 'adaptive_stride', False))
+    action_refresh = None
+    if getattr(config, 'action_max_age', 0) > 0:
+        action_refresh = ActionRefreshPolicy(
+            config.action_max_age, is_alert=lambda label: any(name in label for name in ('fall down', 'fight')))
 
     while not cap.end:
         ret, img = cap.read()
@@ -319,30 +1053,37 @@ def main(config):
             progress = (frame_count / total_frames) * 100 if total_frames > 0 else 0
             print(f"\r处理进度: {progress:.1f}% ({frame_count}/{total_frames})", end="", flush=True)
 
-        results = model.predict(source=img, imgsz=imsize, device=device, verbose=False)
-        boxes = results[0].boxes  # YOLOv8 Results object
-
-        # 仅在调试模式或使用摄像头时打印详细信息
-        if is_camera:
-            print(f"\n帧 {cap.idx} - 检测结果:")
-            print(f"检测到 {len(boxes)} 个目标:")
-            cls_counts = {}
-            for i, box in enumerate(boxes):
-                cls_name = model.names[int(box.cls)]
-                cls_counts[cls_name] = cls_counts.get(cls_name, 0) + 1
-                print(f"目标 {i + 1}: 类别:{cls_name} | 置信度:{box.conf.item():.2f} | "
-                      f"位置:[{box.xyxy.cpu().numpy()[0][0]:.0f},{box.xyxy.cpu().numpy()[0][1]:.0f},"
-                      f"{box.xyxy.cpu().numpy()[0][2]:.0f},{box.xyxy.cpu().numpy()[0][3]:.0f}]")
-            print("类别统计:", ", ".join([f"{k}:{v}" for k, v in cls_counts.items()]))
-
-        pred_xyxy = boxes.xyxy.cpu().numpy()
-        pred_conf = boxes.conf.cpu().numpy().reshape(-1, 1)
-        pred_cls = boxes.cls.cpu().numpy().reshape(-1, 1)
-
-        pred = np.hstack((pred_xyxy, pred_conf, pred_cls))
-        xywh = np.hstack(((pred[:, 0:2] + pred[:, 2:4]) / 2, pred[:, 2:4] - pred[:, 0:2]))
-        temp = deepsort_update(deepsort_tracker, pred, xywh, img)
-        temp = temp if len(temp) else np.ones((0, 8)).astype(np.float32)
+        detected = detection_stride.should_detect(frame_count - 1, deepsort_tracker.tracker)
+        detection_stride.record(detected)
+        if not detected:
+            # 中间帧：不运行 YOLO，使用卡尔曼预测的跟踪框
+            temp = deepsort_tracker.propagate(img)
+            temp = temp if len(temp) else np.ones((0, 8)).astype(np.float32)
+        else:
+            results = model.predict(source=img, imgsz=imsize, device=device, verbose=False)
+            boxes = results[0].boxes  # YOLOv8 Results object
+
+            # 仅在调试模式或使用摄像头时打印详细信息
+            if is_camera:
+                print(f"\n帧 {cap.idx} - 检测结果:")
+                print(f"检测到 {len(boxes)} 个目标:")
+                cls_counts = {}
+                for i, box in enumerate(boxes):
+                    cls_name = model.names[int(box.cls)]
+                    cls_counts[cls_name] = cls_counts.get(cls_name, 0) + 1
+                    print(f"目标 {i + 1}: 类别:{cls_name} | 置信度:{box.conf.item():.2f} | "
+                          f"位置:[{box.xyxy.cpu().numpy()[0][0]:.0f},{box.xyxy.cpu().numpy()[0][1]:.0f},"
+                          f"{box.xyxy.cpu().numpy()[0][2]:.0f},{box.xyxy.cpu().numpy()[0][3]:.0f}]")
+                print("类别统计:", ", ".join([f"{k}:{v}" for k, v in cls_counts.items()]))
+
+            pred_xyxy = boxes.xyxy.cpu().numpy()
+            pred_conf = boxes.conf.cpu().numpy().reshape(-1, 1)
+            pred_cls = boxes.cls.cpu().numpy().reshape(-1, 1)
+
+            pred = np.hstack((pred_xyxy, pred_conf, pred_cls))
+            xywh = np.hstack(((pred[:, 0:2] + pred[:, 2:4]) / 2, pred[:, 2:4] - pred[:, 0:2]))
+            temp = deepsort_update(deepsort_tracker, pred, xywh, img)
+            temp = temp if len(temp) else np.ones((0, 8)).astype(np.float32)
 
         pred_result = type("YoloPred", (), {})()
         pred_result.ims = [img]
@@ -353,11 +1094,21 @@ def main(config):
             if is_camera:
                 print(f"processing {cap.idx // 25}th second clips (异步)")
             clip = cap.get_video_clip()
-            clip_queue.put((cap.idx, clip, pred_result))
+            tracks = pred_result.pred[0]
+            if action_refresh is not None:
+                # 只重新识别标签过期或姿态变化的目标，其余沿用 id_to_ava_labels 中的标签
+                tracks = tracks[action_refresh.select(tracks, cap.idx, id_to_ava_labels)]
+            if len(tracks):
+                clip_queue.put((cap.idx, clip, tracks))
+            else:
+                cap.release_clip(clip)
 
         while not result_queue.empty():
-            idx, tids, avalabels = result_queue.get()
-            for tid, avalabel in zip(tids, avalabels):
+            idx, tracks, avalabels = result_queue.get()
+            clip_queue.record_result(idx, cap.idx)
+            if action_refresh is not None:
+                action_refresh.record(tracks, idx)
+            for tid, avalabel in zip(tracks[:, 5].astype(np.int32).tolist(), avalabels):
                 id_to_ava_labels[tid] = ava_labelnames[avalabel + 1]
             if is_camera:
                 print(f"动作识别结果: 更新了 {len(avalabels)} 个目标的动作标签 (帧 {idx})")
@@ -374,6 +1125,16 @@ def main(config):
     process_time = time.time() - a
     print("总耗时: {:.3f} 秒, 视频长度: {:.1f} 秒, 平均帧率: {:.1f} FPS".format(
         process_time, cap.idx / 25, frame_count / process_time))
+    if isinstance(cap, LatestFrameVideoCapture):
+        print(f"丢弃的过期帧: {cap.dropped_frames}")
+    if detection_stride.stride > 1:
+        print(f"跳过检测的帧占比: {detection_stride.skip_ratio:.1%}")
+    queue_stats = clip_queue.get_stats()
+    print(f"行为识别片段队列: 丢弃 {queue_stats['dropped_clips']} 个片段, 最大结果延迟 {queue_stats['max_lag_frames']} 帧")
+    if action_refresh is not None:
+        print(f"沿用缓存行为标签的目标占比: {action_refresh.skip_ratio:.1%}")
+    if deepsort_tracker.reid_on_demand:
+        print(f"跳过ReID特征提取的检测框占比: {deepsort_tracker.reid_skip_ratio:.1%}")
     
     cap.release()
     if outputvideo is not None:
@@ -393,6 +1154,20 @@ if __name__ == "__main__":
     parser.add_argument('--device', default='cpu')
     parser.add_argument('--classes', nargs='+', type=int)
     parser.add_argument('--show', action='store_false', default=True, help='Show real-time video')
+    parser.add_argument('--prefetch', type=int, default=0, help='decode frames on a background thread with this queue depth (0 = off)')
+    parser.add_argument('--latest-frame', action='store_true', help='for cameras/streams, always process the newest frame and drop stale ones')
+    parser.add_argument('--detect-stride', type=int, default=1, help='run YOLO every N frames, Kalman-propagate tracks in between')
+    parser.add_argument('--adaptive-stride', action='store_true', help='detect early when new tracks appear or track uncertainty grows')
+    parser.add_argument('--action-max-age', type=int, default=0,
+                        help='re-run SlowFast for a track only when its label is older than N frames or its box moved/changed shape (0 = every clip)')
+    parser.add_argument('--person-crop', action='store_true',
+                        help='run SlowFast on the region covered by the tracked people instead of the whole frame')
+    parser.add_argument('--clip-queue-size', type=int, default=2, help='max SlowFast clips waiting for inference')
+    parser.add_argument('--clip-queue-policy', default=None, choices=ClipQueue.POLICIES,
+                        help='what to do when SlowFast falls behind (default: drop_oldest for cameras, block for files)')
+    parser.add_argument('--reid-on-demand', action='store_true',
+                        help='extract ReID features only for ambiguous or new detections, associate the rest by IoU')
+    parser.add_argument('--clip-batch', type=int, default=4, help='max pending SlowFast clips merged into one forward pass')
     config = parser.parse_args()
 
     if config.input.isdigit():